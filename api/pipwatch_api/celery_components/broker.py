@@ -1,16 +1,32 @@
 """This module contains broker class for streamlining interaction with celery."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+import json
 from logging import Logger, getLogger
-from typing import Any, Dict, List, NamedTuple
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+import uuid
 
 from celery import Celery
 from celery.result import AsyncResult
+from kombu.transport.redis import Channel, PRIORITY_STEPS
+import redis
 
-from pipwatch_api.core.configuration import configure_celery_app
-from pipwatch_api.datastore.models import DATABASE, Project
+from pipwatch_api.celery_components.routing import get_routing_key, ShardRouter
+from pipwatch_api.core.configuration import configure_celery_app, load_config_file
+from pipwatch_api.datastore.models import DATABASE, Namespace, Project
 from pipwatch_api.datastore.stores import DefaultStore
 
 
 ActiveTask = NamedTuple("ActiveTask", [("name", str), ("args", str)])
+QueuePosition = NamedTuple("QueuePosition", [("position", int), ("estimated_start", float)])
+
+# Priority classes of update requests, from the most important one, along with priorities of their
+# celery messages (redis transport consumes messages of lower priority first)
+PRIORITY_CLASSES: Dict[str, int] = {
+    "interactive": 0,
+    "scheduled": 3,
+    "backfill": 6
+}
 
 
 class Broker:
@@ -38,14 +54,17 @@ class Broker:
 
         return active_tasks
 
-    def send_task(self, task_name: str, args: Any, kwargs: Any) -> str:
-        """Send celery_components task and receive its id."""
+    def send_task(self, task_name: str, args: Any, kwargs: Any,  # pylint: disable=too-many-arguments
+                  task_id: str = None, queue: str = None, priority: int = None) -> str:
+        """Send celery_components task (to default queue, unless other is given) and receive its id."""
         self.log.info("Sending celery_components task {name} with args: {args}, kwargs: {kwargs}".format(
             name=task_name,
             args=repr(args),
             kwargs=repr(kwargs)
         ))
-        return self.app.send_task(task_name, args=args, kwargs=kwargs).id
+        return self.app.send_task(
+            task_name, args=args, kwargs=kwargs, task_id=task_id, queue=queue, priority=priority
+        ).id
 
     def check_task(self, task_id: str) -> AsyncResult:
         """Check status of given celery_components task."""
@@ -53,9 +72,29 @@ class Broker:
 
 
 class ProjectUpdateBroker(Broker):
-    """Encompasses logic for sending tasks for attempting project requirement update."""
+    """Encompasses logic for sending tasks for attempting project requirement update.
+
+    Requests are coalesced - while update task of a project is queued or running, id of that task is
+    returned instead of sending another one. Ids of pending tasks are kept in redis (shared by all
+    api instances) for up to 'pending_task_ttl' seconds. Tasks are routed by repository of the
+    project (see ShardRouter) and sent with priority of their class (see PRIORITY_CLASSES), so that
+    interactive requests are not queued behind scheduled sweeps.
+    """
 
     PROJECT_UPDATE_TASK_NAME = "pipwatch_worker.celery_components.tasks.process_project"
+    PENDING_TASK_KEY_PREFIX = "pipwatch:project-update-task:"
+    TASK_ROUTE_KEY_PREFIX = "pipwatch:task-route:"
+    TASK_DURATIONS_KEY_PREFIX = "pipwatch:task-durations:"
+    DEFAULT_PENDING_TASK_TTL = 3600
+    DEFAULT_TASK_DURATION = 300
+    DEFAULT_WORKERS_CONCURRENCY = 4
+
+    REPLACE_TASK_ID_SCRIPT = """
+        if redis.call("GET", KEYS[1]) == ARGV[1] then
+            return redis.call("SET", KEYS[1], ARGV[2], "EX", ARGV[3])
+        end
+        return nil
+    """
 
     def __init__(self, logger: Logger = None) -> None:
         """Initialize class instance."""
@@ -64,20 +103,139 @@ class ProjectUpdateBroker(Broker):
             model=Project,
             database=DATABASE
         )
+        self.router = ShardRouter.from_config(app=self.app, logger=self.log)
+
+        configuration: ConfigParser = load_config_file()
+        section = "projects-updates"
+        self.coalesce_requests = configuration.getboolean(section=section, option="coalesce_requests", fallback=True)
+        self.pending_task_ttl = configuration.getint(
+            section=section, option="pending_task_ttl", fallback=self.DEFAULT_PENDING_TASK_TTL
+        )
+        self.redis = redis.StrictRedis.from_url(
+            configuration.get(section=section, option="redis_url", fallback="") or self.app.conf.broker_url
+        )
+        self.default_task_duration = configuration.getfloat(
+            section=section, option="default_task_duration", fallback=self.DEFAULT_TASK_DURATION
+        )
+        self.workers_concurrency = configuration.getint(
+            section=section, option="workers_concurrency", fallback=self.DEFAULT_WORKERS_CONCURRENCY
+        )
 
-    def send_update_request(self, project_id: int) -> str:
-        """Send task for attempting update of packages for given project."""
+    def send_update_request(self, project_id: int, priority_class: str = "interactive") -> str:
+        """Send task for attempting update of packages for given project (or return id of pending one)."""
         project: Project = self.datastore.read(document_id=project_id)  # type: ignore
         if not project:
             self.log.warning("Unable to find project with id {}, skipping sending update.".format(project_id))
             return ""
 
+        task_id = str(uuid.uuid4())
+        if self.coalesce_requests:
+            pending_task_id = self._reserve_task_id(project_id=project_id, task_id=task_id)
+            if pending_task_id:
+                self.log.info("Update of project {} is already pending as task {}.".format(project_id, pending_task_id))
+                return pending_task_id
+
+        queue = self._get_queue(project=project)
+        self._save_task_route(task_id=task_id, queue=queue, priority_class=priority_class)
         return self.send_task(
             task_name=self.PROJECT_UPDATE_TASK_NAME,
             args=[self._get_update_request_payload(project)],
-            kwargs=None
+            kwargs={"priority_class": priority_class},
+            task_id=task_id,
+            queue=queue,
+            priority=PRIORITY_CLASSES[priority_class]
+        )
+
+    def get_queue_position(self, task_id: str) -> Optional[QueuePosition]:
+        """Return number of tasks to be consumed before given one and estimated time it starts at.
+
+        None is returned when task is not waiting in queue (or position cannot be told - e.g. broker
+        other than redis is used).
+        """
+        route = self.redis.get(self.TASK_ROUTE_KEY_PREFIX + task_id)
+        if not route or not self.app.conf.broker_url.startswith("redis"):
+            return None
+
+        route = json.loads(route.decode())
+        broker_redis = redis.StrictRedis.from_url(self.app.conf.broker_url)
+        position = 0
+        for priority in (step for step in PRIORITY_STEPS if step <= route["priority"]):
+            key = self._get_queue_key(queue=route["queue"], priority=priority)
+            if priority < route["priority"]:
+                position += broker_redis.llen(key)
+                continue
+
+            # Messages are pushed to the head of the list and consumed from its tail
+            tasks_ids = [
+                json.loads(message).get("headers", {}).get("id") for message in broker_redis.lrange(key, 0, -1)
+            ]
+            if task_id not in tasks_ids:
+                return None
+
+            position += len(tasks_ids) - 1 - tasks_ids.index(task_id)
+
+        return QueuePosition(position=position, estimated_start=time.time() + self._estimate_wait(position=position))
+
+    def get_queues_depth(self) -> Optional[int]:
+        """Return number of tasks waiting in queues project tasks are routed to (None if it cannot be told)."""
+        if not self.app.conf.broker_url.startswith("redis"):
+            return None
+
+        broker_redis = redis.StrictRedis.from_url(self.app.conf.broker_url)
+        return sum(
+            broker_redis.llen(self._get_queue_key(queue=queue, priority=priority))
+            for queue in self.router.ring.nodes | {self.router.fallback_queue}
+            for priority in PRIORITY_STEPS
         )
 
+    @staticmethod
+    def _get_queue_key(queue: str, priority: int) -> str:
+        """Return redis key of list messages of given queue and priority are kept in."""
+        return queue + (Channel.sep + str(priority) if priority else "")
+
+    def _estimate_wait(self, position: int) -> float:
+        """Return number of seconds task waits for, when given number of tasks is to be consumed before it."""
+        durations = [
+            float(duration) for priority_class in PRIORITY_CLASSES
+            for duration in self.redis.lrange(self.TASK_DURATIONS_KEY_PREFIX + priority_class, 0, -1)
+        ]
+        average_duration = sum(durations) / len(durations) if durations else self.default_task_duration
+        # Tasks ahead are consumed by all workers at once, running task finishes half-way on average
+        return (position // max(self.workers_concurrency, 1) + 0.5) * average_duration
+
+    def _save_task_route(self, task_id: str, queue: str, priority_class: str) -> None:
+        """Remember queue and priority of given task, so that its position in queue can be told."""
+        self.redis.setex(
+            self.TASK_ROUTE_KEY_PREFIX + task_id,
+            self.pending_task_ttl,
+            json.dumps({"queue": queue, "priority": PRIORITY_CLASSES[priority_class]})
+        )
+
+    def _get_queue(self, project: Project) -> str:
+        """Return queue update task of given project should be sent to."""
+        return self.router.get_queue(key=get_routing_key(repository_url=project.git_repository.url))
+
+    def _reserve_task_id(self, project_id: int, task_id: str) -> Optional[str]:
+        """Remember id of task about to be sent for given project.
+
+        If another update task of the project is still queued or running, its id is returned instead
+        (and given task id is not remembered).
+        """
+        key = "{prefix}{project_id}".format(prefix=self.PENDING_TASK_KEY_PREFIX, project_id=project_id)
+        while not self.redis.set(key, task_id, nx=True, ex=self.pending_task_ttl):
+            pending_task_id = self.redis.get(key)
+            if pending_task_id is None:
+                continue
+
+            if not self.check_task(task_id=pending_task_id.decode()).ready():
+                return pending_task_id.decode()
+
+            # Replace id of finished task, unless another request has just done that
+            if self.redis.eval(self.REPLACE_TASK_ID_SCRIPT, 1, key, pending_task_id, task_id, self.pending_task_ttl):
+                return None
+
+        return None
+
     @staticmethod
     def _get_update_request_payload(project: Project) -> Dict[str, Any]:
         """Retrieve body for task request for given project."""
@@ -112,3 +270,35 @@ class ProjectUpdateBroker(Broker):
                 } for requirement_file in project.requirements_files
             ]
         }
+
+
+class NamespaceUpdateBroker(ProjectUpdateBroker):
+    """Encompasses logic for sending tasks for attempting requirements update of all projects in namespace."""
+
+    NAMESPACE_UPDATE_TASK_NAME = "pipwatch_worker.celery_components.tasks.process_namespace"
+
+    def __init__(self, logger: Logger = None) -> None:
+        """Initialize class instance."""
+        super().__init__(logger=logger)
+        self.namespaces_datastore = DefaultStore(
+            model=Namespace,
+            database=DATABASE
+        )
+
+    def send_namespace_update_request(self, namespace_id: int, priority_class: str = "scheduled") -> str:
+        """Send single task for attempting update of packages for all projects of given namespace."""
+        namespace: Namespace = self.namespaces_datastore.read(document_id=namespace_id)  # type: ignore
+        if not namespace:
+            self.log.warning("Unable to find namespace with id {}, skipping sending update.".format(namespace_id))
+            return ""
+
+        projects = list(namespace.projects)
+        return self.send_task(
+            task_name=self.NAMESPACE_UPDATE_TASK_NAME,
+            args=[namespace.id, [self._get_update_request_payload(project) for project in projects]],
+            kwargs={
+                "queues": [self._get_queue(project=project) for project in projects],
+                "priority_class": priority_class
+            },
+            priority=PRIORITY_CLASSES[priority_class]
+        )
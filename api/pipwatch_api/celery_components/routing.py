@@ -0,0 +1,176 @@
+"""This module contains logic of routing project tasks to workers which most likely have their state cached."""
+from bisect import bisect
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+import hashlib
+from logging import Logger, getLogger
+import re
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple  # noqa: F401 Imported for type definition
+
+from celery import Celery  # noqa: F401 Imported for type definition
+
+from pipwatch_api.core.configuration import load_config_file
+
+
+def get_hash(value: str) -> int:
+    """Return position of given value on the hash ring."""
+    return int(hashlib.md5(value.encode("utf-8")).hexdigest()[:16], 16)
+
+
+def get_routing_key(repository_url: str) -> str:
+    """Return key project tasks are routed by - projects of the same repository share a worker.
+
+    Url is normalized the same way worker keys its repository mirrors (see normalize_repository_url
+    of pipwatch_worker), so that e.g. 'git@github.com:Owner/Repo.git' and 'https://github.com/owner/repo'
+    share the key.
+    """
+    key = (repository_url or "").strip()
+    key = re.sub(r"^[a-zA-Z][a-zA-Z0-9+.-]*://", "", key)
+    key = re.sub(r"^[^@/]+@", "", key)
+    key = re.sub(r"^([^/:]+):(?!\d+/)", r"\1/", key)
+    key = key.rstrip("/").casefold()
+    return key[:-len(".git")] if key.endswith(".git") else key
+
+
+class HashRing:
+    """Consistent hash ring - each node is placed on the ring many times (as virtual nodes).
+
+    Key belongs to the first node found clockwise from position of the key, so adding or removing
+    a node only moves keys of its neighbourhood, other keys keep their nodes.
+    """
+
+    DEFAULT_VIRTUAL_NODES = 100
+
+    def __init__(self, nodes: Iterable[str] = None, virtual_nodes: int = None) -> None:
+        """Create class instance."""
+        self.virtual_nodes = virtual_nodes or self.DEFAULT_VIRTUAL_NODES
+        self._positions: List[int] = []
+        self._nodes: List[str] = []
+        for node in nodes or []:
+            self.add_node(node=node)
+
+    @property
+    def nodes(self) -> Set[str]:
+        """Return set of nodes placed on the ring."""
+        return set(self._nodes)
+
+    def add_node(self, node: str) -> None:
+        """Place given node on the ring."""
+        for replica in range(self.virtual_nodes):
+            position = get_hash("{node}#{replica}".format(node=node, replica=replica))
+            index = bisect(self._positions, position)
+            self._positions.insert(index, position)
+            self._nodes.insert(index, node)
+
+    def remove_node(self, node: str) -> None:
+        """Remove given node from the ring."""
+        entries = [(position, name) for position, name in zip(self._positions, self._nodes) if name != node]
+        self._positions = [position for position, _ in entries]
+        self._nodes = [name for _, name in entries]
+
+    def get_node(self, key: str) -> Optional[str]:
+        """Return node given key belongs to (or None if the ring is empty)."""
+        return next(self.iterate_nodes(key=key), None)
+
+    def iterate_nodes(self, key: str) -> Iterator[str]:
+        """Yield distinct nodes in order they are found clockwise from position of given key."""
+        if not self._positions:
+            return
+
+        start = bisect(self._positions, get_hash(key))
+        seen: Set[str] = set()
+        for offset in range(len(self._positions)):
+            node = self._nodes[(start + offset) % len(self._positions)]
+            if node not in seen:
+                seen.add(node)
+                yield node
+
+
+class ShardRouter:
+    """Encompasses logic of choosing queue project task should be sent to.
+
+    Each worker consumes a few shard queues (along with the fallback queue). Shards are placed on
+    consistent hash ring, so that tasks of given repository are always sent to the same shard and
+    find its mirror, virtualenvs and wheels in local cache of the worker. When no worker consumes
+    that shard, the next shard on the ring with live consumers is used - other repositories keep
+    their shards as workers join and leave. When none is found (or routing is disabled), task
+    is sent to the fallback queue.
+    """
+
+    DEFAULT_SHARDS_COUNT = 16
+    DEFAULT_QUEUE_PREFIX = "pipwatch-shard-"
+    DEFAULT_FALLBACK_QUEUE = "celery"
+    DEFAULT_LIVENESS_TTL = 30
+
+    _live_queues: Tuple[float, Set[str]] = (0.0, set())
+    _live_queues_lock = threading.Lock()
+
+    def __init__(self, app: Celery,  # pylint: disable=too-many-arguments
+                 shards: Iterable[str] = None,
+                 fallback_queue: str = None,
+                 virtual_nodes: int = None,
+                 liveness_ttl: float = None,
+                 logger: Logger = None) -> None:
+        """Create class instance (router without shards sends every task to the fallback queue)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.app = app
+        self.ring = HashRing(nodes=shards, virtual_nodes=virtual_nodes)
+        self.fallback_queue = fallback_queue or self.DEFAULT_FALLBACK_QUEUE
+        self.liveness_ttl = self.DEFAULT_LIVENESS_TTL if liveness_ttl is None else liveness_ttl
+
+    @classmethod
+    def from_config(cls, app: Celery, logger: Logger = None) -> "ShardRouter":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "routing"
+        fallback_queue = configuration.get(
+            section=section, option="fallback_queue", fallback=cls.DEFAULT_FALLBACK_QUEUE
+        )
+        if not configuration.getboolean(section=section, option="enabled", fallback=False):
+            return cls(app=app, fallback_queue=fallback_queue, logger=logger)
+
+        queue_prefix = configuration.get(section=section, option="queue_prefix", fallback=cls.DEFAULT_QUEUE_PREFIX)
+        shards_count = configuration.getint(section=section, option="shards_count", fallback=cls.DEFAULT_SHARDS_COUNT)
+        return cls(
+            app=app,
+            shards=["{prefix}{shard}".format(prefix=queue_prefix, shard=shard) for shard in range(shards_count)],
+            fallback_queue=fallback_queue,
+            virtual_nodes=configuration.getint(
+                section=section, option="virtual_nodes", fallback=HashRing.DEFAULT_VIRTUAL_NODES
+            ),
+            liveness_ttl=configuration.getfloat(
+                section=section, option="liveness_ttl", fallback=cls.DEFAULT_LIVENESS_TTL
+            ),
+            logger=logger
+        )
+
+    def get_queue(self, key: str) -> str:
+        """Return queue task identified by given key should be sent to."""
+        if not self.ring.nodes or not key:
+            return self.fallback_queue
+
+        live_queues = self.get_live_queues()
+        queue = next((shard for shard in self.ring.iterate_nodes(key=key) if shard in live_queues), None)
+        if not queue:
+            self.log.warning("No worker consumes shards of '{key}', using fallback queue.".format(key=key))
+            return self.fallback_queue
+
+        return queue
+
+    def get_live_queues(self) -> Set[str]:
+        """Return names of queues consumed by any worker (remembered for 'liveness_ttl' seconds)."""
+        with self._live_queues_lock:
+            checked_at, live_queues = ShardRouter._live_queues
+            if time.time() - checked_at < self.liveness_ttl:
+                return live_queues
+
+            try:
+                workers_queues = self.app.control.inspect(timeout=1.0).active_queues() or {}
+            except Exception:  # pylint: disable=broad-except
+                self.log.warning("Unable to check queues consumed by workers.", exc_info=True)
+                workers_queues = {}
+
+            live_queues = {queue.get("name") for queues in workers_queues.values() for queue in queues or []}
+            ShardRouter._live_queues = (time.time(), live_queues)
+            return live_queues
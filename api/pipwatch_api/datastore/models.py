@@ -92,9 +92,16 @@ class Namespace(DATABASE.Model):
     name = DATABASE.Column(DATABASE.String(length=200, convert_unicode=True), unique=True, nullable=False)
     projects = DATABASE.relationship("Project", backref="namespace", lazy="dynamic")
 
-    def __init__(self, name: str = "") -> None:
+    # Scheduling of updates - seconds between updates of its projects, number of their updates running
+    # at once and number of package index lookups they may make per hour (empty means no limit)
+    update_interval = DATABASE.Column(DATABASE.Integer, nullable=True)
+    max_concurrent_updates = DATABASE.Column(DATABASE.Integer, nullable=True)
+    index_requests_budget = DATABASE.Column(DATABASE.Integer, nullable=True)
+
+    def __init__(self, name: str = "", update_interval: int = None) -> None:
         """Initialize class instance."""
         self.name = name
+        self.update_interval = update_interval
 
     def __str__(self) -> str:
         """Return class representation."""
@@ -122,14 +129,20 @@ class Project(DATABASE.Model):
     requirements_files = DATABASE.relationship("RequirementsFile", backref="project", lazy="dynamic")
     tags = DATABASE.relationship("Tag", secondary=TAGS, backref=DATABASE.backref("projects", lazy="dynamic"))
 
+    # Scheduling of updates - seconds between updates (defaults to interval of namespace) and time of the next one
+    update_interval = DATABASE.Column(DATABASE.Integer, nullable=True)
+    next_update_at = DATABASE.Column(DATABASE.DateTime, nullable=True)
+
     def __init__(  # pylint: disable=too-many-arguments
             self,
             name: str = "",
             check_command="",
-            namespace_id: int = -1) -> None:
+            namespace_id: int = -1,
+            update_interval: int = None) -> None:
         """Initialize class instance."""
         self.name = name
         self.check_command = check_command
+        self.update_interval = update_interval
 
         if namespace_id >= 0:
             self.namespace_id = namespace_id
@@ -155,6 +168,7 @@ class RequirementsFile(DATABASE.Model):
     path = DATABASE.Column(DATABASE.String(length=512, convert_unicode=True), unique=False, nullable=False)
 
     status = DATABASE.Column(DATABASE.String(length=30, convert_unicode=True), unique=False, nullable=False)
+    installation_status = DATABASE.Column(DATABASE.String(length=30, convert_unicode=True), unique=False, nullable=True)
 
     project_id = DATABASE.Column(DATABASE.Integer, DATABASE.ForeignKey("project.id"))
     requirements = DATABASE.relationship("Requirement", backref="requirements_file", lazy="dynamic")
@@ -193,7 +207,10 @@ class Requirement(DATABASE.Model):
     current_version = DATABASE.Column(DATABASE.String(length=20, convert_unicode=True), unique=False, nullable=False)
     desired_version = DATABASE.Column(DATABASE.String(length=20, convert_unicode=True), unique=False, nullable=False)
 
+    installed_version = DATABASE.Column(DATABASE.String(length=20, convert_unicode=True), unique=False, nullable=True)
+
     status = DATABASE.Column(DATABASE.String(length=30, convert_unicode=True), unique=False, nullable=False)
+    installation_status = DATABASE.Column(DATABASE.String(length=30, convert_unicode=True), unique=False, nullable=True)
     requirements_file_id = DATABASE.Column(DATABASE.Integer, DATABASE.ForeignKey("requirements_file.id"))
 
     def __init__(self, name: str = "", current_version: str = "",  # pylint: disable=too-many-arguments
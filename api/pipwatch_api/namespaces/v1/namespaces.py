@@ -21,7 +21,10 @@ project_repr = namespaces_namespace.model(  # pylint: disable=invalid-name
 )
 namespace_repr_structure = {  # pylint: disable=invalid-name
     "id": fields.Integer(readOnly=True, description="Id of given namespace, unique across the database"),
-    "name": fields.String(required=True, description="Name of namespace (i.e. 'building-tools')")
+    "name": fields.String(required=True, description="Name of namespace (i.e. 'building-tools')"),
+    "update_interval": fields.Integer(description="Seconds between scheduled updates of its projects"),
+    "max_concurrent_updates": fields.Integer(description="Number of scheduled updates of its projects run at once"),
+    "index_requests_budget": fields.Integer(description="Package index lookups its scheduled updates make per hour")
 }
 namespace_repr = namespaces_namespace.model("Namespace", namespace_repr_structure)  # pylint: disable=invalid-name
 namespace_repr_detailed = namespaces_namespace.inherit(  # pylint: disable=invalid-name
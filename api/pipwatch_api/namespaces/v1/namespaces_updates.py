@@ -0,0 +1,35 @@
+"""This module contains logic for sending update-of-requirements task requests for whole namespaces."""
+from flask import request
+from flask_restplus import Namespace, Resource
+
+from pipwatch_api.celery_components.broker import NamespaceUpdateBroker, PRIORITY_CLASSES
+
+
+namespaces_updates_namespace = Namespace(  # pylint: disable=invalid-name
+    "namespaces-updates",
+    description="Requirements update requests for all projects of given namespace"
+)
+
+
+@namespaces_updates_namespace.route("/<int:namespace_id>")
+class NamespacesUpdate(Resource):
+    """Resource representing requirements update request of all projects in namespace.
+
+    Status of returned task may be checked the same way as status of project update task.
+    """
+    def __init__(self, *args, **kwargs):
+        """Initialize resource instance."""
+        super().__init__(*args, **kwargs)
+        self.updates_broker = NamespaceUpdateBroker()
+
+    @namespaces_updates_namespace.param("priority", "Priority class of the request", enum=list(PRIORITY_CLASSES),
+                                        default="scheduled")
+    def post(self, namespace_id: int):
+        """Request update of requirements of all projects in namespace specified."""
+        priority_class = request.args.get("priority", "scheduled")
+        if priority_class not in PRIORITY_CLASSES:
+            namespaces_updates_namespace.abort(400, "Unknown priority class '{}'.".format(priority_class))
+
+        return self.updates_broker.send_namespace_update_request(
+            namespace_id=namespace_id, priority_class=priority_class
+        ), 200
@@ -38,7 +38,8 @@ project_representation_structure = {  # pylint: disable=invalid-name
     "check_command": fields.String(description="Command to be used to verify update success (i.e. 'test')"),
     "namespace_id": fields.Integer(attribute="namespace.id"),
     "namespace": fields.String(attribute="namespace.name"),
-    "tags": fields.List(fields.Nested(tag_representation))
+    "tags": fields.List(fields.Nested(tag_representation)),
+    "update_interval": fields.Integer(description="Seconds between scheduled updates (defaults to namespace one)")
 }
 project_representation = projects_namespace.model(  # pylint: disable=invalid-name
     "Project",
@@ -1,10 +1,12 @@
 """This module contains logic for sending update-of-requirements task requests."""
-from typing import Dict
+from datetime import datetime
+from typing import Any, Dict
 
 from celery.result import AsyncResult
+from flask import request
 from flask_restplus import Namespace, Resource, fields
 
-from pipwatch_api.celery_components.broker import ProjectUpdateBroker
+from pipwatch_api.celery_components.broker import PRIORITY_CLASSES, ProjectUpdateBroker
 
 
 projects_updates_namespace = Namespace(  # pylint: disable=invalid-name
@@ -47,9 +49,15 @@ class ProjectsUpdate(Resource):
         super().__init__(*args, **kwargs)
         self.updates_broker = ProjectUpdateBroker()
 
+    @projects_updates_namespace.param("priority", "Priority class of the request", enum=list(PRIORITY_CLASSES),
+                                      default="interactive")
     def post(self, project_id: int):
         """Request update of requirements of project specified."""
-        return self.updates_broker.send_update_request(project_id=project_id), 200
+        priority_class = request.args.get("priority", "interactive")
+        if priority_class not in PRIORITY_CLASSES:
+            projects_updates_namespace.abort(400, "Unknown priority class '{}'.".format(priority_class))
+
+        return self.updates_broker.send_update_request(project_id=project_id, priority_class=priority_class), 200
 
 
 @projects_updates_namespace.route("/<string:task_id>")
@@ -63,13 +71,36 @@ class ProjectsUpdateStatus(Resource):
     def get(self, task_id: str):
         """Return status of given update task."""
         task_result: AsyncResult = self.updates_broker.check_task(task_id=task_id)
-        return self._async_result_to_dict(task_result=task_result), 200
+        task_status = self._async_result_to_dict(task_result=task_result)
+        task_status.update(self._get_queue_position(task_result=task_result))
+        return task_status, 200
+
+    def _get_queue_position(self, task_result: AsyncResult) -> Dict[str, Any]:
+        """Tell how many tasks are to be consumed before given one and when it is estimated to start.
+
+        Both are known only for tasks still waiting in queue.
+        """
+        queue_position = None
+        if task_result.state == "PENDING":
+            queue_position = self.updates_broker.get_queue_position(task_id=task_result.task_id)
+
+        return {
+            "queuePosition": queue_position.position if queue_position else None,
+            "estimatedStart": datetime.utcfromtimestamp(
+                queue_position.estimated_start
+            ).isoformat() if queue_position else None
+        }
 
     @staticmethod
-    def _async_result_to_dict(task_result: AsyncResult) -> Dict[str, str]:
-        """Pare celery AsyncResult into human-readable representation."""
+    def _async_result_to_dict(task_result: AsyncResult) -> Dict[str, Any]:
+        """Pare celery AsyncResult into human-readable representation.
+
+        'noOp' tells if worker skipped the project, as nothing has changed since it was last processed.
+        """
+        info = task_result.info
         return {
-            "info": repr(task_result.info),
+            "info": repr(info),
             "state": task_result.state,
-            "taskId": task_result.task_id
+            "taskId": task_result.task_id,
+            "noOp": bool(isinstance(info, dict) and info.get("no_op"))
         }
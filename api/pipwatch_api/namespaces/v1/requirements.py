@@ -18,7 +18,10 @@ requirement_repr_structure = {  # pylint: disable=invalid-name
     "name": fields.String(required=True, description="Name of given package (i.e. 'requests')"),
     "current_version": fields.String(required=True, description="Version of package as present in requirements file"),
     "desired_version": fields.String(required=True, description="Desired version of given package"),
+    "installed_version": fields.String(description="Version of package installed in project environment"),
     "status": fields.String(required=True, description=""),
+    "installation_status": fields.String(description="Whether installed version satisfies requirement "
+                                                     "(i.e. 'installed', 'conflicting' or 'missing')"),
     "requirements_file_id": fields.Integer(required=True, attribute="requirements_file.id")
 }
 requirement_repr = requirements_namespace.model(  # pylint: disable=invalid-name
@@ -20,6 +20,7 @@ requirements_file_simple_repr_structure = {  # pylint: disable=invalid-name
     "id": fields.Integer(readOnly=True, description="Id of given requirements file, unique across the database"),
     "path": fields.String(required=True, description="Path to given requirements file (i.e. 'files/requirement.txt')"),
     "status": fields.String(required=True, description=""),
+    "installation_status": fields.String(description="Worst installation status of requirements in given file"),
     "project_id": fields.Integer(required=True, attribute="project.id"),
 }
 requirements_file_simple_repr = requirements_files_namespace.model(  # pylint: disable=invalid-name
@@ -4,6 +4,7 @@ from flask_restplus import Api
 
 from pipwatch_api.namespaces.v1.git_repository import git_repositories_namespace
 from pipwatch_api.namespaces.v1.namespaces import namespaces_namespace
+from pipwatch_api.namespaces.v1.namespaces_updates import namespaces_updates_namespace
 from pipwatch_api.namespaces.v1.projects import projects_namespace
 from pipwatch_api.namespaces.v1.projects_updates import projects_updates_namespace
 from pipwatch_api.namespaces.v1.requirements import requirements_namespace
@@ -26,6 +27,7 @@ def get_api_version_one() -> Blueprint:
     api_version_one.add_namespace(namespaces_namespace)
     api_version_one.add_namespace(projects_namespace)
     api_version_one.add_namespace(projects_updates_namespace)
+    api_version_one.add_namespace(namespaces_updates_namespace)
     api_version_one.add_namespace(requirements_namespace)
     api_version_one.add_namespace(requirements_files_namespace)
     api_version_one.add_namespace(tags_namespace)
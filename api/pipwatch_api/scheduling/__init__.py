@@ -0,0 +1 @@
+"""This package contains logic of scheduling periodic updates of projects."""
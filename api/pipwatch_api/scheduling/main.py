@@ -0,0 +1,30 @@
+"""This module contains logic responsible starting the pipwatch scheduler."""
+
+from logging import getLogger, Logger  # noqa: F401 Imported for type definition
+
+from flask import Flask
+
+from pipwatch_api.core.configuration import configure_flask_application, configure_logger, configure_sqlalchemy
+from pipwatch_api.datastore.models import DATABASE
+from pipwatch_api.scheduling.scheduler import Scheduler
+
+
+def main() -> None:
+    """Function to start the scheduler (alongside the api, using the same database)."""
+    configure_logger()
+    log: Logger = getLogger(__name__)
+
+    log.info("Attempting to start scheduler")
+    app = Flask(__name__)
+    configure_flask_application(application=app, settings_override={
+        "PIPWATCH_API_RESET_DB_ON_START": False,
+        "PIPWATCH_API_SEED_DB": False
+    })
+    configure_sqlalchemy(application=app, sql_alchemy_instance=DATABASE)
+
+    with app.app_context():
+        Scheduler.from_config(logger=log).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""This module contains scheduler, which periodically requests updates of projects."""
+from collections import defaultdict
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from datetime import datetime, timedelta
+from logging import Logger, getLogger
+import random
+import time
+from typing import Dict, List, Optional, Set  # noqa: F401 Imported for type definition
+
+from sqlalchemy import or_
+
+from pipwatch_api.celery_components.broker import ProjectUpdateBroker
+from pipwatch_api.core.configuration import load_config_file
+from pipwatch_api.datastore.models import DATABASE, Namespace, Project
+
+
+class RateBudget:
+    """Token bucket - allows spending up to 'per_hour' units per hour, refilled continuously.
+
+    Spending more than is left is allowed only when bucket is full (so that cost exceeding whole
+    budget does not starve forever), which leaves the bucket in debt until it is refilled.
+    """
+
+    def __init__(self, per_hour: int, now: float = None) -> None:
+        """Create class instance (with full bucket)."""
+        self.per_hour = per_hour
+        self.tokens = float(per_hour)
+        self.updated_at = time.time() if now is None else now
+
+    def try_spend(self, cost: int, now: float = None) -> bool:
+        """Spend given number of units, if budget allows it."""
+        now = time.time() if now is None else now
+        self.tokens = min(self.tokens + (now - self.updated_at) * self.per_hour / 3600, float(self.per_hour))
+        self.updated_at = now
+        if self.tokens < min(cost, self.per_hour):
+            return False
+
+        self.tokens -= cost
+        return True
+
+
+class Scheduler:  # pylint: disable=too-many-instance-attributes
+    """Encompasses logic of requesting updates of projects according to their cadence.
+
+    Cadence is 'update_interval' of project (or of its namespace). First update of each project is
+    scheduled at random point of its interval and the following ones are spread by 'jitter' (fraction
+    of the interval), so that projects added at once are not updated at once. Updates are requested
+    with 'scheduled' priority class and only while namespace of the project has not reached its
+    limit of updates running at once and its budget of package index lookups (estimated by number
+    of requirements of the project). When there are more than 'max_queue_depth' tasks waiting in
+    queues, scheduler backs off exponentially (up to 'max_backoff' seconds).
+
+    Running updates and budgets are kept in memory, so only one scheduler should be run.
+    """
+
+    PRIORITY_CLASS = "scheduled"
+    DEFAULT_TICK_INTERVAL = 30
+    DEFAULT_JITTER = 0.1
+    DEFAULT_MAX_QUEUE_DEPTH = 100
+    DEFAULT_MAX_BACKOFF = 600
+
+    def __init__(self, broker: ProjectUpdateBroker = None,  # pylint: disable=too-many-arguments
+                 tick_interval: float = None,
+                 jitter: float = None,
+                 default_update_interval: int = 0,
+                 default_max_concurrent_updates: int = 0,
+                 default_index_requests_budget: int = 0,
+                 max_queue_depth: int = None,
+                 max_backoff: float = None,
+                 logger: Logger = None) -> None:
+        """Create class instance (zero means there is no limit, or no updates when it comes to interval)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.broker = broker or ProjectUpdateBroker(logger=self.log)
+        self.tick_interval = tick_interval or self.DEFAULT_TICK_INTERVAL
+        self.jitter = self.DEFAULT_JITTER if jitter is None else jitter
+        self.default_update_interval = default_update_interval
+        self.default_max_concurrent_updates = default_max_concurrent_updates
+        self.default_index_requests_budget = default_index_requests_budget
+        self.max_queue_depth = self.DEFAULT_MAX_QUEUE_DEPTH if max_queue_depth is None else max_queue_depth
+        self.max_backoff = self.DEFAULT_MAX_BACKOFF if max_backoff is None else max_backoff
+
+        self.backoff = 0.0
+        self.running_updates: Dict[Optional[int], Set[str]] = defaultdict(set)
+        self.budgets: Dict[Optional[int], RateBudget] = {}
+
+    @classmethod
+    def from_config(cls, logger: Logger = None) -> "Scheduler":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "scheduler"
+        return cls(
+            tick_interval=configuration.getfloat(
+                section=section, option="tick_interval", fallback=cls.DEFAULT_TICK_INTERVAL
+            ),
+            jitter=configuration.getfloat(section=section, option="jitter", fallback=cls.DEFAULT_JITTER),
+            default_update_interval=configuration.getint(section=section, option="update_interval", fallback=0),
+            default_max_concurrent_updates=configuration.getint(
+                section=section, option="max_concurrent_updates", fallback=0
+            ),
+            default_index_requests_budget=configuration.getint(
+                section=section, option="index_requests_budget", fallback=0
+            ),
+            max_queue_depth=configuration.getint(
+                section=section, option="max_queue_depth", fallback=cls.DEFAULT_MAX_QUEUE_DEPTH
+            ),
+            max_backoff=configuration.getfloat(section=section, option="max_backoff", fallback=cls.DEFAULT_MAX_BACKOFF),
+            logger=logger
+        )
+
+    def run(self) -> None:
+        """Request updates of due projects, for as long as process runs."""
+        self.log.info("Scheduler started.")
+        while True:
+            try:
+                wait = self.tick()
+            except Exception:  # pylint: disable=broad-except
+                self.log.exception("Unable to request updates of due projects.")
+                DATABASE.session.rollback()
+                wait = self.tick_interval
+
+            time.sleep(wait)
+
+    def tick(self, now: datetime = None) -> float:
+        """Request updates of projects which are due, return number of seconds to wait for before next tick."""
+        now = now or datetime.utcnow()
+        queues_depth = self.broker.get_queues_depth()
+        if self.max_queue_depth and queues_depth is not None and queues_depth > self.max_queue_depth:
+            self.backoff = min(max(self.backoff * 2, self.tick_interval), self.max_backoff)
+            self.log.warning("There are {depth} tasks waiting in queues, backing off for {backoff} seconds.".format(
+                depth=queues_depth,
+                backoff=self.backoff
+            ))
+            return self.tick_interval + self.backoff
+
+        self.backoff = 0.0
+        self._forget_finished_updates()
+        for project in self._get_due_projects(now=now):
+            self._schedule(project=project, now=now)
+
+        DATABASE.session.commit()
+        return self.tick_interval
+
+    def get_update_interval(self, project: Project) -> int:
+        """Return number of seconds between updates of given project (zero if it should not be updated)."""
+        namespace_interval = project.namespace.update_interval if project.namespace else None
+        return project.update_interval or namespace_interval or self.default_update_interval
+
+    @staticmethod
+    def get_index_requests_cost(project: Project) -> int:
+        """Estimate number of package index lookups update of given project makes."""
+        return max(sum(requirements_file.requirements.count() for requirements_file in project.requirements_files), 1)
+
+    def _get_due_projects(self, now: datetime) -> List[Project]:
+        """Return projects not scheduled yet or whose update is due (the most overdue ones first).
+
+        Projects without cadence (of their own, their namespace or default one) are left out.
+        """
+        query = Project.query.outerjoin(Namespace, Project.namespace_id == Namespace.id).filter(
+            or_(Project.next_update_at.is_(None), Project.next_update_at <= now)
+        )
+        if not self.default_update_interval:
+            query = query.filter(or_(Project.update_interval > 0, Namespace.update_interval > 0))
+
+        return query.order_by(Project.next_update_at).all()
+
+    def _schedule(self, project: Project, now: datetime) -> None:
+        """Request update of given project (or only schedule it, if it was not scheduled yet)."""
+        interval = self.get_update_interval(project=project)
+        if not interval:
+            return
+
+        if not project.next_update_at:
+            project.next_update_at = now + timedelta(seconds=random.uniform(0, interval))
+            return
+
+        if not self._is_within_limits(project=project):
+            return
+
+        task_id = self.broker.send_update_request(project_id=project.id, priority_class=self.PRIORITY_CLASS)
+        if task_id:
+            self.running_updates[project.namespace_id].add(task_id)
+
+        spread = interval * random.uniform(-self.jitter, self.jitter)
+        project.next_update_at = now + timedelta(seconds=interval + spread)
+
+    def _is_within_limits(self, project: Project) -> bool:
+        """Check if namespace of given project allows another update to be run (and take its share of budget)."""
+        namespace = project.namespace
+        max_concurrent_updates = (
+            namespace.max_concurrent_updates if namespace else None
+        ) or self.default_max_concurrent_updates
+        if max_concurrent_updates and len(self.running_updates[project.namespace_id]) >= max_concurrent_updates:
+            self.log.debug("Namespace of project {id} has reached its limit of running updates.".format(id=project.id))
+            return False
+
+        index_requests_budget = (
+            namespace.index_requests_budget if namespace else None
+        ) or self.default_index_requests_budget
+        if not index_requests_budget:
+            return True
+
+        budget = self.budgets.get(project.namespace_id)
+        if not budget or budget.per_hour != index_requests_budget:
+            budget = self.budgets[project.namespace_id] = RateBudget(per_hour=index_requests_budget)
+
+        if not budget.try_spend(cost=self.get_index_requests_cost(project=project)):
+            self.log.debug("Namespace of project {id} has used up its package index budget.".format(id=project.id))
+            return False
+
+        return True
+
+    def _forget_finished_updates(self) -> None:
+        """Stop counting updates which have already finished as running."""
+        for namespace_id, tasks_ids in self.running_updates.items():
+            self.running_updates[namespace_id] = {
+                task_id for task_id in tasks_ids if not self.broker.check_task(task_id=task_id).ready()
+            }
@@ -0,0 +1,130 @@
+"""This module contains unit tests for celery brokers."""
+import json
+
+import pytest
+
+from pipwatch_api.celery_components.broker import ProjectUpdateBroker
+
+
+@pytest.fixture()
+def project_update_broker(mocker) -> ProjectUpdateBroker:
+    """Return broker instance with mocked redis, datastore and celery task sending."""
+    mocker.patch("pipwatch_api.celery_components.broker.redis.StrictRedis.from_url")
+    broker = ProjectUpdateBroker()
+    broker.datastore = mocker.Mock()
+    broker.send_task = mocker.Mock(side_effect=lambda task_name, args, kwargs, task_id, queue, priority: task_id)
+    mocker.patch.object(ProjectUpdateBroker, "_get_queue", return_value="test-queue")
+    broker.check_task = mocker.Mock()
+    mocker.patch.object(ProjectUpdateBroker, "_get_update_request_payload", return_value={"id": 1})
+    return broker
+
+
+def test_send_update_request_sends_new_task(project_update_broker) -> None:
+    """Task should be sent when there is no pending update of the project."""
+    project_update_broker.redis.set.return_value = True
+
+    task_id = project_update_broker.send_update_request(project_id=1)
+
+    project_update_broker.send_task.assert_called_once()
+    assert project_update_broker.send_task.call_args[1]["task_id"] == task_id
+    assert project_update_broker.redis.set.call_args[0] == ("pipwatch:project-update-task:1", task_id)
+
+
+def test_send_update_request_returns_pending_task(project_update_broker) -> None:
+    """Id of queued or running update task of the project should be returned instead of sending another one."""
+    project_update_broker.redis.set.return_value = False
+    project_update_broker.redis.get.return_value = b"pending-task-id"
+    project_update_broker.check_task.return_value.ready.return_value = False
+
+    assert project_update_broker.send_update_request(project_id=1) == "pending-task-id"
+    project_update_broker.send_task.assert_not_called()
+    project_update_broker.check_task.assert_called_once_with(task_id="pending-task-id")
+
+
+def test_send_update_request_replaces_finished_task(project_update_broker) -> None:
+    """New task should be sent when previous update task of the project has already finished."""
+    project_update_broker.redis.set.return_value = False
+    project_update_broker.redis.get.return_value = b"finished-task-id"
+    project_update_broker.check_task.return_value.ready.return_value = True
+    project_update_broker.redis.eval.return_value = True
+
+    task_id = project_update_broker.send_update_request(project_id=1)
+
+    assert task_id != "finished-task-id"
+    project_update_broker.send_task.assert_called_once()
+    assert project_update_broker.redis.eval.call_args[0][3:5] == (b"finished-task-id", task_id)
+
+
+def test_send_update_request_without_coalescing(project_update_broker) -> None:
+    """Task should always be sent when coalescing of requests is disabled."""
+    project_update_broker.coalesce_requests = False
+
+    project_update_broker.send_update_request(project_id=1)
+
+    project_update_broker.send_task.assert_called_once()
+    project_update_broker.redis.set.assert_not_called()
+
+
+def test_send_update_request_of_unknown_project(project_update_broker) -> None:
+    """No task should be sent for project that does not exist."""
+    project_update_broker.datastore.read.return_value = None
+
+    assert project_update_broker.send_update_request(project_id=1) == ""
+    project_update_broker.send_task.assert_not_called()
+
+
+def test_send_update_request_with_priority_class(project_update_broker) -> None:
+    """Task should be sent with priority of its class and its route should be remembered."""
+    project_update_broker.coalesce_requests = False
+
+    task_id = project_update_broker.send_update_request(project_id=1, priority_class="backfill")
+
+    assert project_update_broker.send_task.call_args[1]["priority"] == 6
+    assert project_update_broker.send_task.call_args[1]["kwargs"] == {"priority_class": "backfill"}
+    key, _, route = project_update_broker.redis.setex.call_args[0]
+    assert key == "pipwatch:task-route:" + task_id
+    assert json.loads(route) == {"queue": "test-queue", "priority": 6}
+
+
+def test_get_queue_position(project_update_broker, mocker) -> None:
+    """Position should count tasks of more important classes and tasks sent earlier with the same priority."""
+    def get_message(task_id: str) -> bytes:
+        return json.dumps({"headers": {"id": task_id}}).encode()
+
+    broker_redis = mocker.Mock()
+    broker_redis.llen.return_value = 2
+    broker_redis.lrange.return_value = [get_message("later"), get_message("test-task-id"), get_message("earlier")]
+    mocker.patch("pipwatch_api.celery_components.broker.redis.StrictRedis.from_url", return_value=broker_redis)
+    project_update_broker.app.conf.broker_url = "redis://localhost:6379/0"
+    project_update_broker.redis.get.return_value = json.dumps({"queue": "test-queue", "priority": 3}).encode()
+    project_update_broker.redis.lrange.return_value = []
+    project_update_broker.default_task_duration = 100
+    project_update_broker.workers_concurrency = 2
+    mocker.patch("pipwatch_api.celery_components.broker.time.time", return_value=1000.0)
+
+    queue_position = project_update_broker.get_queue_position(task_id="test-task-id")
+
+    assert queue_position.position == 3
+    assert queue_position.estimated_start == 1150.0
+    broker_redis.llen.assert_called_once_with("test-queue")
+    broker_redis.lrange.assert_called_once_with("test-queue\x06\x163", 0, -1)
+
+
+def test_get_queue_position_of_task_not_in_queue(project_update_broker) -> None:
+    """No position should be told for task which is not known to wait in queue."""
+    project_update_broker.redis.get.return_value = None
+
+    assert project_update_broker.get_queue_position(task_id="test-task-id") is None
+
+
+def test_get_queues_depth(project_update_broker, mocker) -> None:
+    """Depth should count tasks of all priorities in fallback and shard queues."""
+    broker_redis = mocker.Mock()
+    broker_redis.llen.return_value = 2
+    mocker.patch("pipwatch_api.celery_components.broker.redis.StrictRedis.from_url", return_value=broker_redis)
+    project_update_broker.app.conf.broker_url = "redis://localhost:6379/0"
+    project_update_broker.router = mocker.Mock()
+    project_update_broker.router.ring.nodes = {"shard-0", "shard-1"}
+    project_update_broker.router.fallback_queue = "celery"
+
+    assert project_update_broker.get_queues_depth() == 24
@@ -0,0 +1,95 @@
+"""This module contains unit tests for routing of project tasks."""
+import time
+
+import pytest
+
+from pipwatch_api.celery_components.routing import get_routing_key, HashRing, ShardRouter
+
+
+SHARDS = ["shard-{}".format(shard) for shard in range(8)]
+KEYS = ["https://example.com/repository-{}.git".format(number) for number in range(1000)]
+
+
+@pytest.fixture()
+def shard_router(mocker) -> ShardRouter:
+    """Return router instance, whose workers consume all shards."""
+    mocker.patch.object(ShardRouter, "_live_queues", (0.0, set()))
+    app_mock = mocker.Mock()
+    app_mock.control.inspect.return_value.active_queues.return_value = {
+        "worker-{}".format(number): [{"name": "fallback"}, {"name": shard}] for number, shard in enumerate(SHARDS)
+    }
+    return ShardRouter(app=app_mock, shards=SHARDS, fallback_queue="fallback")
+
+
+def test_routing_key_ignores_url_formatting() -> None:
+    """Different spellings of the same repository url should be routed the same way."""
+    assert get_routing_key("https://Example.com/Repository.git") == get_routing_key("https://example.com/repository/")
+
+
+@pytest.mark.parametrize("repository_url", [
+    "git@github.com:Owner/Repository.git",
+    "ssh://git@github.com/owner/repository",
+    "https://user@github.com/Owner/Repository/",
+    "http://github.com/owner/repository.git"
+])
+def test_routing_key_is_the_same_for_ssh_and_https_urls(repository_url: str) -> None:
+    """Urls of the same repository over different protocols should be routed the same way."""
+    assert get_routing_key(repository_url) == get_routing_key("https://github.com/Owner/Repository.git")
+
+
+def test_routing_key_keeps_port_of_ssh_url() -> None:
+    """Port of ssh url should not be mistaken for scp-like path separator."""
+    assert get_routing_key("ssh://git@example.com:2222/owner/repository") == "example.com:2222/owner/repository"
+
+
+def test_hash_ring_spreads_keys_across_nodes() -> None:
+    """Every node should receive a fair share of keys."""
+    ring = HashRing(nodes=SHARDS)
+
+    counts = {shard: 0 for shard in SHARDS}
+    for key in KEYS:
+        counts[ring.get_node(key)] += 1
+
+    assert all(count > len(KEYS) / len(SHARDS) / 3 for count in counts.values())
+
+
+def test_hash_ring_moves_only_keys_of_removed_node() -> None:
+    """Removing a node should not change nodes of keys which did not belong to it."""
+    ring = HashRing(nodes=SHARDS)
+    before = {key: ring.get_node(key) for key in KEYS}
+
+    ring.remove_node("shard-3")
+
+    assert all(ring.get_node(key) == node for key, node in before.items() if node != "shard-3")
+    assert all(ring.get_node(key) != "shard-3" for key in KEYS)
+
+
+def test_empty_hash_ring_has_no_nodes() -> None:
+    """Empty ring should not return any node."""
+    assert HashRing().get_node("key") is None
+
+
+def test_router_sends_key_to_its_shard(shard_router) -> None:
+    """Task should be sent to the queue of shard its key belongs to."""
+    assert shard_router.get_queue(KEYS[0]) == HashRing(nodes=SHARDS).get_node(KEYS[0])
+
+
+def test_router_skips_shards_without_workers(shard_router) -> None:
+    """Task should be sent to the next shard on the ring, when no worker consumes its own shard."""
+    own_shard = shard_router.ring.get_node(KEYS[0])
+    next_shard = list(shard_router.ring.iterate_nodes(KEYS[0]))[1]
+    ShardRouter._live_queues = (time.time(), set(SHARDS) - {own_shard})
+
+    assert shard_router.get_queue(KEYS[0]) == next_shard
+
+
+def test_router_uses_fallback_queue_without_live_shards(shard_router) -> None:
+    """Task should be sent to fallback queue, when no worker consumes any shard."""
+    shard_router.app.control.inspect.return_value.active_queues.return_value = None
+
+    assert shard_router.get_queue(KEYS[0]) == "fallback"
+
+
+def test_disabled_router_uses_fallback_queue(mocker) -> None:
+    """Router without shards should always use fallback queue."""
+    assert ShardRouter(app=mocker.Mock(), fallback_queue="fallback").get_queue(KEYS[0]) == "fallback"
@@ -0,0 +1,29 @@
+"""This module contains unit tests for namespaces-updates resource."""
+
+from tests.utils import JSONResponse
+
+
+def test_post_creates_a_new_task(app_client, mocker) -> None:
+    """Endpoint should fire namespace update task."""
+    update_broker_mock = mocker.patch("pipwatch_api.namespaces.v1.namespaces_updates.NamespaceUpdateBroker")
+    update_broker_mock.return_value.send_namespace_update_request.return_value = "celery-task-id"
+
+    response: JSONResponse = app_client.post("/api/v1/namespaces-updates/1", content_type="application/json")
+
+    assert response.status_code == 200
+    assert response.content_type == "application/json"
+    assert response.json == "celery-task-id"
+    update_broker_mock.return_value.send_namespace_update_request.assert_called_once_with(
+        namespace_id=1, priority_class="scheduled"
+    )
+
+
+def test_post_with_unknown_priority_class(app_client, mocker) -> None:
+    """Endpoint should refuse to fire namespace update task of unknown priority class."""
+    update_broker_mock = mocker.patch("pipwatch_api.namespaces.v1.namespaces_updates.NamespaceUpdateBroker")
+
+    response: JSONResponse = app_client.post("/api/v1/namespaces-updates/1?priority=urgent",
+                                             content_type="application/json")
+
+    assert response.status_code == 400
+    update_broker_mock.return_value.send_namespace_update_request.assert_not_called()
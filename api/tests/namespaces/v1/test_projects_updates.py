@@ -1,5 +1,6 @@
 """This module contains unit tests for projects-updates resource."""
 
+from pipwatch_api.celery_components.broker import QueuePosition
 from tests.namespaces.v1.conftest import AsyncResultMock
 from tests.utils import JSONResponse
 
@@ -14,6 +15,34 @@ def test_post_creates_a_new_task(app_client, mocker) -> None:
     assert response.status_code == 200
     assert response.content_type == "application/json"
     assert response.json == "celery-task-id"
+    update_broker_mock.return_value.send_update_request.assert_called_once_with(
+        project_id=1, priority_class="interactive"
+    )
+
+
+def test_post_with_priority_class(app_client, mocker) -> None:
+    """Endpoint should fire project update task of given priority class."""
+    update_broker_mock = mocker.patch("pipwatch_api.namespaces.v1.projects_updates.ProjectUpdateBroker")
+    update_broker_mock.return_value.send_update_request.return_value = "celery-task-id"
+
+    response: JSONResponse = app_client.post("/api/v1/projects-updates/1?priority=backfill",
+                                             content_type="application/json")
+
+    assert response.status_code == 200
+    update_broker_mock.return_value.send_update_request.assert_called_once_with(
+        project_id=1, priority_class="backfill"
+    )
+
+
+def test_post_with_unknown_priority_class(app_client, mocker) -> None:
+    """Endpoint should refuse to fire project update task of unknown priority class."""
+    update_broker_mock = mocker.patch("pipwatch_api.namespaces.v1.projects_updates.ProjectUpdateBroker")
+
+    response: JSONResponse = app_client.post("/api/v1/projects-updates/1?priority=urgent",
+                                             content_type="application/json")
+
+    assert response.status_code == 400
+    update_broker_mock.return_value.send_update_request.assert_not_called()
 
 
 def test_get_task_status(app_client, mocker) -> None:
@@ -28,5 +57,44 @@ def test_get_task_status(app_client, mocker) -> None:
     assert response.json == {
         "info": "'test-info'",
         "state": "test-state",
-        "taskId": "test-task-id"
+        "taskId": "test-task-id",
+        "noOp": False,
+        "queuePosition": None,
+        "estimatedStart": None
+    }
+
+
+def test_get_task_status_of_skipped_project(app_client, mocker) -> None:
+    """Endpoint should tell if project was skipped, as nothing has changed since it was last processed."""
+    update_broker_mock = mocker.patch("pipwatch_api.namespaces.v1.projects_updates.ProjectUpdateBroker")
+    update_broker_mock.return_value.check_task.return_value = AsyncResultMock(
+        {"no_op": True}, "SUCCESS", "test-task-id"
+    )
+
+    response: JSONResponse = app_client.get("/api/v1/projects-updates/test-task-id", content_type="application/json")
+
+    assert response.status_code == 200
+    assert response.json == {
+        "info": "{'no_op': True}",
+        "state": "SUCCESS",
+        "taskId": "test-task-id",
+        "noOp": True,
+        "queuePosition": None,
+        "estimatedStart": None
     }
+
+
+def test_get_task_status_of_queued_task(app_client, mocker) -> None:
+    """Endpoint should tell position of task waiting in queue and when it is estimated to start."""
+    update_broker_mock = mocker.patch("pipwatch_api.namespaces.v1.projects_updates.ProjectUpdateBroker")
+    update_broker_mock.return_value.check_task.return_value = AsyncResultMock(None, "PENDING", "test-task-id")
+    update_broker_mock.return_value.get_queue_position.return_value = QueuePosition(
+        position=3, estimated_start=0.0
+    )
+
+    response: JSONResponse = app_client.get("/api/v1/projects-updates/test-task-id", content_type="application/json")
+
+    assert response.status_code == 200
+    assert response.json["queuePosition"] == 3
+    assert response.json["estimatedStart"] == "1970-01-01T00:00:00"
+    update_broker_mock.return_value.get_queue_position.assert_called_once_with(task_id="test-task-id")
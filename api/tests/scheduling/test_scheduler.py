@@ -0,0 +1,152 @@
+"""This module contains unit tests for scheduler of projects updates."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from pipwatch_api.datastore.models import Namespace, Project, Requirement, RequirementsFile
+from pipwatch_api.scheduling.scheduler import RateBudget, Scheduler
+
+
+NOW = datetime(2018, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture()
+def scheduler(mocker) -> Scheduler:
+    """Return scheduler instance with mocked broker."""
+    broker = mocker.Mock()
+    broker.get_queues_depth.return_value = 0
+    broker.send_update_request.side_effect = lambda project_id, priority_class: "task-{}".format(project_id)
+    broker.check_task.return_value.ready.return_value = False
+    return Scheduler(broker=broker, tick_interval=30, jitter=0.1, max_queue_depth=10, max_backoff=120)
+
+
+def add_project(database, namespace: Namespace, name: str, next_update_at: datetime = None,
+                requirements_count: int = 1) -> Project:
+    """Add project with given number of requirements to the database."""
+    project = Project(name=name, check_command="tox")
+    project.next_update_at = next_update_at
+    namespace.projects.append(project)
+    requirements_file = RequirementsFile(path="requirements.txt", status="")
+    project.requirements_files.append(requirements_file)
+    for index in range(requirements_count):
+        requirements_file.requirements.append(Requirement(name="package-{}".format(index)))
+
+    database.session.add(project)
+    database.session.flush()
+    return project
+
+
+def test_first_update_is_scheduled_within_interval(database, scheduler) -> None:
+    """Projects which were not scheduled yet should be spread over their interval, not updated at once."""
+    namespace = Namespace(name="test-namespace", update_interval=3600)
+    projects = [add_project(database, namespace=namespace, name="project-{}".format(index)) for index in range(5)]
+
+    scheduler.tick(now=NOW)
+
+    scheduler.broker.send_update_request.assert_not_called()
+    assert all(NOW <= project.next_update_at <= NOW + timedelta(seconds=3600) for project in projects)
+
+
+def test_due_project_is_updated_and_rescheduled(database, scheduler) -> None:
+    """Update of due project should be requested and its next update scheduled after interval, with jitter."""
+    namespace = Namespace(name="test-namespace", update_interval=3600)
+    project = add_project(database, namespace=namespace, name="due", next_update_at=NOW - timedelta(seconds=1))
+    not_due_project = add_project(database, namespace=namespace, name="not-due", next_update_at=NOW + timedelta(1))
+
+    scheduler.tick(now=NOW)
+
+    scheduler.broker.send_update_request.assert_called_once_with(project_id=project.id, priority_class="scheduled")
+    assert NOW + timedelta(seconds=3240) <= project.next_update_at <= NOW + timedelta(seconds=3960)
+    assert not_due_project.next_update_at == NOW + timedelta(1)
+
+
+def test_project_without_interval_is_not_updated(database, scheduler) -> None:
+    """Projects without cadence (of their own, their namespace or default one) should not be updated."""
+    namespace = Namespace(name="test-namespace")
+    project = add_project(database, namespace=namespace, name="project")
+
+    scheduler.tick(now=NOW)
+
+    scheduler.broker.send_update_request.assert_not_called()
+    assert project.next_update_at is None
+
+
+def test_projects_without_interval_are_not_loaded(database, scheduler) -> None:
+    """Projects without cadence should not be evaluated on every tick."""
+    namespace = Namespace(name="test-namespace")
+    add_project(database, namespace=namespace, name="unscheduled")
+    own_interval_project = add_project(database, namespace=namespace, name="own-interval")
+    own_interval_project.update_interval = 3600
+    other_namespace = Namespace(name="other-namespace", update_interval=3600)
+    namespace_interval_project = add_project(database, namespace=other_namespace, name="namespace-interval")
+
+    due_projects = scheduler._get_due_projects(now=NOW)  # pylint: disable=protected-access
+
+    assert sorted(due_projects, key=lambda project: project.name) == [namespace_interval_project, own_interval_project]
+
+
+def test_project_whose_interval_was_removed_is_not_loaded(database, scheduler) -> None:
+    """Project which lost its cadence should stop being evaluated, even though its update was due."""
+    namespace = Namespace(name="test-namespace")
+    project = add_project(database, namespace=namespace, name="project", next_update_at=NOW - timedelta(seconds=1))
+    project.update_interval = 3600
+    scheduler.tick(now=NOW)
+    project.update_interval = None
+
+    scheduler.tick(now=NOW + timedelta(seconds=7200))
+
+    scheduler.broker.send_update_request.assert_called_once()
+    assert scheduler._get_due_projects(now=NOW + timedelta(seconds=7200)) == []  # pylint: disable=protected-access
+
+
+def test_namespace_concurrency_limit(database, scheduler) -> None:
+    """No more updates of namespace projects should be requested than it allows to run at once."""
+    namespace = Namespace(name="test-namespace", update_interval=3600)
+    namespace.max_concurrent_updates = 2
+    for index in range(3):
+        add_project(database, namespace=namespace, name="project-{}".format(index), next_update_at=NOW)
+
+    scheduler.tick(now=NOW)
+    assert scheduler.broker.send_update_request.call_count == 2
+
+    scheduler.broker.check_task.return_value.ready.return_value = True
+    scheduler.tick(now=NOW)
+    assert scheduler.broker.send_update_request.call_count == 3
+
+
+def test_namespace_index_requests_budget(database, scheduler) -> None:
+    """Updates should not be requested once namespace has used up its package index budget."""
+    namespace = Namespace(name="test-namespace", update_interval=3600)
+    namespace.index_requests_budget = 10
+    for index in range(3):
+        add_project(database, namespace=namespace, name="project-{}".format(index), next_update_at=NOW,
+                    requirements_count=4)
+
+    scheduler.tick(now=NOW)
+
+    assert scheduler.broker.send_update_request.call_count == 2
+
+
+def test_backs_off_when_queues_are_deep(database, scheduler) -> None:
+    """Updates should not be requested while too many tasks wait in queues, pauses should grow."""
+    namespace = Namespace(name="test-namespace", update_interval=3600)
+    add_project(database, namespace=namespace, name="project", next_update_at=NOW)
+    scheduler.broker.get_queues_depth.return_value = 11
+
+    assert [scheduler.tick(now=NOW) for _ in range(4)] == [60, 90, 150, 150]
+    scheduler.broker.send_update_request.assert_not_called()
+
+    scheduler.broker.get_queues_depth.return_value = 0
+    assert scheduler.tick(now=NOW) == 30
+    scheduler.broker.send_update_request.assert_called_once()
+
+
+def test_rate_budget_is_refilled() -> None:
+    """Budget should be refilled continuously, cost exceeding whole budget should be allowed when it is full."""
+    budget = RateBudget(per_hour=10, now=0)
+
+    assert budget.try_spend(cost=8, now=0)
+    assert not budget.try_spend(cost=8, now=0)
+    assert budget.try_spend(cost=8, now=2160)
+    assert not budget.try_spend(cost=20, now=2160)
+    assert budget.try_spend(cost=20, now=7200)
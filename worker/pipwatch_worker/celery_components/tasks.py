@@ -1,25 +1,346 @@
 """This module contains celery tasks available for the worker."""
+from itertools import chain
 from logging import getLogger, Logger  # noqa: F401 Imported for type definition
-from typing import Any, Dict
+import math
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Union  # noqa: F401 Imported for type definition
+import uuid
+
+from celery import chord, Signature, states, Task
+from celery.signals import worker_ready
 
 from pipwatch_worker.celery_components.application import app
-from pipwatch_worker.core.configuration import configure_logger
+from pipwatch_worker.core.configuration import configure_logger, load_config_file
 from pipwatch_worker.core.data_models import Project
+from pipwatch_worker.core.utils import get_broker_priority, normalize_package_name, PriorityClass
+from pipwatch_worker.index.bulk import BulkPackageIndex
+from pipwatch_worker.index.metadata import PackageMetadata
+from pipwatch_worker.worker.cache_manager import CacheManager
+from pipwatch_worker.worker.check_results import CheckResultsCache
+from pipwatch_worker.worker.commands import RepositoriesCacheMixin
+from pipwatch_worker.worker.pipeline import PipelineItem, ProjectPipeline
+from pipwatch_worker.worker.project_lock import ProjectLock, ProjectLocked
+from pipwatch_worker.worker.slots import ConcurrencySlots, NoSlotAvailable
+from pipwatch_worker.worker.states import States
 from pipwatch_worker.worker.worker import Worker
 
 
 configure_logger()
 log: Logger = getLogger(__name__)
 
+NO_SLOT_RETRY_COUNTDOWN = 10
+# State reported in summaries of projects which batch task handed over to separate tasks
+DEFERRED_STATE = "Deferred"
+
+
+def get_cache_path() -> str:
+    """Return full path to repositories cache of this host."""
+    repositories_cache = RepositoriesCacheMixin()
+    return os.path.join(
+        repositories_cache.repositories_cache_path,
+        repositories_cache.repositories_cache_dir_name
+    )
+
+
+@worker_ready.connect
+def start_cache_manager(**_) -> None:
+    """Start evicting least recently used entries of repositories cache in background (once per worker)."""
+    CacheManager.from_config(cache_path=get_cache_path(), logger=log).start()
+
+
+def retry_later(task: Task, exception: Exception, countdown: float, max_wait: float) -> None:
+    """Retry given task after countdown, or return once it waited max_wait seconds in total (task gives up then)."""
+    max_retries = max(1, math.ceil(max_wait / countdown))
+    if task.request.retries >= max_retries:
+        log.error("{message} Giving up after {retries} retries.".format(message=exception, retries=max_retries))
+        return
+
+    log.info("{message} Retrying in {countdown} seconds.".format(message=exception, countdown=countdown))
+    raise task.retry(exc=exception, countdown=countdown, max_retries=max_retries)
+
+
+def get_gave_up_summary(project_id: int, exception: Exception) -> Dict[str, Any]:
+    """Return summary of project which task gave up waiting for (lock or slot), as failed one."""
+    return {
+        "project_id": project_id,
+        "state": States.FAILURE.value,
+        "no_op": False,
+        "accepted_packages": [],
+        "rejected_packages": [],
+        "reason": str(exception)
+    }
+
+
+def get_package_names(processing_request: Dict[str, Any]) -> List[str]:
+    """Return (normalized) names of packages required by project of given processing request."""
+    return sorted({
+        normalize_package_name(requirement["name"]) for requirement in chain.from_iterable(
+            requirements_file.get("requirements") or []
+            for requirements_file in processing_request.get("requirements_files") or []
+        )
+    })
+
+
+def serialize_packages_metadata(packages_metadata: Dict[str, Optional[PackageMetadata]],
+                                package_names: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Return metadata of given packages in form that can be sent along with a task.
+
+    Packages whose metadata could not be resolved are left out (rather than sent as unknown to the
+    index), so that the task attempts to resolve them again.
+    """
+    return {
+        name: packages_metadata[name]._asdict() if packages_metadata[name] else None  # type: ignore
+        for name in package_names if name in packages_metadata
+    }
+
+
+def deserialize_packages_metadata(
+        packages_metadata: Optional[Dict[str, Optional[Dict[str, Any]]]]
+) -> Optional[Dict[str, Optional[PackageMetadata]]]:
+    """Return metadata of packages sent along with a task."""
+    if packages_metadata is None:
+        return None
+
+    return {name: PackageMetadata(**metadata) if metadata else None for name, metadata in packages_metadata.items()}
+
+
+def get_projects_tasks(processing_requests: List[Dict[str, Any]],  # pylint: disable=too-many-arguments
+                       tasks_ids: List[str],
+                       queues: List[Optional[str]],
+                       packages_metadata: Dict[str, Optional[PackageMetadata]],
+                       priority_class: str,
+                       batch_size: int = 1) -> List[Signature]:
+    """Return signatures of tasks processing given projects, each with its own task id.
+
+    Projects sent to the same queue are processed in batches of given size (see 'process_projects'),
+    unless the size is one - then each project gets its own 'process_project' task.
+    """
+    packages_names = [get_package_names(processing_request=request) for request in processing_requests]
+    if batch_size <= 1:
+        return [
+            process_project.s(
+                processing_request=request,
+                packages_metadata=serialize_packages_metadata(
+                    packages_metadata=packages_metadata,
+                    package_names=package_names
+                ),
+                priority_class=priority_class
+            ).set(
+                task_id=task_id,
+                queue=queue,
+                priority=get_broker_priority(priority_class)
+            ) for request, task_id, package_names, queue in zip(processing_requests, tasks_ids, packages_names, queues)
+        ]
+
+    indices_by_queue: Dict[Optional[str], List[int]] = {}
+    for index, queue in enumerate(queues):
+        indices_by_queue.setdefault(queue, []).append(index)
 
-@app.task(bind=True)
-def process_project(self, processing_request: Dict[str, Any]) -> None:
-    """Check if packages in given project may be updated."""
+    tasks = []
+    for queue, indices in indices_by_queue.items():
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start:start + batch_size]
+            tasks.append(process_projects.s(
+                processing_requests=[processing_requests[index] for index in batch],
+                tasks_ids=[tasks_ids[index] for index in batch],
+                packages_metadata=serialize_packages_metadata(
+                    packages_metadata=packages_metadata,
+                    package_names=chain.from_iterable(packages_names[index] for index in batch)
+                ),
+                priority_class=priority_class
+            ).set(
+                queue=queue,
+                priority=get_broker_priority(priority_class)
+            ))
+
+    return tasks
+
+
+@app.task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def process_project(self, processing_request: Dict[str, Any],
+                    packages_metadata: Dict[str, Optional[Dict[str, Any]]] = None,
+                    priority_class: str = PriorityClass.INTERACTIVE.value) -> Dict[str, Any]:
+    """Check if packages in given project may be updated, return summary of the outcome.
+
+    Metadata of packages resolved beforehand (see 'process_namespace') are not resolved again.
+    Project is processed by single worker at a time and only when there is a slot available for
+    tasks of its priority class (see ConcurrencySlots) - otherwise task is retried later, until it
+    gives up after waiting for longer than lock or slots allow (see their 'max_wait') and reports
+    project as failed, so that namespace summary is not held back by it. Message is
+    acknowledged only once processing finishes, so that task of a worker that died is redelivered
+    and resumed from its last checkpoint (see Worker.run).
+    """
     log.debug("Starting task 'process_project'.")
     worker = Worker(update_celery_state_method=self.update_state, logger=log)
 
     log.debug("Attempting to deserialize project request.")
     project_processing_request: Project = Project.from_dict(dictionary=processing_request)
 
-    log.debug("Run starting.")
-    worker.run(project_to_process=project_processing_request)
+    slots = ConcurrencySlots.from_config(logger=log)
+    lock = ProjectLock.from_config(project_id=project_processing_request.id, logger=log)
+    try:
+        with slots.acquire(priority_class=priority_class, task_id=self.request.id or ""), lock:
+            log.debug("Run starting.")
+            started_at = time.time()
+            summary = worker.run(
+                project_to_process=project_processing_request,
+                packages_metadata=deserialize_packages_metadata(packages_metadata=packages_metadata)
+            )
+            slots.record_duration(priority_class=priority_class, duration=time.time() - started_at)
+            return summary
+    except NoSlotAvailable as exception:
+        retry_later(task=self, exception=exception, countdown=NO_SLOT_RETRY_COUNTDOWN, max_wait=slots.max_wait)
+        return get_gave_up_summary(project_id=project_processing_request.id, exception=exception)
+    except ProjectLocked as exception:
+        retry_later(task=self, exception=exception, countdown=lock.ttl, max_wait=lock.max_wait)
+        return get_gave_up_summary(project_id=project_processing_request.id, exception=exception)
+
+
+@app.task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def process_projects(self, processing_requests: List[Dict[str, Any]], tasks_ids: List[str],
+                     packages_metadata: Dict[str, Optional[Dict[str, Any]]] = None,
+                     priority_class: str = PriorityClass.SCHEDULED.value) -> List[Dict[str, Any]]:
+    """Process given projects in a row, return summaries of their outcomes.
+
+    Repositories and packages of upcoming projects are fetched while current one is processed (see
+    ProjectPipeline). States and summary of each project are reported under its own task id, as if
+    it was processed by 'process_project' task. Projects being processed by another worker are sent
+    as separate 'process_project' tasks (with their task ids) and reported in deferred state. When
+    task gives up waiting for a slot, all of its projects are reported as failed.
+    """
+    log.debug("Starting task 'process_projects' for {count} projects.".format(count=len(processing_requests)))
+    pipeline = ProjectPipeline.from_config(update_state=self.update_state, logger=log)
+    requests_by_task_id = dict(zip(tasks_ids, processing_requests))
+
+    slots = ConcurrencySlots.from_config(logger=log)
+    try:
+        with slots.acquire(priority_class=priority_class, task_id=self.request.id or ""):
+            started_at = time.time()
+            summaries = pipeline(
+                items=[
+                    PipelineItem(task_id=task_id, project=Project.from_dict(dictionary=request))
+                    for task_id, request in requests_by_task_id.items()
+                ],
+                packages_metadata=deserialize_packages_metadata(packages_metadata=packages_metadata)
+            )
+            if summaries:
+                slots.record_duration(priority_class=priority_class,
+                                      duration=(time.time() - started_at) / len(summaries))
+    except NoSlotAvailable as exception:
+        retry_later(task=self, exception=exception, countdown=NO_SLOT_RETRY_COUNTDOWN, max_wait=slots.max_wait)
+        summaries = []
+        for task_id, request in requests_by_task_id.items():
+            summary = dict(get_gave_up_summary(project_id=request.get("id"), exception=exception), task_id=task_id)
+            self.update_state(task_id=task_id, state=states.SUCCESS, meta=summary)
+            summaries.append(summary)
+        return summaries
+
+    for item in pipeline.deferred:
+        process_project.apply_async(
+            kwargs={
+                "processing_request": requests_by_task_id[item.task_id],
+                "packages_metadata": packages_metadata,
+                "priority_class": priority_class
+            },
+            task_id=item.task_id,
+            queue=(self.request.delivery_info or {}).get("routing_key"),
+            priority=get_broker_priority(priority_class)
+        )
+        summaries.append({
+            "project_id": item.project.id,
+            "task_id": item.task_id,
+            "state": DEFERRED_STATE,
+            "no_op": False,
+            "accepted_packages": [],
+            "rejected_packages": []
+        })
+
+    return summaries
+
+
+@app.task
+def process_namespace(namespace_id: int, processing_requests: List[Dict[str, Any]],
+                      queues: List[Optional[str]] = None,
+                      priority_class: str = PriorityClass.SCHEDULED.value) -> Dict[str, Any]:
+    """Process all projects of given namespace at once.
+
+    Packages required by any of the projects are resolved once, up front, and each project task gets
+    metadata of its own packages along with the request (and is sent to queue chosen for the project,
+    if given, with priority of given class). Packages whose lookup failed are resolved by project
+    tasks themselves. Projects sent to the same queue may be processed in batches (see
+    'process_projects'). Outcomes of all project tasks are gathered by 'summarize_namespace' task,
+    whose id is returned along with task ids of each project.
+    """
+    log.debug("Starting task 'process_namespace' for {count} projects.".format(count=len(processing_requests)))
+    packages_metadata = BulkPackageIndex.from_config(logger=log).get_metadata(
+        package_names=chain.from_iterable(
+            get_package_names(processing_request=request) for request in processing_requests
+        )
+    )
+    log.info("Resolved metadata of {count} packages required by namespace {namespace_id}.".format(
+        count=len(packages_metadata),
+        namespace_id=namespace_id
+    ))
+
+    summary = {
+        "namespace_id": namespace_id,
+        "projects_count": len(processing_requests),
+        "packages_count": len(packages_metadata),
+        "summary_task_id": None,
+        "projects_tasks_ids": {}
+    }
+    if not processing_requests:
+        return summary
+
+    tasks_ids = [str(uuid.uuid4()) for _ in processing_requests]
+    result = chord(get_projects_tasks(
+        processing_requests=processing_requests,
+        tasks_ids=tasks_ids,
+        queues=queues or [None] * len(processing_requests),
+        packages_metadata=packages_metadata,
+        priority_class=priority_class,
+        batch_size=load_config_file().getint(section="pipeline", option="batch_size", fallback=1)
+    ))(summarize_namespace.s(namespace_id=namespace_id))
+    summary["summary_task_id"] = result.id
+    summary["projects_tasks_ids"] = {
+        request.get("id"): task_id for request, task_id in zip(processing_requests, tasks_ids)
+    }
+    return summary
+
+
+@app.task
+def summarize_namespace(projects_summaries: List[Union[Dict[str, Any], List[Dict[str, Any]]]],
+                        namespace_id: int) -> Dict[str, Any]:
+    """Gather outcomes of processing all projects of given namespace (by single and batch tasks alike).
+
+    Outcomes of projects deferred by batch tasks are reported by their own tasks (see 'process_projects').
+    """
+    projects_summaries = [
+        summary for summary in chain.from_iterable(
+            summaries if isinstance(summaries, list) else [summaries] for summaries in projects_summaries
+        ) if summary
+    ]
+    return {
+        "namespace_id": namespace_id,
+        "projects": projects_summaries,
+        "failed_count": sum(1 for summary in projects_summaries if summary.get("state") == States.FAILURE.value),
+        "deferred_count": sum(1 for summary in projects_summaries if summary.get("state") == DEFERRED_STATE),
+        "no_op_count": sum(1 for summary in projects_summaries if summary.get("no_op"))
+    }
+
+
+@app.task
+def prewarm_packages_metadata(package_names: List[str]) -> int:
+    """Resolve metadata of given packages, so that following project checks are served from cache."""
+    log.debug("Starting task 'prewarm_packages_metadata' for {count} packages.".format(count=len(package_names)))
+    packages_metadata = BulkPackageIndex.from_config(logger=log).get_metadata(package_names=package_names)
+    return sum(1 for metadata in packages_metadata.values() if metadata)
+
+
+@app.task
+def invalidate_check_results(tree_hash: str = None, check_command: str = None) -> int:
+    """Forget recorded outcomes of check command (all of them, or only of given tree / check command)."""
+    log.debug("Starting task 'invalidate_check_results'.")
+    check_results = CheckResultsCache.from_config(cache_path=get_cache_path(), logger=log)
+    return check_results.invalidate(tree_hash=tree_hash, check_command=check_command)
@@ -3,9 +3,10 @@
 from configparser import ConfigParser
 from logging import config
 from os import path
-from typing import Optional
+from typing import List, Optional
 
 from celery import Celery  # noqa: F401 Imported for type definition
+from kombu import Queue
 
 # Disable line too long warnings - configuration looks better in one line.
 # pylint: disable=line-too-long
@@ -42,5 +43,28 @@ def configure_celery_app(celery_app: Celery) -> None:
         broker_url=configuration.get(section="celery", option="broker_url", fallback="redis://localhost:6379/0"),  # noqa: E501
         enable_utc=configuration.getboolean(section="celery", option="enable_utc", fallback=True),  # noqa: E501
         imports=configuration.get(section="celery", option="imports", fallback="pipwatch_worker.celery_components.tasks").split(","),  # noqa: E501
-        result_backend=configuration.get(section="celery", option="result_backend", fallback="redis://localhost:6379/0")  # noqa: E501
+        result_backend=configuration.get(section="celery", option="result_backend", fallback="redis://localhost:6379/0"),  # noqa: E501
+        # Messages reserved in advance would not be overtaken by more important ones
+        worker_prefetch_multiplier=configuration.getint(section="celery", option="prefetch_multiplier", fallback=1),  # noqa: E501
+        # Messages acknowledged late are redelivered if not acknowledged within visibility timeout
+        broker_transport_options={"visibility_timeout": configuration.getint(section="celery", option="visibility_timeout", fallback=3600)}  # noqa: E501
     )
+
+    queues = get_consumed_queues()
+    if queues:
+        celery_app.conf.task_queues = [Queue(name) for name in queues]
+
+
+def get_consumed_queues() -> List[str]:
+    """Return names of queues worker consumes - default and fallback ones, along with its shards (if any).
+
+    Shard queues receive tasks of projects routed to them by the api (see its ShardRouter).
+    """
+    configuration: ConfigParser = load_config_file()
+    shards = [shard.strip() for shard in configuration.get(section="routing", option="shards", fallback="").split(",") if shard.strip()]  # noqa: E501
+    if not shards:
+        return []
+
+    queue_prefix = configuration.get(section="routing", option="queue_prefix", fallback="pipwatch-shard-")
+    fallback_queue = configuration.get(section="routing", option="fallback_queue", fallback="celery")
+    return sorted({"celery", fallback_queue}) + ["{prefix}{shard}".format(prefix=queue_prefix, shard=shard) for shard in shards]  # noqa: E501
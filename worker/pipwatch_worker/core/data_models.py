@@ -79,11 +79,14 @@ class GitRepository:
 class RequirementSchema(marshmallow.Schema):
     """Marshmellow schema of Requirement class - allows for easy serialization/deserialization."""
 
-    id = marshmallow.fields.Int()  # pylint: disable=invalid-name
+    # Requirements found by parsing requirements files are not known to the api yet
+    id = marshmallow.fields.Int(allow_none=True)  # pylint: disable=invalid-name
     name = marshmallow.fields.Str()
-    current_version = marshmallow.fields.Str()
-    desired_version = marshmallow.fields.Str()
-    status = marshmallow.fields.Str()
+    current_version = marshmallow.fields.Str(allow_none=True)
+    desired_version = marshmallow.fields.Str(allow_none=True)
+    installed_version = marshmallow.fields.Str(allow_none=True)
+    installation_status = marshmallow.fields.Str(allow_none=True)
+    status = marshmallow.fields.Str(allow_none=True)
 
     @marshmallow.post_load
     def to_requirement(self, data: Dict[Any, Any]) -> "Requirement":  # pylint: disable=no-self-use
@@ -101,12 +104,16 @@ class Requirement:
                  name: str = None,
                  current_version: str = None,
                  desired_version: str = None,
+                 installed_version: str = None,
+                 installation_status: str = None,
                  status: str = None) -> None:
         """Initialize class instance."""
         self.id = id  # pylint: disable=invalid-name
         self.name = name
         self.current_version = current_version
         self.desired_version = desired_version
+        self.installed_version = installed_version
+        self.installation_status = installation_status
         self.status = status
 
     def to_dict(self) -> Dict[str, Any]:
@@ -130,6 +137,8 @@ class Requirement:
             "{self.name!r},"
             "{self.current_version!r},"
             "{self.desired_version!r},"
+            "{self.installed_version!r},"
+            "{self.installation_status!r},"
             "{self.status!r})"
             ">".format(
                 class_name=self.__class__.__module__ + "." + self.__class__.__name__,
@@ -144,6 +153,7 @@ class RequirementsFileSchema(marshmallow.Schema):
     id = marshmallow.fields.Int()  # pylint: disable=invalid-name
     path = marshmallow.fields.Str()
     status = marshmallow.fields.Str()
+    installation_status = marshmallow.fields.Str(allow_none=True)
     requirements = marshmallow.fields.Nested(RequirementSchema, many=True)
 
     @marshmallow.post_load
@@ -157,15 +167,17 @@ class RequirementsFile:
 
     SCHEMA = RequirementsFileSchema(strict=True)
 
-    def __init__(self,
+    def __init__(self,  # pylint: disable=too-many-arguments
                  id: int,  # pylint: disable=redefined-builtin
                  path: str,
                  status: str,
-                 requirements: List[Requirement]) -> None:
+                 requirements: List[Requirement],
+                 installation_status: str = None) -> None:
         """Initialize class instance."""
         self.id: int = id  # pylint: disable=invalid-name
         self.path: str = path
         self.status: str = status
+        self.installation_status: str = installation_status
 
         self.requirements: List[Requirement] = requirements
 
@@ -188,7 +200,8 @@ class RequirementsFile:
             "<{class_name}("
             "{self.id!r},"
             "{self.path!r},"
-            "{self.status!r})"
+            "{self.status!r},"
+            "{self.installation_status!r})"
             ">".format(
                 class_name=self.__class__.__module__ + "." + self.__class__.__name__,
                 self=self
@@ -0,0 +1,111 @@
+"""This module contains helpers for stores kept in sqlite databases on local disk."""
+from contextlib import contextmanager
+import json
+from logging import getLogger, Logger
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional  # noqa: F401 Imported for type definition
+
+
+class SqliteDatabase:
+    """Represents sqlite database on local disk, shared by all processes (and threads) of the host.
+
+    Each thread of each process gets its own connection, in autocommit mode and with write-ahead log,
+    so that readers and writer do not block each other. Tables are created with given statements
+    whenever connection is opened.
+    """
+
+    def __init__(self, path: str, schema: Iterable[str] = ()) -> None:
+        """Create class instance."""
+        self.path = path
+        self.schema: List[str] = list(schema)
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Return connection to the database (connections are never shared between threads or processes)."""
+        if getattr(self._local, "connection", None) is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._local.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.connection.execute("PRAGMA journal_mode=WAL")
+            for statement in self.schema:
+                self._local.connection.execute(statement)
+            self._local.pid = os.getpid()
+
+        return self._local.connection
+
+    def execute(self, statement: str, parameters: Iterable[Any] = ()) -> sqlite3.Cursor:
+        """Execute given statement with given parameters."""
+        return self.connection.execute(statement, tuple(parameters))
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Run statements of the block in single transaction, holding write lock of the database."""
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+
+class ProjectRecordsStore:
+    """Base of stores keeping single record (serialized to JSON) per project in sqlite database.
+
+    Records are kept in 'RECORD_COLUMN' of 'TABLE'. Store without database path is disabled - it
+    does not keep any records.
+    """
+
+    TABLE = ""
+    RECORD_COLUMN = ""
+
+    def __init__(self, database_path: str = None, logger: Logger = None) -> None:
+        """Create class instance (store without database path is disabled)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.database_path = database_path
+        self.database = SqliteDatabase(path=database_path or "", schema=[
+            "CREATE TABLE IF NOT EXISTS {table} (project_id INTEGER PRIMARY KEY, {column} TEXT NOT NULL)".format(
+                table=self.TABLE,
+                column=self.RECORD_COLUMN
+            )
+        ])
+
+    @property
+    def enabled(self) -> bool:
+        """Indicate if records should be stored."""
+        return bool(self.database_path)
+
+    def forget(self, project_id: int) -> None:
+        """Remove record of given project."""
+        if not self.enabled:
+            return
+
+        self.database.execute(
+            "DELETE FROM {table} WHERE project_id = ?".format(table=self.TABLE), (project_id,)
+        )
+
+    def _get_record(self, project_id: int) -> Optional[Dict[str, Any]]:
+        """Return record of given project (or None if there is none)."""
+        if not self.enabled:
+            return None
+
+        row = self.database.execute(
+            "SELECT {column} FROM {table} WHERE project_id = ?".format(column=self.RECORD_COLUMN, table=self.TABLE),
+            (project_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_record(self, project_id: int, record: Dict[str, Any]) -> None:
+        """Store record of given project."""
+        if not self.enabled:
+            return
+
+        self.database.execute(
+            "INSERT OR REPLACE INTO {table} (project_id, {column}) VALUES (?, ?)".format(
+                table=self.TABLE,
+                column=self.RECORD_COLUMN
+            ),
+            (project_id, json.dumps(record))
+        )
@@ -1,6 +1,16 @@
 """This module contains various helper functions used throughout the worker."""
+from contextlib import contextmanager
+import ast
 from enum import Enum
+import hashlib
 import os
+import re
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - fcntl is not available on Windows
+    fcntl = None  # type: ignore
 
 
 class ProjectFlavour(Enum):
@@ -10,6 +20,37 @@ class ProjectFlavour(Enum):
     GERRIT = "gerrit"
 
 
+class InstallationStatus(Enum):
+    """Represents outcome of installing requirement (or whole requirements file) into virtualenv."""
+    INSTALLED = "installed"
+    CONFLICTING = "conflicting"
+    MISSING = "missing"
+
+
+class UpdateStatus(Enum):
+    """Represents outcome of attempt of updating single requirement."""
+    REJECTED = "update-rejected"
+    UNVERIFIED = "update-unverified"
+
+
+class PriorityClass(Enum):
+    """Represents importance of update request - from the most important one."""
+    INTERACTIVE = "interactive"
+    SCHEDULED = "scheduled"
+    BACKFILL = "backfill"
+
+
+def get_priority_rank(priority_class: str) -> int:
+    """Return rank of given priority class (0 is the most important, unknown classes are the least important)."""
+    names = [member.value for member in PriorityClass]
+    return names.index(priority_class) if priority_class in names else len(names) - 1
+
+
+def get_broker_priority(priority_class: str) -> int:
+    """Return priority of celery message of given priority class (redis transport: 0 is consumed first)."""
+    return get_priority_rank(priority_class) * 3
+
+
 def get_pip_script_name() -> str:
     """Return expected pip script name for os pipwatch is currently running on."""
     script_name = "pip"
@@ -17,3 +58,70 @@ def get_pip_script_name() -> str:
         script_name += ".exe"
 
     return script_name
+
+
+def normalize_package_name(name: str) -> str:
+    """Return PEP 503 normalized name of package, without any extras (i.e. 'Celery[redis]' -> 'celery')."""
+    base_name = name.split("[", 1)[0].strip()
+    return re.sub(r"[-_.]+", "-", base_name).lower()
+
+
+def get_requirement_specifier(version: Optional[str]) -> str:
+    """Return PEP 440 version specifier for version of requirement as stored in project details.
+
+    Requirement version may be a bare version ('1.1.14'), a specifier ('>=1.0,<2') or the
+    specs list produced by requirements-parser ("[('==', '1.1.14')]").
+    """
+    if not version:
+        return ""
+
+    version = version.strip()
+    if version.startswith("["):
+        specs = ast.literal_eval(version)
+        return ",".join("{operator}{version}".format(operator=operator, version=spec_version)
+                        for operator, spec_version in specs)
+
+    if version[0].isalnum():
+        return "=={version}".format(version=version)
+
+    return version
+
+
+def normalize_repository_url(url: str) -> str:
+    """Return repository url in form that is the same for all spellings of given repository.
+
+    Both 'git@github.com:Owner/Repo.git' and 'https://github.com/Owner/Repo' are normalized
+    to 'github.com/Owner/Repo'.
+    """
+    normalized = url.strip()
+    normalized = re.sub(r"^[a-zA-Z][a-zA-Z0-9+.-]*://", "", normalized)
+    normalized = re.sub(r"^[^@/]+@", "", normalized)
+    normalized = re.sub(r"^([^/:]+):(?!\d+/)", r"\1/", normalized)
+    normalized = normalized.rstrip("/")
+    if normalized.endswith(".git"):
+        normalized = normalized[:-len(".git")]
+
+    host, _, repository_path = normalized.partition("/")
+    return "{host}/{path}".format(host=host.lower(), path=repository_path).rstrip("/")
+
+
+def get_repository_cache_key(url: str) -> str:
+    """Return file-system friendly key, unique for given repository."""
+    return hashlib.sha1(normalize_repository_url(url).encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold exclusive lock on given file for the duration of the block.
+
+    Lock is shared between all processes of the host. On systems without fcntl it is a no-op.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
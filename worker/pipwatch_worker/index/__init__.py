@@ -0,0 +1 @@
+"""This package contains modules responsible for querying python packages index."""
@@ -0,0 +1,178 @@
+"""This module contains asyncio based client for resolving metadata of many packages at once."""
+import asyncio
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from logging import getLogger, Logger
+import random
+from typing import Dict, Iterable, List, Optional  # noqa: F401 Imported for type definition
+
+import aiohttp
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.utils import normalize_package_name
+from pipwatch_worker.index.client import FetchResult, PackageIndex
+from pipwatch_worker.index.metadata import CachedMetadata, PackageMetadata
+
+
+class BulkPackageIndex:
+    """Encompasses logic of resolving metadata of a batch of packages concurrently.
+
+    Requests share a pool of keep-alive connections, bounded both in total and per host. Failed
+    requests (connection errors, timeouts, 429 and 5xx responses) are retried with exponential backoff.
+    Fresh entries of package index cache are used without contacting the index at all, as are
+    metadata resolved beforehand and shared with this instance (e.g. by namespace-wide task). When
+    retries run out, stale cache entry is used instead - packages without one are left out of results.
+    """
+
+    DEFAULT_MAX_CONNECTIONS = 64
+    DEFAULT_MAX_CONNECTIONS_PER_HOST = 16
+    DEFAULT_RETRIES = 3
+    DEFAULT_BACKOFF = 0.5
+    RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, package_index: PackageIndex,  # pylint: disable=too-many-arguments
+                 max_connections: int = None,
+                 max_connections_per_host: int = None,
+                 retries: int = None,
+                 backoff: float = None,
+                 resolved_metadata: Dict[str, Optional[PackageMetadata]] = None,
+                 logger: Logger = None) -> None:
+        """Create class instance."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.package_index = package_index
+        self.max_connections = max_connections or self.DEFAULT_MAX_CONNECTIONS
+        self.max_connections_per_host = max_connections_per_host or self.DEFAULT_MAX_CONNECTIONS_PER_HOST
+        self.retries = self.DEFAULT_RETRIES if retries is None else retries
+        self.backoff = self.DEFAULT_BACKOFF if backoff is None else backoff
+        self.resolved_metadata = {
+            normalize_package_name(name): metadata for name, metadata in (resolved_metadata or {}).items()
+        }
+
+    @classmethod
+    def from_config(cls, logger: Logger = None,
+                    resolved_metadata: Dict[str, Optional[PackageMetadata]] = None) -> "BulkPackageIndex":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        return cls(
+            package_index=PackageIndex.from_config(logger=logger),
+            max_connections=configuration.getint(
+                section="package-index", option="max_connections", fallback=cls.DEFAULT_MAX_CONNECTIONS
+            ),
+            max_connections_per_host=configuration.getint(
+                section="package-index", option="max_connections_per_host",
+                fallback=cls.DEFAULT_MAX_CONNECTIONS_PER_HOST
+            ),
+            retries=configuration.getint(section="package-index", option="retries", fallback=cls.DEFAULT_RETRIES),
+            backoff=configuration.getfloat(section="package-index", option="backoff", fallback=cls.DEFAULT_BACKOFF),
+            resolved_metadata=resolved_metadata,
+            logger=logger
+        )
+
+    def get_metadata(self, package_names: Iterable[str]) -> Dict[str, Optional[PackageMetadata]]:
+        """Return metadata of all given packages, keyed by their normalized names.
+
+        Metadata of None means that package is not known to the index, packages whose metadata could
+        not be retrieved (nor found in cache) are missing from results.
+        """
+        requested_names = {normalize_package_name(name) for name in package_names}
+        results = {name: self.resolved_metadata[name] for name in requested_names if name in self.resolved_metadata}
+        names = sorted(requested_names.difference(results))
+        if not names:
+            return results
+
+        if self.package_index.is_local:
+            results.update((name, self.package_index.get_metadata(package_name=name)) for name in names)
+            return results
+
+        loop = asyncio.new_event_loop()
+        try:
+            results.update(loop.run_until_complete(self._resolve(names=names)))
+        finally:
+            loop.close()
+
+        return results
+
+    async def _resolve(self, names: List[str]) -> Dict[str, Optional[PackageMetadata]]:
+        """Resolve metadata of all packages, contacting the index only for those not fresh in cache."""
+        results: Dict[str, Optional[PackageMetadata]] = {}
+        cached_entries: Dict[str, Optional[CachedMetadata]] = {}
+        for name in names:
+            cached_entry = self.package_index.get_cached_entry(name=name)
+            if cached_entry and self.package_index.cache.is_fresh(cached_entry):  # type: ignore
+                results[name] = cached_entry.metadata
+            else:
+                cached_entries[name] = cached_entry
+
+        if not cached_entries:
+            return results
+
+        self.log.debug("Attempting to retrieve metadata of {count} packages from '{index}'".format(
+            count=len(cached_entries),
+            index=self.package_index.index_url
+        ))
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_connections_per_host
+        )
+        timeout = aiohttp.ClientTimeout(total=self.package_index.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            fetched = await asyncio.gather(*(
+                self._fetch(session=session, name=name, cached_entry=cached_entry)
+                for name, cached_entry in cached_entries.items()
+            ))
+
+        for name, fetch_result in zip(cached_entries.keys(), fetched):
+            cached_entry = cached_entries[name]
+            if fetch_result is None:
+                if cached_entry:
+                    self.log.debug("Using stale metadata of package '{name}'.".format(name=name))
+                    results[name] = cached_entry.metadata
+                continue
+
+            metadata, validators = fetch_result
+            results[name] = self.package_index.store(
+                name=name, metadata=metadata, validators=validators, cached_entry=cached_entry
+            )
+
+        return results
+
+    async def _fetch(self, session: aiohttp.ClientSession, name: str,
+                     cached_entry: Optional[CachedMetadata]) -> Optional[FetchResult]:
+        """Retrieve metadata of single package, retrying transient failures (None once they run out)."""
+        attempt = 0
+        while True:
+            try:
+                return await self._fetch_once(session=session, name=name, cached_entry=cached_entry)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                status = getattr(error, "status", None)
+                if attempt >= self.retries or (status is not None and status not in self.RETRYABLE_STATUSES):
+                    self.log.warning("Unable to retrieve metadata of package '{name}': {error!r}".format(
+                        name=name,
+                        error=error
+                    ))
+                    return None
+
+                delay = self.backoff * (2 ** attempt) * (1 + random.random())
+                self.log.debug("Retrying retrieval of package '{name}' metadata in {delay:.2f}s".format(
+                    name=name,
+                    delay=delay
+                ))
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _fetch_once(self, session: aiohttp.ClientSession, name: str,
+                          cached_entry: Optional[CachedMetadata]) -> FetchResult:
+        """Perform single request for metadata of given package."""
+        async with session.get(
+                self.package_index.get_package_url(name=name),
+                headers=self.package_index.get_conditional_headers(cached_entry=cached_entry)
+        ) as response:
+            validators = (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            if response.status == 304:
+                return None, validators
+
+            if response.status == 404:
+                return None, None
+
+            response.raise_for_status()
+            content = await response.text()
+            return self.package_index.parse_response(name=name, content=content), validators
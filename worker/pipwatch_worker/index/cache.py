@@ -0,0 +1,188 @@
+"""This module contains cache of package metadata shared by all worker processes."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+import json
+from logging import getLogger, Logger
+import os
+import time
+from typing import Any, Dict, Optional  # noqa: F401 Imported for type definition
+
+import redis
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.sqlite import SqliteDatabase
+from pipwatch_worker.index.metadata import CachedMetadata, PackageMetadata
+from pipwatch_worker.worker.commands import RepositoriesCacheMixin
+
+
+def _serialize(entry: CachedMetadata) -> str:
+    """Return JSON representation of cache entry."""
+    return json.dumps({
+        "metadata": entry.metadata._asdict(),
+        "etag": entry.etag,
+        "last_modified": entry.last_modified,
+        "fetched_at": entry.fetched_at
+    })
+
+
+def _deserialize(document: str) -> CachedMetadata:
+    """Create cache entry out of its JSON representation."""
+    entry: Dict[str, Any] = json.loads(document)
+    return CachedMetadata(
+        metadata=PackageMetadata(**entry["metadata"]),
+        etag=entry["etag"],
+        last_modified=entry["last_modified"],
+        fetched_at=entry["fetched_at"]
+    )
+
+
+class MetadataCache:
+    """Defines common interface of package metadata caches.
+
+    Entries younger than 'ttl' seconds are considered fresh, older ones have to be revalidated
+    with the index. Entries not accessed for 'max_age' seconds are evicted, as are the least
+    recently used ones once there are more than 'max_entries' of them.
+    """
+
+    DEFAULT_TTL = 3600
+    DEFAULT_MAX_AGE = 7 * 24 * 3600
+    DEFAULT_MAX_ENTRIES = 50000
+
+    def __init__(self, ttl: int = None, max_age: int = None, max_entries: int = None,
+                 logger: Logger = None) -> None:
+        """Create class instance."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.ttl = self.DEFAULT_TTL if ttl is None else ttl
+        self.max_age = self.DEFAULT_MAX_AGE if max_age is None else max_age
+        self.max_entries = self.DEFAULT_MAX_ENTRIES if max_entries is None else max_entries
+
+    def is_fresh(self, entry: CachedMetadata) -> bool:
+        """Indicate if given entry may be used without revalidating it."""
+        return time.time() - entry.fetched_at < self.ttl
+
+    def get(self, name: str) -> Optional[CachedMetadata]:
+        """Return cached metadata of package with given (normalized) name."""
+        raise NotImplementedError()
+
+    def set(self, name: str, entry: CachedMetadata) -> None:
+        """Store metadata of package with given (normalized) name."""
+        raise NotImplementedError()
+
+    def evict(self) -> int:
+        """Remove expired and least recently used entries, return how many were removed."""
+        raise NotImplementedError()
+
+
+class SqliteMetadataCache(MetadataCache):
+    """Metadata cache stored in sqlite database on local disk - shared by all processes of the host."""
+
+    EVICTION_INTERVAL = 1000
+
+    def __init__(self, database_path: str, ttl: int = None, max_age: int = None,
+                 max_entries: int = None, logger: Logger = None) -> None:
+        """Create class instance."""
+        super().__init__(ttl=ttl, max_age=max_age, max_entries=max_entries, logger=logger)
+        self.database_path = database_path
+        self.database = SqliteDatabase(path=database_path, schema=[
+            "CREATE TABLE IF NOT EXISTS package_metadata ("
+            "name TEXT PRIMARY KEY, entry TEXT NOT NULL, accessed_at REAL NOT NULL)"
+        ])
+        self._writes_count = 0
+
+    def get(self, name: str) -> Optional[CachedMetadata]:
+        """Return cached metadata of package with given (normalized) name."""
+        row = self.database.execute("SELECT entry FROM package_metadata WHERE name = ?", (name,)).fetchone()
+        if not row:
+            return None
+
+        self.database.execute("UPDATE package_metadata SET accessed_at = ? WHERE name = ?", (time.time(), name))
+        return _deserialize(row[0])
+
+    def set(self, name: str, entry: CachedMetadata) -> None:
+        """Store metadata of package with given (normalized) name."""
+        self.database.execute(
+            "INSERT OR REPLACE INTO package_metadata (name, entry, accessed_at) VALUES (?, ?, ?)",
+            (name, _serialize(entry), time.time())
+        )
+        self._writes_count += 1
+        if self._writes_count % self.EVICTION_INTERVAL == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """Remove expired and least recently used entries, return how many were removed."""
+        expired = self.database.execute(
+            "DELETE FROM package_metadata WHERE accessed_at < ?", (time.time() - self.max_age,)
+        ).rowcount
+        overflowing = self.database.execute(
+            "DELETE FROM package_metadata WHERE name IN ("
+            "SELECT name FROM package_metadata ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        self.log.debug("Evicted {count} package metadata cache entries.".format(count=expired + overflowing))
+        return expired + overflowing
+
+
+class RedisMetadataCache(MetadataCache):
+    """Metadata cache stored in redis - shared by all workers using the same redis instance.
+
+    Entries expire after 'max_age' seconds without access, least recently used entries are
+    evicted by redis itself according to its 'maxmemory-policy'.
+    """
+
+    KEY_PREFIX = "pipwatch:package-metadata:"
+
+    def __init__(self, redis_url: str, ttl: int = None, max_age: int = None,
+                 max_entries: int = None, logger: Logger = None) -> None:
+        """Create class instance."""
+        super().__init__(ttl=ttl, max_age=max_age, max_entries=max_entries, logger=logger)
+        self.redis = redis.StrictRedis.from_url(redis_url)
+
+    def get(self, name: str) -> Optional[CachedMetadata]:
+        """Return cached metadata of package with given (normalized) name."""
+        key = self.KEY_PREFIX + name
+        document = self.redis.get(key)
+        if not document:
+            return None
+
+        self.redis.expire(key, self.max_age)
+        return _deserialize(document.decode("utf-8"))
+
+    def set(self, name: str, entry: CachedMetadata) -> None:
+        """Store metadata of package with given (normalized) name."""
+        self.redis.set(self.KEY_PREFIX + name, _serialize(entry), ex=self.max_age)
+
+    def evict(self) -> int:
+        """Expiry and eviction are handled by redis."""
+        return 0
+
+
+def get_metadata_cache(logger: Logger = None) -> Optional[MetadataCache]:
+    """Return package metadata cache configured in configuration file (or None if it is disabled)."""
+    configuration: ConfigParser = load_config_file()
+    section = "package-metadata-cache"
+    backend = configuration.get(section=section, option="backend", fallback="sqlite").casefold()
+    settings = {
+        "ttl": configuration.getint(section=section, option="ttl", fallback=MetadataCache.DEFAULT_TTL),
+        "max_age": configuration.getint(section=section, option="max_age", fallback=MetadataCache.DEFAULT_MAX_AGE),
+        "max_entries": configuration.getint(
+            section=section, option="max_entries", fallback=MetadataCache.DEFAULT_MAX_ENTRIES
+        ),
+        "logger": logger
+    }
+
+    if backend == "redis":
+        redis_url = configuration.get(section=section, option="redis_url", fallback="") or configuration.get(
+            section="celery", option="broker_url", fallback="redis://localhost:6379/0"
+        )
+        return RedisMetadataCache(redis_url=redis_url, **settings)
+
+    if backend == "sqlite":
+        repositories_cache = RepositoriesCacheMixin()
+        default_path = os.path.join(
+            repositories_cache.repositories_cache_path,
+            repositories_cache.repositories_cache_dir_name,
+            ".package-metadata.sqlite"
+        )
+        database_path = os.path.expandvars(configuration.get(section=section, option="path", fallback=default_path))
+        return SqliteMetadataCache(database_path=database_path or default_path, **settings)
+
+    return None
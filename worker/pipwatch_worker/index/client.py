@@ -0,0 +1,339 @@
+"""This module contains client for retrieving packages versions from PyPI-compatible index."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from email.parser import Parser
+from html.parser import HTMLParser
+from logging import getLogger, Logger
+import json
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple  # noqa: F401 Imported for type definition
+from urllib.parse import unquote, urljoin, urlparse
+from urllib.request import url2pathname
+import zipfile
+
+from packaging.version import InvalidVersion, Version
+import requests
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.utils import normalize_package_name
+from pipwatch_worker.index.cache import get_metadata_cache, MetadataCache
+from pipwatch_worker.index.metadata import CachedMetadata, PackageMetadata
+
+# (ETag, Last-Modified) of index response
+Validators = Tuple[Optional[str], Optional[str]]
+FetchResult = Tuple[Optional[PackageMetadata], Optional[Validators]]
+# Requires-Dist of a release (None if it cannot be told) and whether it may be cached
+FetchedDependencies = Tuple[Optional[List[str]], bool]
+
+DISTRIBUTION_EXTENSIONS = (".whl", ".tar.gz", ".tar.bz2", ".tar.xz", ".tgz", ".zip", ".egg")
+
+
+class _LinksParser(HTMLParser):  # pylint: disable=abstract-method
+    """Collects targets of all anchors found on PEP 503 'simple' project page."""
+
+    def __init__(self) -> None:
+        """Create parser instance."""
+        super().__init__()
+        self.links: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Any]) -> None:
+        """Remember href of every anchor."""
+        if tag != "a":
+            return
+
+        href = dict(attrs).get("href")
+        if href:
+            self.links.append(href)
+
+
+def get_version_from_filename(package_name: str, filename: str) -> Optional[str]:
+    """Return version of distribution based on its file name (or None if it cannot be determined)."""
+    filename = unquote(filename.split("#", 1)[0].rsplit("/", 1)[-1])
+    extension = next((ext for ext in DISTRIBUTION_EXTENSIONS if filename.lower().endswith(ext)), None)
+    if not extension:
+        return None
+
+    stem = filename[:-len(extension)]
+    if extension in (".whl", ".egg"):
+        parts = stem.split("-")
+        return parts[1] if len(parts) > 1 else None
+
+    name_pattern = r"[-_.]+".join(re.escape(part) for part in normalize_package_name(package_name).split("-"))
+    match = re.match(r"^{name}-(.+)$".format(name=name_pattern), stem, re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def get_latest_version(versions: Iterable[str]) -> Optional[str]:
+    """Return newest final release from given versions (or newest pre-release if there are no final ones)."""
+    parsed_versions = []
+    for version in versions:
+        try:
+            parsed_versions.append((Version(version), version))
+        except InvalidVersion:
+            continue
+
+    final_releases = [entry for entry in parsed_versions if not entry[0].is_prerelease]
+    candidates = final_releases or parsed_versions
+    if not candidates:
+        return None
+
+    return max(candidates)[1]
+
+
+def parse_core_metadata(content: str) -> List[str]:
+    """Return Requires-Dist entries of distribution core metadata (METADATA / PKG-INFO file)."""
+    return Parser().parsestr(content, headersonly=True).get_all("Requires-Dist") or []
+
+
+class PackageIndex:
+    """Encompasses logic of retrieving information about packages from PyPI-compatible index.
+
+    Supported are http(s) indexes exposing JSON api (https://pypi.org/pypi) or PEP 503 'simple' api,
+    as well as local directories (or file:// urls) laid out as 'simple' index, which may contain
+    '<package>/json' documents in place of distribution files.
+
+    When cache is given, fresh entries are served from it without contacting the index and stale
+    ones are revalidated using conditional requests (ETag / Last-Modified).
+    """
+
+    DEFAULT_INDEX_URL = "https://pypi.org/pypi"
+    DEFAULT_INDEX_API = "json"
+    DEFAULT_TIMEOUT = 10.0
+
+    def __init__(self, index_url: str = None, index_api: str = None,  # pylint: disable=too-many-arguments
+                 timeout: float = None, cache: MetadataCache = None, logger: Logger = None) -> None:
+        """Create class instance."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.cache = cache
+        self.index_url = (index_url or self.DEFAULT_INDEX_URL).rstrip("/")
+        self.index_api = (index_api or self.DEFAULT_INDEX_API).casefold()
+        self.timeout = timeout or self.DEFAULT_TIMEOUT
+        self.session = requests.Session()
+
+    @classmethod
+    def from_config(cls, logger: Logger = None) -> "PackageIndex":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        index_url = configuration.get(section="package-index", option="url", fallback=cls.DEFAULT_INDEX_URL)
+        return cls(
+            index_url=os.path.expandvars(index_url),
+            index_api=configuration.get(section="package-index", option="api", fallback=cls.DEFAULT_INDEX_API),
+            timeout=configuration.getfloat(section="package-index", option="timeout", fallback=cls.DEFAULT_TIMEOUT),
+            cache=get_metadata_cache(logger=logger),
+            logger=logger
+        )
+
+    @property
+    def is_local(self) -> bool:
+        """Indicate if index is a directory on local file system."""
+        return urlparse(self.index_url).scheme in ("", "file")
+
+    @property
+    def _local_index_path(self) -> str:
+        """Return path to local index directory."""
+        parsed_url = urlparse(self.index_url)
+        if parsed_url.scheme == "file":
+            return url2pathname(parsed_url.path)
+
+        return self.index_url
+
+    def get_metadata(self, package_name: str) -> Optional[PackageMetadata]:
+        """Return versions information about given package (or None if package is not known to the index)."""
+        name = normalize_package_name(package_name)
+        cached_entry = self.get_cached_entry(name=name)
+        if cached_entry and self.cache.is_fresh(cached_entry):  # type: ignore
+            return cached_entry.metadata
+
+        self.log.debug("Attempting to retrieve metadata of package '{name}' from '{index}'".format(
+            name=name,
+            index=self.index_url
+        ))
+        metadata, validators = self._fetch(name=name, cached_entry=cached_entry)
+        return self.store(name=name, metadata=metadata, validators=validators, cached_entry=cached_entry)
+
+    def get_cached_entry(self, name: str) -> Optional[CachedMetadata]:
+        """Return cached metadata of package with given normalized name (if there is any)."""
+        return self.cache.get(name) if self.cache else None
+
+    def get_package_url(self, name: str) -> str:
+        """Return url of index document describing package with given normalized name."""
+        url_template = "{index}/{name}/" if self.index_api == "simple" else "{index}/{name}/json"
+        return url_template.format(index=self.index_url, name=name)
+
+    @staticmethod
+    def get_conditional_headers(cached_entry: Optional[CachedMetadata]) -> Dict[str, str]:
+        """Return headers which allow index to respond with '304 Not Modified'."""
+        headers = {}
+        if cached_entry and cached_entry.etag:
+            headers["If-None-Match"] = cached_entry.etag
+        if cached_entry and cached_entry.last_modified:
+            headers["If-Modified-Since"] = cached_entry.last_modified
+
+        return headers
+
+    def store(self, name: str, metadata: Optional[PackageMetadata], validators: Optional[Validators],
+              cached_entry: Optional[CachedMetadata]) -> Optional[PackageMetadata]:
+        """Save result of index query in cache and return up to date metadata of the package.
+
+        Metadata of None accompanied by validators means that cached entry was not modified.
+        """
+        if metadata is None and validators is not None and cached_entry:
+            self.log.debug("Metadata of package '{name}' not modified.".format(name=name))
+            metadata = cached_entry.metadata
+
+        if metadata and self.cache:
+            etag, last_modified = validators or (None, None)
+            self.cache.set(name, CachedMetadata(
+                metadata=metadata, etag=etag, last_modified=last_modified, fetched_at=time.time()
+            ))
+
+        return metadata
+
+    def _fetch(self, name: str, cached_entry: Optional[CachedMetadata]) -> FetchResult:
+        """Retrieve package metadata along with its validators (ETag, Last-Modified).
+
+        Metadata is None when package is not known to the index or (if validators are returned)
+        when it was not modified since cached entry was fetched.
+        """
+        if self.is_local:
+            return self._get_metadata_from_directory(name=name, cached_entry=cached_entry)
+
+        response = self.session.get(
+            self.get_package_url(name=name),
+            headers=self.get_conditional_headers(cached_entry=cached_entry),
+            timeout=self.timeout
+        )
+        validators = (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        if response.status_code == 304:
+            return None, validators
+
+        if response.status_code == 404:
+            return None, None
+
+        response.raise_for_status()
+        return self.parse_response(name=name, content=response.text), validators
+
+    def parse_response(self, name: str, content: str) -> Optional[PackageMetadata]:
+        """Create package metadata out of index response body."""
+        if self.index_api == "simple":
+            parser = _LinksParser()
+            parser.feed(content)
+            return self._metadata_from_filenames(name=name, filenames=parser.links)
+
+        return self.parse_json_document(name=name, document=json.loads(content))
+
+    def _get_metadata_from_directory(self, name: str, cached_entry: Optional[CachedMetadata]) -> FetchResult:
+        """Read package details from local index directory (its modification time serves as ETag)."""
+        package_directory = os.path.join(self._local_index_path, name)
+        if not os.path.isdir(package_directory):
+            return None, None
+
+        json_document_path = os.path.join(package_directory, "json")
+        has_json_document = os.path.isfile(json_document_path)
+        modification_time = os.stat(json_document_path if has_json_document else package_directory).st_mtime_ns
+        validators: Validators = (str(modification_time), None)
+        if cached_entry and cached_entry.etag == validators[0]:
+            return None, validators
+
+        if has_json_document:
+            with open(json_document_path, "r", encoding="utf-8") as file:
+                return self.parse_json_document(name=name, document=json.load(file)), validators
+
+        return self._metadata_from_filenames(name=name, filenames=os.listdir(package_directory)), validators
+
+    def get_requires_dist(self, name: str, version: str) -> FetchedDependencies:
+        """Retrieve requirements declared by given release of package with given normalized name.
+
+        Dependencies are taken from 'requires_dist' of JSON api release document, from core metadata
+        served along with wheels by 'simple' api (PEP 658) or from wheel found in local index directory
+        (which may contain '<package>/<version>/json' documents instead).
+        """
+        if self.is_local:
+            return self._get_requires_dist_from_directory(name=name, version=version)
+
+        if self.index_api == "simple":
+            return self._get_requires_dist_from_simple_api(name=name, version=version)
+
+        response = self.session.get(
+            "{index}/{name}/{version}/json".format(index=self.index_url, name=name, version=version),
+            timeout=self.timeout
+        )
+        if response.status_code == 404:
+            return None, False
+
+        response.raise_for_status()
+        return response.json().get("info", {}).get("requires_dist") or [], True
+
+    def _get_requires_dist_from_simple_api(self, name: str, version: str) -> FetchedDependencies:
+        """Retrieve core metadata served along with wheel of given release (PEP 658)."""
+        package_url = self.get_package_url(name=name)
+        response = self.session.get(package_url, timeout=self.timeout)
+        if response.status_code == 404:
+            return None, False
+
+        response.raise_for_status()
+        parser = _LinksParser()
+        parser.feed(response.text)
+        wheels = [
+            link for link in parser.links
+            if link.split("#", 1)[0].endswith(".whl") and get_version_from_filename(name, link) == version
+        ]
+        for wheel in wheels:
+            metadata_response = self.session.get(
+                urljoin(package_url, wheel.split("#", 1)[0]) + ".metadata",
+                timeout=self.timeout
+            )
+            if metadata_response.status_code == 200:
+                return parse_core_metadata(metadata_response.text), True
+
+        return None, True
+
+    def _get_requires_dist_from_directory(self, name: str, version: str) -> FetchedDependencies:
+        """Read dependencies of given release from local index directory."""
+        package_directory = os.path.join(self._local_index_path, name)
+        json_document_path = os.path.join(package_directory, version, "json")
+        if os.path.isfile(json_document_path):
+            with open(json_document_path, "r", encoding="utf-8") as file:
+                document: Dict[str, Any] = json.load(file)
+            return document.get("info", {}).get("requires_dist") or [], True
+
+        wheels = [
+            file_name for file_name in (os.listdir(package_directory) if os.path.isdir(package_directory) else [])
+            if file_name.endswith(".whl") and get_version_from_filename(name, file_name) == version
+        ]
+        for wheel in wheels:
+            with zipfile.ZipFile(os.path.join(package_directory, wheel)) as archive:
+                metadata_file = next((
+                    entry for entry in archive.namelist()
+                    if entry.count("/") == 1 and entry.endswith(".dist-info/METADATA")
+                ), None)
+                if metadata_file:
+                    return parse_core_metadata(archive.read(metadata_file).decode("utf-8")), True
+
+        return None, False
+
+    @staticmethod
+    def parse_json_document(name: str, document: Dict[str, Any]) -> Optional[PackageMetadata]:
+        """Create package metadata out of JSON api response."""
+        releases: Dict[str, List[Dict[str, Any]]] = document.get("releases", {})
+        available_versions = [
+            version for version, files in releases.items()
+            if not files or not all(file.get("yanked", False) for file in files)
+        ]
+        latest_version = document.get("info", {}).get("version") or get_latest_version(available_versions)
+        if not latest_version:
+            return None
+
+        return PackageMetadata(name=name, latest_version=latest_version, releases=available_versions)
+
+    @staticmethod
+    def _metadata_from_filenames(name: str, filenames: Iterable[str]) -> Optional[PackageMetadata]:
+        """Create package metadata out of list of distribution files."""
+        versions = {get_version_from_filename(package_name=name, filename=filename) for filename in filenames}
+        versions.discard(None)
+        latest_version = get_latest_version(versions)  # type: ignore
+        if not latest_version:
+            return None
+
+        return PackageMetadata(name=name, latest_version=latest_version, releases=sorted(versions))  # type: ignore
@@ -0,0 +1,78 @@
+"""This module contains client for retrieving dependencies declared by releases of packages (Requires-Dist)."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+import json
+from logging import getLogger, Logger
+import os
+from typing import List, Optional  # noqa: F401 Imported for type definition
+import zipfile
+
+import requests
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.sqlite import SqliteDatabase
+from pipwatch_worker.core.utils import normalize_package_name
+from pipwatch_worker.index.client import PackageIndex
+from pipwatch_worker.worker.commands import RepositoriesCacheMixin
+
+
+class DependenciesIndex:
+    """Encompasses logic of retrieving dependencies declared by given releases of packages.
+
+    Metadata of a release never change, so dependencies retrieved from package index (see
+    PackageIndex.get_requires_dist) are cached on local disk for good. None stands for dependencies
+    which cannot be told (e.g. release has source distributions only).
+    """
+
+    def __init__(self, package_index: PackageIndex, database_path: str = None, logger: Logger = None) -> None:
+        """Create class instance (dependencies are not cached without database path)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.package_index = package_index
+        self.database_path = database_path
+        self.database = SqliteDatabase(path=database_path or "", schema=[
+            "CREATE TABLE IF NOT EXISTS release_dependencies ("
+            "name TEXT NOT NULL, version TEXT NOT NULL, requires_dist TEXT, PRIMARY KEY (name, version))"
+        ])
+
+    @classmethod
+    def from_config(cls, logger: Logger = None) -> "DependenciesIndex":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        repositories_cache = RepositoriesCacheMixin()
+        default_path = os.path.join(
+            repositories_cache.repositories_cache_path,
+            repositories_cache.repositories_cache_dir_name,
+            ".dependencies.sqlite"
+        )
+        database_path = os.path.expandvars(configuration.get(section="resolver", option="path", fallback=""))
+        return cls(
+            package_index=PackageIndex.from_config(logger=logger),
+            database_path=database_path or default_path,
+            logger=logger
+        )
+
+    def get_requires_dist(self, package_name: str, version: str) -> Optional[List[str]]:
+        """Return requirements declared by given release of the package (or None if they cannot be told)."""
+        name = normalize_package_name(package_name)
+        if self.database_path:
+            row = self.database.execute(
+                "SELECT requires_dist FROM release_dependencies WHERE name = ? AND version = ?", (name, version)
+            ).fetchone()
+            if row:
+                return json.loads(row[0])
+
+        try:
+            requires_dist, cacheable = self.package_index.get_requires_dist(name=name, version=version)
+        except (requests.RequestException, OSError, ValueError, zipfile.BadZipFile):
+            self.log.debug("Unable to retrieve dependencies of {name} {version}.".format(
+                name=name,
+                version=version
+            ), exc_info=True)
+            return None
+
+        if cacheable and self.database_path:
+            self.database.execute(
+                "INSERT OR REPLACE INTO release_dependencies (name, version, requires_dist) VALUES (?, ?, ?)",
+                (name, version, json.dumps(requires_dist))
+            )
+
+        return requires_dist
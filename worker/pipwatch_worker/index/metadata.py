@@ -0,0 +1,16 @@
+"""This module contains data objects describing packages available in package index."""
+from typing import List, NamedTuple, Optional
+
+
+PackageMetadata = NamedTuple("PackageMetadata", [
+    ("name", str),
+    ("latest_version", str),
+    ("releases", List[str])
+])
+
+CachedMetadata = NamedTuple("CachedMetadata", [
+    ("metadata", PackageMetadata),
+    ("etag", Optional[str]),
+    ("last_modified", Optional[str]),
+    ("fetched_at", float)
+])
@@ -0,0 +1,79 @@
+"""This module contains group testing logic used for finding the largest set of updates that does not break project."""
+from logging import getLogger, Logger
+from typing import Callable, Generic, List, Sequence, TypeVar  # noqa: F401 Imported for type definition
+
+
+T = TypeVar("T")  # pylint: disable=invalid-name
+
+
+class GroupTesting(Generic[T]):
+    """Encompasses logic of splitting candidates into those which pass the test and those which break it.
+
+    Candidates are accepted in groups - each test checks already accepted candidates along with
+    one new group. Group which fails is split in halves, until single culprits are isolated, which
+    takes O(k log n) tests for k culprits among n candidates. When first half of failing group
+    passes, second half is known to fail without testing it as a whole.
+
+    Test is expected to be monotonic - candidates accepted earlier are never reconsidered. Groups
+    left when the number of tests reaches the limit are neither accepted nor rejected.
+    """
+
+    def __init__(self, test: Callable[[List[T]], bool], max_tests: int = 0, logger: Logger = None) -> None:
+        """Create class instance (max_tests of 0 means no limit)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.test = test
+        self.max_tests = max_tests
+
+        self.accepted: List[T] = []
+        self.rejected: List[T] = []
+        self.untested: List[T] = []
+        self.tests_count = 0
+
+    def __call__(self, candidates: Sequence[T], accepted: Sequence[T] = None, known_to_fail: bool = False) -> None:
+        """Split given candidates into accepted, rejected and untested ones.
+
+        Candidates known to pass the test (e.g. from earlier attempts) may be given as already accepted,
+        as may the fact that they fail the test together with all other candidates.
+        """
+        self.accepted, self.rejected, self.untested = list(accepted or []), [], []
+        self.tests_count = 0
+        if candidates:
+            self._bisect(group=list(candidates), known_to_fail=known_to_fail)
+
+        self.log.info("Group testing finished after {count} tests: {accepted} accepted, {rejected} rejected, "
+                      "{untested} untested.".format(count=self.tests_count,
+                                                    accepted=len(self.accepted),
+                                                    rejected=len(self.rejected),
+                                                    untested=len(self.untested)))
+
+    def _bisect(self, group: List[T], known_to_fail: bool) -> bool:
+        """Accept as much of given group as possible, return True if whole group was accepted."""
+        if not known_to_fail:
+            if self.max_tests and self.tests_count >= self.max_tests:
+                self.untested.extend(group)
+                return False
+
+            if self._run_test(group=group):
+                self.accepted.extend(group)
+                return True
+
+        if len(group) == 1:
+            self.log.info("Isolated failing candidate: {candidate!r}".format(candidate=group[0]))
+            self.rejected.extend(group)
+            return False
+
+        middle = len(group) // 2
+        first_half_accepted = self._bisect(group=group[:middle], known_to_fail=False)
+        # If first half was accepted, accepted set along with second half is exactly what has just failed
+        self._bisect(group=group[middle:], known_to_fail=first_half_accepted)
+        return False
+
+    def _run_test(self, group: List[T]) -> bool:
+        """Test accepted candidates along with given group."""
+        self.tests_count += 1
+        self.log.debug("Test #{count}: {accepted} accepted candidates with {group!r}".format(
+            count=self.tests_count,
+            accepted=len(self.accepted),
+            group=group
+        ))
+        return self.test(self.accepted + group)
@@ -0,0 +1,334 @@
+"""This module contains logic of keeping repositories cache within its disk budget."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from contextlib import contextmanager
+from logging import getLogger, Logger
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple  # noqa: F401 Imported for type definition
+import uuid
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.sqlite import SqliteDatabase
+from pipwatch_worker.worker.environments import get_directory_size, VirtualenvStore
+
+
+CacheUsage = NamedTuple("CacheUsage", [
+    ("size", int),
+    ("disk_budget", int),
+    ("hits", int),
+    ("misses", int),
+    ("hit_rate", float),
+    ("evictions", int),
+    ("evicted_bytes", int)
+])
+
+
+class CacheManager:
+    """Encompasses logic of evicting least recently used project worktrees and virtualenvs from the cache.
+
+    Each access of an entry is recorded (as hit when entry was already there, as miss otherwise). Once
+    total size of the cache exceeds 'high_watermark' fraction of 'disk_budget' bytes, entries are
+    evicted, least recently used first, until it drops below 'low_watermark' fraction. Entries used
+    less than 'min_idle' seconds ago, worktrees pinned by running tasks (of any process on the host)
+    and virtualenvs linked into pinned worktrees are never evicted. Repository mirrors and other
+    stores kept in the cache count towards its size, but are not evicted by the manager. Virtualenvs
+    are additionally kept within their own budget (see VirtualenvStore), the same way.
+
+    Eviction is run every 'interval' seconds by background thread (see 'start'). Access records, pins
+    and counters are kept in sqlite database within the cache, shared by all processes of the host.
+    """
+
+    KIND_PROJECT = "project"
+    KIND_VIRTUALENV = "virtualenv"
+    EVICTED_DIR = ".evicted"
+    DEFAULT_HIGH_WATERMARK = 0.9
+    DEFAULT_LOW_WATERMARK = 0.75
+    DEFAULT_INTERVAL = 300
+    DEFAULT_MIN_IDLE = 600
+
+    def __init__(self, cache_path: str,  # pylint: disable=too-many-arguments
+                 database_path: str = None,
+                 disk_budget: int = 0,
+                 high_watermark: float = None,
+                 low_watermark: float = None,
+                 interval: float = None,
+                 min_idle: float = None,
+                 logger: Logger = None) -> None:
+        """Create class instance (manager without database path is disabled, zero budget means no eviction)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.cache_path = cache_path
+        self.database_path = database_path
+        self.disk_budget = disk_budget
+        self.high_watermark = high_watermark or self.DEFAULT_HIGH_WATERMARK
+        self.low_watermark = low_watermark or self.DEFAULT_LOW_WATERMARK
+        self.interval = interval or self.DEFAULT_INTERVAL
+        self.min_idle = self.DEFAULT_MIN_IDLE if min_idle is None else min_idle
+        self.virtualenvs = VirtualenvStore(cache_path=cache_path, logger=self.log)
+        self.database = SqliteDatabase(path=database_path or "", schema=[
+            "CREATE TABLE IF NOT EXISTS entry (path TEXT PRIMARY KEY, kind TEXT NOT NULL, last_access REAL)",
+            "CREATE TABLE IF NOT EXISTS pin (token TEXT PRIMARY KEY, path TEXT NOT NULL, pid INTEGER NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS counter (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        ])
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_config(cls, cache_path: str, logger: Logger = None) -> "CacheManager":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "cache-manager"
+        if not configuration.getboolean(section=section, option="enabled", fallback=True):
+            return cls(cache_path=cache_path, logger=logger)
+
+        default_path = os.path.join(cache_path, ".cache.sqlite")
+        database_path = os.path.expandvars(configuration.get(section=section, option="path", fallback=""))
+        return cls(
+            cache_path=cache_path,
+            database_path=database_path or default_path,
+            disk_budget=configuration.getint(section=section, option="disk_budget", fallback=0),
+            high_watermark=configuration.getfloat(
+                section=section, option="high_watermark", fallback=cls.DEFAULT_HIGH_WATERMARK
+            ),
+            low_watermark=configuration.getfloat(
+                section=section, option="low_watermark", fallback=cls.DEFAULT_LOW_WATERMARK
+            ),
+            interval=configuration.getfloat(section=section, option="interval", fallback=cls.DEFAULT_INTERVAL),
+            min_idle=configuration.getfloat(section=section, option="min_idle", fallback=cls.DEFAULT_MIN_IDLE),
+            logger=logger
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Indicate if cache entries should be tracked."""
+        return bool(self.database_path)
+
+    def record_access(self, path: str, kind: str, hit: bool) -> None:
+        """Record that entry under given path was just used (and whether it was already in the cache)."""
+        if not self.enabled:
+            return
+
+        with self.database.transaction():
+            self._touch(path=path, kind=kind)
+            self._increment(name="hits" if hit else "misses")
+
+    @contextmanager
+    def pinned(self, path: str, kind: str = KIND_PROJECT) -> Iterator[None]:
+        """Keep entry under given path (and virtualenvs it links to) from being evicted during the block."""
+        if not self.enabled:
+            yield
+            return
+
+        token = uuid.uuid4().hex
+        with self.database.transaction():
+            self.database.execute(
+                "INSERT INTO pin (token, path, pid) VALUES (?, ?, ?)", (token, path, os.getpid())
+            )
+            self._touch(path=path, kind=kind)
+
+        try:
+            yield
+        finally:
+            with self.database.transaction():
+                self.database.execute("DELETE FROM pin WHERE token = ?", (token,))
+                self._touch(path=path, kind=kind)
+
+    def get_usage(self) -> CacheUsage:
+        """Return size of the cache (as of last eviction run) along with its hits and evictions counters."""
+        counters = dict(self.database.execute("SELECT name, value FROM counter").fetchall()) if self.enabled else {}
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return CacheUsage(
+            size=counters.get("size", 0),
+            disk_budget=self.disk_budget,
+            hits=hits,
+            misses=misses,
+            hit_rate=hits / (hits + misses) if hits + misses else 0.0,
+            evictions=counters.get("evictions", 0),
+            evicted_bytes=counters.get("evicted_bytes", 0)
+        )
+
+    def start(self) -> Optional[threading.Thread]:
+        """Start background thread evicting entries every 'interval' seconds (until 'stop' is called)."""
+        if not self.enabled:
+            return None
+
+        self._stop.clear()
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        """Stop background eviction."""
+        self._stop.set()
+
+    def evict(self) -> CacheUsage:
+        """Evict least recently used entries if cache exceeds its high watermark, return usage of the cache."""
+        if not self.enabled:
+            return self.get_usage()
+
+        size = get_directory_size(self.cache_path)
+        if self.disk_budget and size > self.disk_budget * self.high_watermark:
+            size -= self._evict(
+                paths=self._list_entries(), size=size, target_size=self.disk_budget * self.low_watermark
+            )
+
+        virtualenvs_budget = self.virtualenvs.disk_budget
+        virtualenvs_paths = self._list_virtualenvs()
+        virtualenvs_size = sum(self.virtualenvs.get_size(path) for path in virtualenvs_paths)
+        if virtualenvs_budget and virtualenvs_size > virtualenvs_budget * self.high_watermark:
+            size -= self._evict(
+                paths=virtualenvs_paths, size=virtualenvs_size, target_size=virtualenvs_budget * self.low_watermark
+            )
+
+        with self.database.transaction():
+            self.database.execute("INSERT OR REPLACE INTO counter (name, value) VALUES ('size', ?)", (size,))
+
+        return self.get_usage()
+
+    def _evict(self, paths: List[str], size: int, target_size: float) -> int:
+        """Evict least recently used of given entries until their size drops to the target, return evicted bytes."""
+        evicted_bytes = 0
+        for path, last_access in self._get_eviction_candidates(paths=paths):
+            if size - evicted_bytes <= target_size:
+                break
+
+            entry_size = self._get_size(path=path)
+            if not self._remove(path=path):
+                continue
+
+            self.log.info("Evicted '{path}' ({size} bytes) unused since {last_access}.".format(
+                path=path,
+                size=entry_size,
+                last_access=time.ctime(last_access)
+            ))
+            evicted_bytes += entry_size
+            with self.database.transaction():
+                self._increment(name="evictions")
+                self._increment(name="evicted_bytes", value=entry_size)
+
+        if size - evicted_bytes > target_size:
+            self.log.warning("Entries take {size} bytes, but no more of them may be evicted.".format(
+                size=size - evicted_bytes
+            ))
+
+        return evicted_bytes
+
+    def _run(self) -> None:
+        """Evict entries periodically and report usage of the cache."""
+        while not self._stop.wait(timeout=self.interval):
+            try:
+                usage = self.evict()
+            except Exception:  # pylint: disable=broad-except
+                self.log.exception("Unable to evict entries from repositories cache.")
+                continue
+
+            self.log.info(
+                "Repositories cache takes {size} of {budget} bytes, hit rate {hit_rate:.1%} ({hits} hits, "
+                "{misses} misses), {evictions} entries ({evicted_bytes} bytes) evicted.".format(
+                    size=usage.size,
+                    budget=usage.disk_budget or "unlimited",
+                    hit_rate=usage.hit_rate,
+                    hits=usage.hits,
+                    misses=usage.misses,
+                    evictions=usage.evictions,
+                    evicted_bytes=usage.evicted_bytes
+                )
+            )
+
+    def _get_eviction_candidates(self, paths: List[str]) -> List[Tuple[str, float]]:
+        """Return which of given entries may be evicted along with their last access time, least recent first."""
+        last_accesses: Dict[str, float] = dict(self.database.execute("SELECT path, last_access FROM entry"))
+        protected = self._get_protected_paths()
+        candidates = []
+        for path in paths:
+            last_access = last_accesses.get(path) or os.path.getmtime(path)
+            if path in protected or time.time() - last_access < self.min_idle:
+                continue
+
+            candidates.append((path, last_access))
+
+        return sorted(candidates, key=lambda candidate: candidate[1])
+
+    def _list_entries(self) -> List[str]:
+        """Return paths of project worktrees and complete virtualenvs present in the cache."""
+        paths = [
+            entry.path for entry in os.scandir(self.cache_path)
+            if entry.name.isdigit() and entry.is_dir(follow_symlinks=False)
+        ] if os.path.isdir(self.cache_path) else []
+        return paths + self._list_virtualenvs()
+
+    def _list_virtualenvs(self) -> List[str]:
+        """Return paths of complete virtualenvs present in the cache."""
+        if not os.path.isdir(self.virtualenvs.store_path):
+            return []
+
+        return [
+            entry.path for entry in os.scandir(self.virtualenvs.store_path)
+            if entry.is_dir(follow_symlinks=False) and self.virtualenvs.is_complete(entry.path)
+        ]
+
+    def _get_size(self, path: str) -> int:
+        """Return size of entry under given path (virtualenvs are measured once, when they are built)."""
+        if os.path.dirname(path) == self.virtualenvs.store_path:
+            return self.virtualenvs.get_size(path)
+
+        return get_directory_size(path)
+
+    def _get_protected_paths(self) -> Set[str]:
+        """Return paths pinned by running processes, along with paths of virtualenvs linked into them."""
+        protected: Set[str] = set()
+        for token, path, pid in self.database.execute("SELECT token, path, pid FROM pin").fetchall():
+            if not self._is_running(pid):
+                self.database.execute("DELETE FROM pin WHERE token = ?", (token,))
+                continue
+
+            protected.add(path)
+            if os.path.isdir(path):
+                protected.update(
+                    os.path.realpath(entry.path) for entry in os.scandir(path) if entry.is_symlink()
+                )
+
+        return protected
+
+    def _remove(self, path: str) -> bool:
+        """Remove entry under given path, unless it was pinned in the meantime."""
+        evicted_path = os.path.join(self.cache_path, self.EVICTED_DIR, uuid.uuid4().hex)
+        with self.database.transaction():
+            if self.database.execute("SELECT 1 FROM pin WHERE path = ?", (path,)).fetchone():
+                return False
+
+            # Entry is moved away at once, so that process pinning it afterwards finds it missing
+            os.makedirs(os.path.dirname(evicted_path), exist_ok=True)
+            try:
+                os.rename(path, evicted_path)
+            except OSError:
+                self.log.warning("Unable to evict '{path}'.".format(path=path), exc_info=True)
+                return False
+            self.database.execute("DELETE FROM entry WHERE path = ?", (path,))
+
+        shutil.rmtree(evicted_path, ignore_errors=True)
+        return True
+
+    def _touch(self, path: str, kind: str) -> None:
+        """Set last access time of entry under given path."""
+        self.database.execute(
+            "INSERT OR REPLACE INTO entry (path, kind, last_access) VALUES (?, ?, ?)", (path, kind, time.time())
+        )
+
+    def _increment(self, name: str, value: int = 1) -> None:
+        """Increase value of given counter."""
+        self.database.execute(
+            "INSERT INTO counter (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            (name, value, value)
+        )
+
+    @staticmethod
+    def _is_running(pid: int) -> bool:
+        """Indicate if process with given id is running on this host."""
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
@@ -0,0 +1,155 @@
+"""This module contains persistent cache of check command outcomes."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+import hashlib
+from logging import getLogger, Logger
+import os
+import signal
+import subprocess
+import time
+from typing import Dict, NamedTuple, Optional  # noqa: F401 Imported for type definition
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.sqlite import SqliteDatabase
+from pipwatch_worker.worker.execution import ExecutionTimeout
+
+
+CheckResult = NamedTuple("CheckResult", [
+    ("passed", bool),
+    ("duration", float),
+    ("output_digest", str),
+    ("checked_at", float)
+])
+
+
+class CachedCheckFailure(Exception):
+    """Raised instead of running check command, which is already known to fail."""
+
+
+def get_packages_digest(installed_versions: Dict[str, str], python_version: str) -> str:
+    """Return digest of set of installed packages (and their versions) and of interpreter they are run with."""
+    return hashlib.sha256("\n".join([python_version] + [
+        "{name}=={version}".format(name=name, version=version)
+        for name, version in sorted(installed_versions.items())
+    ]).encode("utf-8")).hexdigest()
+
+
+def get_output_digest(output: Optional[bytes]) -> str:
+    """Return digest of check command output."""
+    return hashlib.sha256(output or b"").hexdigest()
+
+
+def is_check_failure(error: subprocess.CalledProcessError) -> bool:
+    """Indicate if check command failed on its own, rather than timed out or was killed (its outcome may be cached).
+
+    Commands are run by shell, which reports death of its child by signal N as exit code 128 + N.
+    """
+    if isinstance(error, ExecutionTimeout):
+        return False
+
+    return 0 < error.returncode <= 128 or error.returncode >= 128 + signal.NSIG
+
+
+class CheckResultsCache:
+    """Encompasses logic of storing outcomes of check command runs in sqlite database on local disk.
+
+    Outcome is identified by git tree of checked sources, digest of installed packages (and of
+    interpreter running them) and check command itself - as long as none of them changes, check
+    does not have to be run again. Entries are removed only explicitly (see 'invalidate') or when
+    there are more than 'max_entries' of them, least recently used first.
+    """
+
+    DEFAULT_MAX_ENTRIES = 10000
+
+    def __init__(self, database_path: str = None, max_entries: int = None, logger: Logger = None) -> None:
+        """Create class instance (cache without database path is disabled)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.database_path = database_path
+        self.max_entries = self.DEFAULT_MAX_ENTRIES if max_entries is None else max_entries
+        self.database = SqliteDatabase(path=database_path or "", schema=[
+            "CREATE TABLE IF NOT EXISTS check_results ("
+            "tree_hash TEXT NOT NULL, packages_digest TEXT NOT NULL, check_command TEXT NOT NULL, "
+            "passed INTEGER NOT NULL, duration REAL NOT NULL, output_digest TEXT NOT NULL, "
+            "checked_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+            "PRIMARY KEY (tree_hash, packages_digest, check_command))"
+        ])
+
+    @classmethod
+    def from_config(cls, cache_path: str, logger: Logger = None) -> "CheckResultsCache":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "check-results-cache"
+        if not configuration.getboolean(section=section, option="enabled", fallback=True):
+            return cls(logger=logger)
+
+        default_path = os.path.join(cache_path, ".check-results.sqlite")
+        database_path = os.path.expandvars(configuration.get(section=section, option="path", fallback=""))
+        return cls(
+            database_path=database_path or default_path,
+            max_entries=configuration.getint(section=section, option="max_entries", fallback=cls.DEFAULT_MAX_ENTRIES),
+            logger=logger
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Indicate if outcomes should be cached."""
+        return bool(self.database_path)
+
+    def get(self, tree_hash: str, packages_digest: str, check_command: str) -> Optional[CheckResult]:
+        """Return recorded outcome of check command run against given sources and packages."""
+        if not self.enabled:
+            return None
+
+        key = (tree_hash, packages_digest, check_command)
+        row = self.database.execute(
+            "SELECT passed, duration, output_digest, checked_at FROM check_results "
+            "WHERE tree_hash = ? AND packages_digest = ? AND check_command = ?", key
+        ).fetchone()
+        if not row:
+            return None
+
+        self.database.execute(
+            "UPDATE check_results SET accessed_at = ? "
+            "WHERE tree_hash = ? AND packages_digest = ? AND check_command = ?", (time.time(),) + key
+        )
+        return CheckResult(passed=bool(row[0]), duration=row[1], output_digest=row[2], checked_at=row[3])
+
+    def set(self, tree_hash: str, packages_digest: str, check_command: str, result: CheckResult) -> None:
+        """Record outcome of check command run against given sources and packages."""
+        if not self.enabled:
+            return
+
+        self.database.execute(
+            "INSERT OR REPLACE INTO check_results (tree_hash, packages_digest, check_command, passed, duration, "
+            "output_digest, checked_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (tree_hash, packages_digest, check_command, int(result.passed), result.duration,
+             result.output_digest, result.checked_at, time.time())
+        )
+        self.evict()
+
+    def invalidate(self, tree_hash: str = None, check_command: str = None) -> int:
+        """Remove recorded outcomes (all of them, or only of given tree / check command), return how many."""
+        if not self.enabled:
+            return 0
+
+        conditions, parameters = ["1 = 1"], []
+        if tree_hash:
+            conditions.append("tree_hash = ?")
+            parameters.append(tree_hash)
+
+        if check_command:
+            conditions.append("check_command = ?")
+            parameters.append(check_command)
+
+        removed = self.database.execute(
+            "DELETE FROM check_results WHERE " + " AND ".join(conditions), parameters
+        ).rowcount
+        self.log.info("Invalidated {count} check command outcomes.".format(count=removed))
+        return removed
+
+    def evict(self) -> int:
+        """Remove least recently used entries above maximum number of entries, return how many were removed."""
+        return self.database.execute(
+            "DELETE FROM check_results WHERE rowid IN ("
+            "SELECT rowid FROM check_results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
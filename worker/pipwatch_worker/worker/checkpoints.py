@@ -0,0 +1,75 @@
+"""This module contains persistent store of progress of processing each project, used to resume it."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from logging import Logger
+import os
+import time
+from typing import Any, Dict, NamedTuple, Optional  # noqa: F401 Imported for type definition
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.sqlite import ProjectRecordsStore
+
+
+Checkpoint = NamedTuple("Checkpoint", [
+    ("steps_completed", int),
+    ("state", str),
+    ("request_digest", str),
+    ("project_details", Dict[str, Any]),
+    ("workspace_path", str),
+    ("workspace_commit", str),
+    ("workspace_tree", str),
+    ("environment_fingerprint", str),
+    ("progress", Dict[str, Any]),
+    ("recorded_at", float)
+])
+
+
+class CheckpointStore(ProjectRecordsStore):
+    """Encompasses logic of storing progress of processing each project, as of its last completed state.
+
+    Checkpoint consists of number of completed steps, progress made by them (e.g. project details as
+    modified, outdated packages found) and fingerprints of project worktree and its virtualenv - task
+    resuming from the checkpoint has to find them the same way they were left. Checkpoints older than
+    'ttl' seconds are not used.
+    """
+
+    TABLE = "checkpoint"
+    RECORD_COLUMN = "checkpoint"
+    DEFAULT_TTL = 86400
+
+    def __init__(self, database_path: str = None, ttl: float = None, logger: Logger = None) -> None:
+        """Create class instance (store without database path is disabled)."""
+        super().__init__(database_path=database_path, logger=logger)
+        self.ttl = ttl or self.DEFAULT_TTL
+
+    @classmethod
+    def from_config(cls, cache_path: str, logger: Logger = None) -> "CheckpointStore":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "checkpoints"
+        if not configuration.getboolean(section=section, option="enabled", fallback=True):
+            return cls(logger=logger)
+
+        default_path = os.path.join(cache_path, ".checkpoints.sqlite")
+        database_path = os.path.expandvars(configuration.get(section=section, option="path", fallback=""))
+        return cls(
+            database_path=database_path or default_path,
+            ttl=configuration.getfloat(section=section, option="ttl", fallback=cls.DEFAULT_TTL),
+            logger=logger
+        )
+
+    def get(self, project_id: int) -> Optional[Checkpoint]:
+        """Return checkpoint of given project (or None if there is no fresh one)."""
+        record = self._get_record(project_id=project_id)
+        if not record:
+            return None
+
+        checkpoint = Checkpoint(**record)
+        if time.time() - checkpoint.recorded_at > self.ttl:
+            self.log.debug("Checkpoint of project {project_id} has expired.".format(project_id=project_id))
+            return None
+
+        return checkpoint
+
+    def set(self, project_id: int, checkpoint: Checkpoint) -> None:
+        """Store checkpoint of given project."""
+        self._set_record(project_id=project_id, record=checkpoint._asdict())
@@ -1,9 +1,18 @@
 """This module contains logic of running common commands within cloned project directory."""
 from configparser import ConfigParser  # noqa: F401 Imported for type definition
+import json
 import os
-import subprocess
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
 
 from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.utils import file_lock, get_pip_script_name, get_repository_cache_key, normalize_package_name
+from pipwatch_worker.worker.cache_manager import CacheManager
+from pipwatch_worker.worker.environments import get_python_version, VirtualenvStore
+from pipwatch_worker.worker.execution import ExecutionError, Executor
+from pipwatch_worker.worker.wheelhouse import Wheelhouse
 
 
 class RepositoriesCacheMixin:  # pylint: disable=too-few-public-methods
@@ -36,10 +45,12 @@ class Command(RepositoriesCacheMixin):  # pylint: disable=too-few-public-methods
     Command will ensure that project directory exists.
     """
 
-    def __init__(self, project_id: int) -> None:
-        """Create method instance."""
+    def __init__(self, project_id: int, project_dir_path: str = None) -> None:
+        """Create method instance (commands may be bound to other directory than default project one)."""
         super().__init__()
         self.project_id = project_id
+        self.project_dir_path = project_dir_path
+        self.executor = Executor.from_config(cache_path=self._projects_dir_path)
 
     def __call__(self, command: str, cwd: str = None) -> bytes:
         """Run given command within project directory and return standard output."""
@@ -54,79 +65,320 @@ class Command(RepositoriesCacheMixin):  # pylint: disable=too-few-public-methods
     @property
     def _project_dir_path(self) -> str:
         """Return full path to directory that should contain cloned project."""
-        return os.path.join(self._projects_dir_path, str(self.project_id))
+        if self.project_dir_path:
+            return self.project_dir_path
 
-    def _execute(self, command: str, cwd: str = None) -> bytes:
-        """Execute given command in directory of selected project."""
-        outcome = subprocess.run(args=command,
-                                 cwd=self._project_dir_path if not cwd else cwd,
-                                 stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE,
-                                 shell=True,
-                                 check=True)
+        return os.path.join(self._projects_dir_path, str(self.project_id))
 
-        return outcome.stdout
+    def _execute(self, command: str, cwd: str = None, env: Dict[str, str] = None, timeout: float = None) -> bytes:
+        """Execute given command in directory of selected project (see Executor) and return standard output."""
+        return self.executor(
+            command=command,
+            cwd=self._project_dir_path if not cwd else cwd,
+            env=env,
+            timeout=timeout
+        )
 
 
 class Git(Command):  # pylint: disable=too-few-public-methods
     """Encompasses logic of running git command for given project.
 
-    Command will ensure that the project is cloned.
+    Command will ensure that the project is checked out. Repository objects are kept in a bare
+    mirror (shared by all projects using the same repository url) and each project receives
+    its own worktree checked out from that mirror.
+
+    Mirrors may be created shallow (latest commit only) and blobless (file contents are fetched
+    on demand), and worktrees may be checked out sparsely (selected files only), so that telling
+    whether project needs an update does not require whole repository. Such worktree may be widened
+    to full one later on, while whole history is fetched into the mirror only when it is needed.
     """
 
+    MIRROR_REMOTE_REFSPEC = "+refs/heads/*:refs/remotes/origin/*"
+    WORKSPACES_DIR = ".workspaces"
+
     def __init__(self, project_id: int, project_url: str, project_upstream: str = None) -> None:
         """Create method instance."""
         super().__init__(project_id=project_id)
         self.project_url = project_url
         self.project_upstream_url = project_upstream
+        configuration: ConfigParser = load_config_file()
+        self.mirrors_dir_name = configuration.get(
+            section="repos_cache",
+            option="mirrors_directory_name",
+            fallback=".mirrors"
+        )
+        self.shallow_mirrors = configuration.getboolean(
+            section="repos_cache",
+            option="shallow_mirrors",
+            fallback=True
+        )
+        self.blobless_mirrors = configuration.getboolean(
+            section="repos_cache",
+            option="blobless_mirrors",
+            fallback=True
+        )
 
     def __call__(self, command: str, cwd: str = None) -> bytes:
         """Execute git command in given project repository."""
         os.makedirs(self._projects_dir_path, exist_ok=True)
         if not os.path.exists(self._project_dir_path):
-            self._clone_repository(cwd=cwd)
-            self._setup_upstream(cwd=cwd)
+            self.checkout_worktree()
 
         return self._execute(
             command="git {}".format(command),
             cwd=self._project_dir_path if not cwd else cwd
         )
 
-    def _clone_repository(self, cwd: str = None):
-        """Clone given git repository."""
+    @property
+    def default_branch(self) -> str:
+        """Return name of default branch of the repository (as advertised by origin on last fetch into mirror)."""
+        try:
+            remote_head = self._execute(
+                command="git symbolic-ref --short refs/remotes/origin/HEAD",
+                cwd=self._mirror_dir_path
+            ).decode().strip()
+            return remote_head[len("origin/"):]
+        except ExecutionError:
+            # Mirror was not fetched since origin HEAD started being tracked, HEAD is as of cloning it
+            return self._execute(
+                command="git symbolic-ref --short HEAD",
+                cwd=self._mirror_dir_path
+            ).decode().strip() or "master"
+
+    @property
+    def worktree_branch(self) -> str:
+        """Return name of local branch used by project worktree."""
+        return "pipwatch/{project_id}".format(project_id=self.project_id)
+
+    def checkout_worktree(self, sparse_paths: List[str] = None) -> None:
+        """Fetch latest changes into repository mirror and check out fresh project worktree from it.
+
+        Only files at given paths (relative to repository root) are checked out, if any are given.
+        """
+        with file_lock(self._mirror_lock_path):
+            self._update_mirror()
+            self._remove_worktree()
+            self._execute(
+                command="git worktree add --force {mode}-B {branch} --no-track {path} origin/{default_branch}".format(
+                    mode="--no-checkout " if sparse_paths else "",
+                    branch=self.worktree_branch,
+                    path=self._project_dir_path,
+                    default_branch=self.default_branch
+                ),
+                cwd=self._mirror_dir_path
+            )
+            if not sparse_paths:
+                return
+
+            self._execute(command="git sparse-checkout set --no-cone {paths}".format(
+                paths=" ".join("/" + path.replace(os.sep, "/").lstrip("/") for path in sparse_paths)
+            ))
+            self._execute(command="git read-tree -mu HEAD")
+
+    @property
+    def is_sparse(self) -> bool:
+        """Indicate if project worktree has only some of repository files checked out."""
+        try:
+            return self._execute(command="git config --get core.sparseCheckout").decode().strip() == "true"
+        except ExecutionError:
+            return False
+
+    @property
+    def is_shallow(self) -> bool:
+        """Indicate if repository mirror lacks history beyond commits it was fetched at."""
+        return self._execute(
+            command="git rev-parse --is-shallow-repository",
+            cwd=self._mirror_dir_path
+        ).decode().strip() == "true"
+
+    def fetch_history(self) -> None:
+        """Fetch whole history into shallow repository mirror (e.g. so that branches may be merged)."""
+        with file_lock(self._mirror_lock_path):
+            if self.is_shallow:
+                self._execute(command="git fetch --unshallow origin", cwd=self._mirror_dir_path)
+
+    def widen_worktree(self) -> None:
+        """Check out all files of sparse project worktree (contents missing in blobless mirror are fetched on demand).
+
+        History of the mirror is left as it is - it is fetched only where needed (see 'fetch_history').
+        """
+        if self.is_sparse:
+            self._execute(command="git sparse-checkout disable")
+
+    @property
+    def mirror_head(self) -> str:
+        """Return commit default branch of origin pointed to, as of last fetch into repository mirror."""
+        return self._execute(
+            command="git rev-parse origin/{default_branch}".format(default_branch=self.default_branch),
+            cwd=self._mirror_dir_path
+        ).decode().strip()
+
+    def get_remote_head(self, remote_url: str = None) -> str:
+        """Return commit HEAD of remote repository (origin by default) points to, without fetching anything."""
+        os.makedirs(self._projects_dir_path, exist_ok=True)
+        outcome = self._execute(
+            command="git ls-remote {url} HEAD".format(url=remote_url or self.project_url),
+            cwd=self._projects_dir_path
+        ).decode().split()
+        return outcome[0] if outcome else ""
+
+    def fetch_mirror(self) -> None:
+        """Fetch latest changes into repository mirror (without touching project worktree)."""
+        os.makedirs(self._projects_dir_path, exist_ok=True)
+        with file_lock(self._mirror_lock_path):
+            self._update_mirror()
+
+    def read_file(self, commit: str, path: str) -> Optional[bytes]:
+        """Return contents of file at given commit of repository mirror (or None if there is no such file)."""
+        try:
+            return self._execute(
+                command="git cat-file blob {commit}:{path}".format(commit=commit, path=path),
+                cwd=self._mirror_dir_path
+            )
+        except ExecutionError:
+            return None
+
+    def get_tree_hash(self, worktree_path: str = None) -> str:
+        """Return hash of git tree of given worktree (project one by default), including uncommitted changes."""
+        worktree_path = worktree_path or self._project_dir_path
+        with tempfile.TemporaryDirectory() as index_directory:
+            environment = dict(os.environ)
+            environment["GIT_INDEX_FILE"] = os.path.join(index_directory, "index")
+            self._execute(command="git read-tree HEAD", cwd=worktree_path, env=environment)
+            self._execute(command="git add --update", cwd=worktree_path, env=environment)
+            return self._execute(command="git write-tree", cwd=worktree_path, env=environment).decode().strip()
+
+    @contextmanager
+    def workspace(self, name: str) -> Iterator[str]:
+        """Provide additional, detached worktree at the commit project worktree is at and remove it afterwards."""
+        path = os.path.join(
+            self._projects_dir_path,
+            self.WORKSPACES_DIR,
+            "{project_id}-{name}".format(project_id=self.project_id, name=name)
+        )
+        commit = self._execute(command="git rev-parse HEAD", cwd=self._project_dir_path).decode().strip()
+        with file_lock(self._mirror_lock_path):
+            shutil.rmtree(path, ignore_errors=True)
+            self._execute(command="git worktree prune", cwd=self._mirror_dir_path)
+            self._execute(
+                command="git worktree add --force --detach {path} {commit}".format(path=path, commit=commit),
+                cwd=self._mirror_dir_path
+            )
+
+        try:
+            yield path
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+            with file_lock(self._mirror_lock_path):
+                self._execute(command="git worktree prune", cwd=self._mirror_dir_path)
+
+    @property
+    def _mirrors_dir_path(self) -> str:
+        """Return full path to directory containing bare mirrors of all repositories."""
+        return os.path.join(self._projects_dir_path, self.mirrors_dir_name)
+
+    @property
+    def _mirror_dir_path(self) -> str:
+        """Return full path to bare mirror of project repository."""
+        return os.path.join(self._mirrors_dir_path, get_repository_cache_key(self.project_url))
+
+    @property
+    def _mirror_lock_path(self) -> str:
+        """Return full path to file guarding concurrent access to the mirror."""
+        return self._mirror_dir_path + ".lock"
+
+    def _update_mirror(self) -> None:
+        """Create bare mirror of repository or fetch objects that are missing in it (along with origin HEAD)."""
+        if not os.path.exists(self._mirror_dir_path):
+            self._clone_repository()
+
+        self._setup_upstream()
+        self._execute(command="git fetch --prune origin", cwd=self._mirror_dir_path)
+        try:
+            # Default branch of origin may have changed since mirror was cloned
+            self._execute(command="git remote set-head origin --auto", cwd=self._mirror_dir_path)
+        except ExecutionError:
+            pass
+
+    def _remove_worktree(self) -> None:
+        """Remove project worktree left behind by previous run."""
+        if os.path.exists(self._project_dir_path):
+            shutil.rmtree(self._project_dir_path)
+
+        self._execute(command="git worktree prune", cwd=self._mirror_dir_path)
+
+    def _clone_repository(self) -> None:
+        """Clone given git repository as bare mirror."""
+        os.makedirs(self._mirrors_dir_path, exist_ok=True)
         self._execute(
-            command="git clone {} {}".format(self.project_url, str(self.project_id)),
-            cwd=self._projects_dir_path if not cwd else cwd
+            command="git clone --bare {options}{url} {path}".format(
+                options="".join([
+                    "--depth 1 " if self.shallow_mirrors else "",
+                    "--filter=blob:none " if self.blobless_mirrors else ""
+                ]),
+                url=self.project_url,
+                path=self._mirror_dir_path
+            ),
+            cwd=self._mirrors_dir_path
+        )
+        self._execute(
+            command="git config remote.origin.fetch {}".format(self.MIRROR_REMOTE_REFSPEC),
+            cwd=self._mirror_dir_path
         )
 
-    def _setup_upstream(self, cwd: str = None):
-        """Add upstream information to cloned repository."""
+    def _setup_upstream(self) -> None:
+        """Add upstream information to repository mirror."""
         if not self.project_upstream_url:
             return
 
+        remotes = self._execute(command="git remote", cwd=self._mirror_dir_path).decode().split()
+        if "upstream" in remotes:
+            return
+
         self._execute(
             command="git remote add upstream {}".format(self.project_upstream_url),
-            cwd=self._projects_dir_path if not cwd else cwd
+            cwd=self._mirror_dir_path
         )
 
 
 class FromVirtualenv(Command):  # pylint: disable=too-few-public-methods
     """Encompasses logic of running executables from virtualenv of given project.
 
-    Command will ensure that the project virtualenv exists.
+    Command will ensure that virtualenv matching current contents of project requirements files
+    exists. Virtualenvs are content-addressed (see VirtualenvStore) - an existing one is reused
+    as long as requirements do not change and a new one is built (with all requirements
+    installed) when they do. Project directory contains link to the virtualenv in use.
     """
 
     DEFAULT_VENV_COMMAND_NAME = "virtualenv"
     DEFAULT_VENV_DIR = "virtualenv"
 
-    def __init__(self, project_id: int,
+    def __init__(self, project_id: int,  # pylint: disable=too-many-arguments
+                 requirements_files: List[str] = None,
                  venv_command_name: str = None,
-                 venv_dir: str = None) -> None:
+                 venv_dir: str = None,
+                 project_dir_path: str = None) -> None:
         """Create method instance."""
-        super().__init__(project_id=project_id)
+        super().__init__(project_id=project_id, project_dir_path=project_dir_path)
+        self.requirements_files = requirements_files or []
         self.venv_dir = venv_dir if venv_dir else self.DEFAULT_VENV_DIR
         self.venv_command_name = venv_command_name if venv_command_name \
             else self.DEFAULT_VENV_COMMAND_NAME
+        self.virtualenvs = VirtualenvStore(cache_path=self._projects_dir_path)
+        self.wheelhouse = Wheelhouse.from_config(cache_path=self._projects_dir_path)
+        self.cache = CacheManager.from_config(cache_path=self._projects_dir_path)
+
+        configuration: ConfigParser = load_config_file()
+        self.check_timeout = configuration.getfloat(
+            section="execution",
+            option="check_timeout",
+            fallback=self.executor.timeout
+        )
+        self.batched_install = configuration.getboolean(
+            section="pipwatch-worker",
+            option="batched_install",
+            fallback=True
+        )
 
     @property
     def _venv_bin_directory_path(self) -> str:
@@ -135,32 +387,190 @@ class FromVirtualenv(Command):  # pylint: disable=too-few-public-methods
         return os.path.join(self.venv_dir, bin_directory)
 
     @property
-    def _venv_creation_command(self) -> str:
+    def _python_command(self) -> str:
+        """Return name of python interpreter virtualenvs are created with."""
+        return "python3" if os.name != "nt" else "python"
+
+    @property
+    def python_version(self) -> str:
+        """Return full version of python interpreter virtualenvs are created with."""
+        return get_python_version(python_command=self._python_command)
+
+    def _venv_creation_command(self, venv_path: str) -> str:
         """Return shell command for creation of virtualenv."""
         command = "{virtualenv} {dir}".format(
             virtualenv=self.venv_command_name,
-            dir=self.venv_dir
+            dir=venv_path
         )
 
         if os.name != "nt":
-            command += " --python=python3"
+            command += " --python={python}".format(python=self._python_command)
 
         return command
 
+    @property
+    def fingerprint(self) -> str:
+        """Return fingerprint of virtualenv matching current project requirements."""
+        return self.virtualenvs.get_fingerprint(
+            python_command=self._python_command,
+            project_dir_path=self._project_dir_path,
+            requirements_files=self.requirements_files
+        )
+
     def __call__(self, command: str, cwd: str = None) -> bytes:
         """Run executable from virtualenv bin directory.
 
         Important: cwd parameter is ignored. Command is always run at the top of the project dir.
         """
+        self.prepare()
+        return self._execute(
+            command="{cmd}".format(cmd=os.path.join(self._venv_bin_directory_path, command)),
+            cwd=self._project_dir_path
+        )
+
+    def run_activated(self, command: str) -> bytes:
+        """Run shell command in project dir, with project virtualenv activated."""
+        venv_full_path = os.path.realpath(os.path.join(self._project_dir_path, self.venv_dir))
+        environment = dict(os.environ)
+        environment.pop("PYTHONHOME", None)
+        environment["VIRTUAL_ENV"] = venv_full_path
+        environment["PATH"] = os.pathsep.join([
+            os.path.join(venv_full_path, os.path.basename(self._venv_bin_directory_path)),
+            environment.get("PATH", "")
+        ])
+        return self._execute(command=command, cwd=self._project_dir_path, env=environment, timeout=self.check_timeout)
+
+    def prepare(self) -> str:
+        """Ensure virtualenv for current project requirements exists and is linked into project dir."""
         os.makedirs(self._project_dir_path, exist_ok=True)
-        venv_full_path = os.path.join(self._project_dir_path, self.venv_dir)
-        if not os.path.exists(venv_full_path):
+        venv_full_path = self.virtualenvs.get_path(self.fingerprint)
+
+        with file_lock(venv_full_path + ".lock"):
+            is_complete = self.virtualenvs.is_complete(venv_full_path)
+            self.cache.record_access(path=venv_full_path, kind=CacheManager.KIND_VIRTUALENV, hit=is_complete)
+            if is_complete:
+                self.virtualenvs.mark_used(venv_full_path)
+            else:
+                self._build(venv_full_path=venv_full_path)
+
+        self._link(venv_full_path=venv_full_path)
+        return venv_full_path
+
+    @contextmanager
+    def attempt(self, base_venv_path: str) -> Iterator[str]:
+        """Provide virtualenv for current project requirements, made as a clone of given base virtualenv.
+
+        Clone has current requirements installed on top of base virtualenv contents. It is stored for reuse
+        when the block succeeds and removed (with project linked back to base virtualenv) when it fails.
+        """
+        venv_full_path = self.virtualenvs.get_path(self.fingerprint)
+        if self.virtualenvs.is_complete(venv_full_path):
+            yield self.prepare()
+            return
+
+        attempt_path = self.virtualenvs.clone(source_path=base_venv_path)
+        try:
+            self._link(venv_full_path=attempt_path)
+            self._install_requirements(venv_full_path=attempt_path)
+            yield attempt_path
+        except BaseException:
+            self._link(venv_full_path=base_venv_path)
+            self.virtualenvs.discard(attempt_path=attempt_path)
+            raise
+
+        with file_lock(venv_full_path + ".lock"):
+            venv_full_path = self.virtualenvs.promote(attempt_path=attempt_path, fingerprint=self.fingerprint)
+
+        self._link(venv_full_path=venv_full_path)
+
+    def _build(self, venv_full_path: str) -> None:
+        """Create virtualenv and install all project requirements into it."""
+        if os.path.exists(venv_full_path):
+            shutil.rmtree(venv_full_path)
+
+        os.makedirs(self.virtualenvs.store_path, exist_ok=True)
+        self._execute(command=self._venv_creation_command(venv_path=venv_full_path), cwd=self._project_dir_path)
+        self._install_requirements(venv_full_path=venv_full_path)
+        self.virtualenvs.mark_complete(venv_full_path)
+
+    def get_installed_versions(self) -> Dict[str, str]:
+        """Return versions of packages installed in virtualenv currently linked into project dir."""
+        outcome = self._execute(
+            command="{pip} list --format=json".format(
+                pip=os.path.join(self._venv_bin_directory_path, get_pip_script_name())
+            ),
+            cwd=self._project_dir_path
+        )
+        return {
+            normalize_package_name(package["name"]): package["version"]
+            for package in json.loads(outcome.decode() or "[]")
+        }
+
+    def _install_requirements(self, venv_full_path: str) -> None:
+        """Install all project requirements into given virtualenv.
+
+        In batched mode all requirements files are passed to single pip invocation, so that they are
+        resolved together (once) - otherwise each file is installed (and resolved) separately.
+        """
+        bin_directory = os.path.join(venv_full_path, os.path.basename(self._venv_bin_directory_path))
+        pip = os.path.join(bin_directory, get_pip_script_name())
+        requirements_options = [
+            " ".join("-r {file}".format(file=file) for file in self.requirements_files)
+        ] if self.batched_install else ["-r {file}".format(file=file) for file in self.requirements_files]
+
+        for options in requirements_options:
+            if not options:
+                continue
+
+            if not self.wheelhouse.enabled:
+                self._execute(
+                    command="{pip} install {options}".format(pip=pip, options=options),
+                    cwd=self._project_dir_path
+                )
+                continue
+
+            self._install_from_wheelhouse(pip=pip, requirements_options=options)
+
+        self.wheelhouse.collect_garbage()
+
+    def _install_from_wheelhouse(self, pip: str, requirements_options: str) -> None:
+        """Install requirements files using wheels gathered in (and added to) the wheelhouse.
+
+        Wheels of all requirements are first collected into staging directory - taken from wheelhouse
+        when present there, downloaded or built otherwise. Once verified, they are installed without
+        contacting package index.
+        """
+        with self.wheelhouse.staging() as staging_path:
+            wheel_command = "{pip} wheel --wheel-dir {staging} --find-links {wheelhouse} --prefer-binary {options}".format(  # noqa: E501 pylint: disable=line-too-long
+                pip=pip,
+                staging=staging_path,
+                wheelhouse=self.wheelhouse.directory_path,
+                options=requirements_options
+            )
+            self._execute(command=wheel_command, cwd=self._project_dir_path)
+            if self.wheelhouse.store(staging_path=staging_path):
+                # Corrupted wheels were removed from both directories - retrieve them once again
+                self._execute(command=wheel_command, cwd=self._project_dir_path)
+                self.wheelhouse.store(staging_path=staging_path)
+
             self._execute(
-                command=self._venv_creation_command,
+                command="{pip} install --no-index --find-links {staging} {options}".format(
+                    pip=pip,
+                    staging=staging_path,
+                    options=requirements_options
+                ),
                 cwd=self._project_dir_path
             )
 
-        return self._execute(
-            command="{cmd}".format(cmd=os.path.join(self._venv_bin_directory_path, command)),
-            cwd=self._project_dir_path
-        )
+    def _link(self, venv_full_path: str) -> None:
+        """Point virtualenv directory of the project to given virtualenv."""
+        link_path = os.path.join(self._project_dir_path, self.venv_dir)
+        if os.path.islink(link_path) and os.readlink(link_path) == venv_full_path:
+            return
+
+        if os.path.islink(link_path):
+            os.remove(link_path)
+        elif os.path.isdir(link_path):
+            shutil.rmtree(link_path)
+
+        os.symlink(venv_full_path, link_path, target_is_directory=True)
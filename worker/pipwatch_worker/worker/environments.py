@@ -0,0 +1,253 @@
+"""This module contains logic of storing virtualenvs addressed by contents of requirements they were built from."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from functools import lru_cache
+import hashlib
+from logging import getLogger, Logger
+import os
+import re
+import shutil
+import subprocess
+import time
+from typing import Iterable, List, Optional, Set  # noqa: F401 Imported for type definition
+import uuid
+
+from pipwatch_worker.core.configuration import load_config_file
+
+
+INCLUDE_OPTION_PATTERN = re.compile(r"^(-r|-c|--requirement|--constraint)(\s+|=)(?P<path>.+)$")
+EDITABLE_OPTION_PATTERN = re.compile(r"^(-e|--editable)(\s+|=)(?P<target>.+)$")
+LOCAL_TARGET_PATTERN = re.compile(r"^(\.|/|~|file:)")
+
+
+@lru_cache(maxsize=None)
+def get_python_version(python_command: str) -> str:
+    """Return full version of python interpreter used for creation of virtualenvs."""
+    outcome = subprocess.run(
+        args="{python} -c \"import sys; print(sys.version)\"".format(python=python_command),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        shell=True,
+        check=True
+    )
+    return outcome.stdout.decode().strip()
+
+
+def get_directory_size(path: str) -> int:
+    """Return total size (in bytes) of files in given directory."""
+    size = 0
+    for root, _, files in os.walk(path):
+        for file_name in files:
+            file_path = os.path.join(root, file_name)
+            if not os.path.islink(file_path):
+                size += os.path.getsize(file_path)
+
+    return size
+
+
+def _link_or_copy(source: str, destination: str) -> None:
+    """Hardlink given file (or copy it, when hardlinks are not supported)."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def clone_directory(source: str, destination: str) -> None:
+    """Create copy-on-write clone of directory, using reflinks or hardlinks where file system supports them."""
+    if os.name != "nt":
+        outcome = subprocess.run(
+            args=["cp", "-a", "--reflink=always", source, destination],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        if outcome.returncode == 0:
+            return
+
+        shutil.rmtree(destination, ignore_errors=True)
+
+    shutil.copytree(source, destination, symlinks=True, copy_function=_link_or_copy)
+
+
+def relocate_scripts(path: str, previous_path: str) -> None:
+    """Rewrite virtualenv scripts (shebangs, activate scripts) which still refer to its previous location.
+
+    Scripts are rewritten into new files, so that the ones shared (hardlinked) with other virtualenvs
+    are left intact.
+    """
+    bin_directory = os.path.join(path, "bin" if os.name != "nt" else "Scripts")
+    previous_path_bytes = previous_path.encode("utf-8")
+    for entry in os.scandir(bin_directory):
+        if not entry.is_file(follow_symlinks=False):
+            continue
+
+        with open(entry.path, "rb") as file:
+            content = file.read()
+
+        if previous_path_bytes not in content:
+            continue
+
+        temporary_path = entry.path + ".pipwatch-tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(content.replace(previous_path_bytes, path.encode("utf-8")))
+
+        shutil.copymode(entry.path, temporary_path)
+        os.replace(temporary_path, entry.path)
+
+
+class VirtualenvStore:
+    """Encompasses logic of addressing, tracking usage and garbage collecting of virtualenvs.
+
+    Virtualenv is identified by fingerprint of python version and normalized contents of all
+    requirements files it was built from - projects with identical requirements share virtualenv.
+    Least recently used virtualenvs are evicted by CacheManager once their total size exceeds
+    configured budget.
+    """
+
+    ATTEMPTS_DIR = ".attempts"
+    COMPLETE_MARKER = ".pipwatch-complete"
+    SIZE_MARKER = ".pipwatch-size"
+
+    def __init__(self, cache_path: str, logger: Logger = None) -> None:
+        """Create class instance, storing virtualenvs within given cache directory."""
+        self.cache_path = cache_path
+        self.log: Logger = logger or getLogger(__name__)
+        configuration: ConfigParser = load_config_file()
+        self.virtualenvs_dir_name = configuration.get(
+            section="repos_cache",
+            option="virtualenvs_directory_name",
+            fallback=".virtualenvs"
+        )
+        self.disk_budget = configuration.getint(
+            section="repos_cache",
+            option="virtualenvs_disk_budget",
+            fallback=0
+        )
+
+    @property
+    def store_path(self) -> str:
+        """Return full path to directory containing all virtualenvs."""
+        return os.path.join(self.cache_path, self.virtualenvs_dir_name)
+
+    def get_path(self, fingerprint: str) -> str:
+        """Return full path to virtualenv with given fingerprint."""
+        return os.path.join(self.store_path, fingerprint)
+
+    def get_fingerprint(self, python_command: str, project_dir_path: str, requirements_files: Iterable[str]) -> str:
+        """Return fingerprint of virtualenv created by given python for given requirements files.
+
+        Requirements pointing at local paths (including editable installs) are bound to the absolute
+        path of their target, so that projects do not share virtualenvs with each other's packages.
+        """
+        files_digests = sorted(
+            hashlib.sha256("\n".join(self._get_normalized_lines(
+                file_path=os.path.join(project_dir_path, file_path),
+                project_dir_path=project_dir_path
+            )).encode("utf-8")).hexdigest()
+            for file_path in requirements_files
+        )
+        fingerprint = hashlib.sha256(get_python_version(python_command).encode("utf-8"))
+        for file_digest in files_digests:
+            fingerprint.update(file_digest.encode("utf-8"))
+
+        return fingerprint.hexdigest()
+
+    def is_complete(self, path: str) -> bool:
+        """Indicate if virtualenv under given path was fully built."""
+        return os.path.exists(os.path.join(path, self.COMPLETE_MARKER))
+
+    def mark_complete(self, path: str) -> None:
+        """Mark virtualenv under given path as fully built and remember its size."""
+        with open(os.path.join(path, self.SIZE_MARKER), "w", encoding="utf-8") as file:
+            file.write(str(get_directory_size(path)))
+
+        with open(os.path.join(path, self.COMPLETE_MARKER), "w", encoding="utf-8") as file:
+            file.write(str(time.time()))
+
+    def mark_used(self, path: str) -> None:
+        """Record that virtualenv under given path was just used."""
+        os.utime(os.path.join(path, self.COMPLETE_MARKER))
+
+    def clone(self, source_path: str) -> str:
+        """Create cheap copy of complete virtualenv, which may be freely modified and return its path."""
+        attempt_path = os.path.join(self.store_path, self.ATTEMPTS_DIR, uuid.uuid4().hex)
+        os.makedirs(os.path.dirname(attempt_path), exist_ok=True)
+        self.log.debug("Cloning virtualenv '{source}' into '{destination}'.".format(
+            source=source_path,
+            destination=attempt_path
+        ))
+        clone_directory(source=source_path, destination=attempt_path)
+        os.remove(os.path.join(attempt_path, self.COMPLETE_MARKER))
+        relocate_scripts(path=attempt_path, previous_path=source_path)
+        return attempt_path
+
+    def promote(self, attempt_path: str, fingerprint: str) -> str:
+        """Store virtualenv clone under given fingerprint and return its final path."""
+        path = self.get_path(fingerprint)
+        if self.is_complete(path):
+            self.discard(attempt_path)
+            self.mark_used(path)
+            return path
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(attempt_path, path)
+        relocate_scripts(path=path, previous_path=attempt_path)
+        self.mark_complete(path)
+        return path
+
+    def discard(self, attempt_path: str) -> None:
+        """Remove virtualenv clone."""
+        self.log.debug("Removing virtualenv clone '{path}'.".format(path=attempt_path))
+        shutil.rmtree(attempt_path, ignore_errors=True)
+
+    def get_size(self, path: str) -> int:
+        """Return size of complete virtualenv, as measured when it was built."""
+        try:
+            with open(os.path.join(path, self.SIZE_MARKER), "r", encoding="utf-8") as file:
+                return int(file.read())
+        except (OSError, ValueError):
+            return get_directory_size(path)
+
+    def _get_normalized_lines(self, file_path: str, project_dir_path: str, visited: Set[str] = None) -> List[str]:
+        """Return sorted meaningful lines of requirements file (along with files it includes).
+
+        Missing files are represented by marker line, so that they are not mistaken for empty ones.
+        """
+        visited = visited or set()
+        if file_path in visited:
+            return []
+
+        if not os.path.isfile(file_path):
+            return ["missing:{path}".format(path=os.path.relpath(file_path, project_dir_path))]
+
+        visited.add(file_path)
+        lines = []
+        with open(file_path, "r", encoding="utf-8") as file:
+            for raw_line in file:
+                line = re.sub(r"(^|\s)#.*$", "", raw_line).strip()
+                if not line:
+                    continue
+
+                include = INCLUDE_OPTION_PATTERN.match(line)
+                if include:
+                    included_path = os.path.join(os.path.dirname(file_path), include.group("path").strip())
+                    lines.extend(self._get_normalized_lines(included_path, project_dir_path, visited))
+                    continue
+
+                lines.append(self._get_local_requirement_line(line=line, project_dir_path=project_dir_path) or line)
+
+        return sorted(lines)
+
+    @staticmethod
+    def _get_local_requirement_line(line: str, project_dir_path: str) -> Optional[str]:
+        """Return requirement line bound to absolute path of its target, None if it does not point at local path."""
+        editable = EDITABLE_OPTION_PATTERN.match(line)
+        target = editable.group("target").strip() if editable else line
+        if " @ " in target:
+            target = target.split(" @ ", 1)[1].strip()
+
+        if not LOCAL_TARGET_PATTERN.match(target):
+            return None
+
+        path = re.match(r"^[^#\[;\s]+", re.sub(r"^file:(//)?", "", target)).group(0)  # type: ignore
+        target_path = os.path.realpath(os.path.join(project_dir_path, os.path.expanduser(path)))
+        return "local:{path}:{line}".format(path=target_path, line=line)
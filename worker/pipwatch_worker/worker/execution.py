@@ -0,0 +1,283 @@
+"""This module contains logic of running shell commands with their output streamed to disk."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from logging import getLogger, Logger
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union  # noqa: F401 Imported for type definition
+
+from celery import current_task
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.worker import limits as limits_launcher
+from pipwatch_worker.worker.sandbox import Sandbox
+
+
+class ExecutionError(subprocess.CalledProcessError):
+    """Raised when command exits with non-zero code - carries the tail of its output."""
+
+    def __init__(self, returncode: int, cmd: str, output: bytes = None, tail: bytes = b"") -> None:
+        """Create exception instance."""
+        super().__init__(returncode=returncode, cmd=cmd, output=output, stderr=tail)
+        self.tail = tail
+
+    def __str__(self) -> str:
+        """Return description of failure along with the tail of command output."""
+        return "{description}\n{tail}".format(
+            description=super().__str__(),
+            tail=self.tail.decode("utf-8", errors="replace")
+        )
+
+
+class ExecutionTimeout(ExecutionError):
+    """Raised when command (along with its whole process group) was killed after exceeding its time limit."""
+
+    def __init__(self, cmd: str, timeout: float, output: bytes = None, tail: bytes = b"") -> None:
+        """Create exception instance."""
+        super().__init__(returncode=-signal.SIGKILL, cmd=cmd, output=output, tail=tail)
+        self.timeout = timeout
+
+    def __str__(self) -> str:
+        """Return description of timeout along with the tail of command output."""
+        return "Command '{cmd}' timed out after {timeout} seconds.\n{tail}".format(
+            cmd=self.cmd,
+            timeout=self.timeout,
+            tail=self.tail.decode("utf-8", errors="replace")
+        )
+
+
+class OutputSpool:
+    """Append-only log file, rotated once it grows above given size (keeping given number of backups).
+
+    Spools of the same file (e.g. of commands run concurrently by single task) share a lock. File is
+    opened for each write, so that none of them keeps writing into backup once another one rotated it.
+    """
+
+    _locks: Dict[str, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int) -> None:
+        """Create class instance."""
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        with self._locks_guard:
+            self._lock = self._locks.setdefault(path, threading.Lock())
+
+    def __enter__(self) -> "OutputSpool":
+        """Make sure directory of log file exists."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Nothing to clean up - log file is not kept open."""
+
+    def write(self, data: bytes) -> None:
+        """Append data to the log, rotating it when needed."""
+        with self._lock:
+            with open(self.path, "ab") as file:
+                file.write(data)
+                size = file.tell()
+
+            if self.max_bytes and size >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self) -> None:
+        """Move current log to first backup (shifting older ones), so that the next write starts a new one."""
+        for index in range(self.backup_count - 1, 0, -1):
+            source = "{path}.{index}".format(path=self.path, index=index)
+            if os.path.exists(source):
+                os.replace(source, "{path}.{index}".format(path=self.path, index=index + 1))
+
+        if self.backup_count:
+            os.replace(self.path, "{path}.1".format(path=self.path))
+        else:
+            os.remove(self.path)
+
+
+class Executor:  # pylint: disable=too-many-instance-attributes
+    """Encompasses logic of running shell commands without keeping their whole output in memory.
+
+    Standard output and error are read incrementally and appended to log file of current celery
+    task (rotated when it grows too big). Only standard output up to configured size and a bounded
+    tail of both streams are kept in memory. Each command runs in its own process group, which is
+    killed as a whole when the command exceeds its wall-clock limit (and afterwards, so that no
+    stray background processes outlive the command). CPU time of each process is limited as well,
+    along with limits of the sandbox (see Sandbox) - limits are applied by separate launcher script,
+    as forked multi-threaded worker must not run any python code before executing the command.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    DEFAULT_TIMEOUT = 3600
+    DEFAULT_MAX_CAPTURED_OUTPUT = 16 * 1024 * 1024
+    DEFAULT_TAIL_SIZE = 64 * 1024
+    DEFAULT_LOG_MAX_BYTES = 10 * 1024 * 1024
+    DEFAULT_LOG_BACKUP_COUNT = 3
+
+    def __init__(self, logs_path: str,  # pylint: disable=too-many-arguments
+                 timeout: float = None,
+                 cpu_time: int = 0,
+                 max_captured_output: int = None,
+                 tail_size: int = None,
+                 log_max_bytes: int = None,
+                 log_backup_count: int = None,
+                 sandbox: Sandbox = None,
+                 logger: Logger = None) -> None:
+        """Create class instance (limits of 0 mean no limit)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.logs_path = logs_path
+        self.timeout = self.DEFAULT_TIMEOUT if timeout is None else timeout
+        self.cpu_time = cpu_time
+        self.max_captured_output = self.DEFAULT_MAX_CAPTURED_OUTPUT if max_captured_output is None \
+            else max_captured_output
+        self.tail_size = self.DEFAULT_TAIL_SIZE if tail_size is None else tail_size
+        self.log_max_bytes = self.DEFAULT_LOG_MAX_BYTES if log_max_bytes is None else log_max_bytes
+        self.log_backup_count = self.DEFAULT_LOG_BACKUP_COUNT if log_backup_count is None else log_backup_count
+        self.sandbox = sandbox or Sandbox(logger=self.log)
+
+    @classmethod
+    def from_config(cls, cache_path: str, logger: Logger = None) -> "Executor":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "execution"
+        return cls(
+            logs_path=os.path.join(
+                cache_path,
+                configuration.get(section=section, option="logs_directory_name", fallback=".logs")
+            ),
+            timeout=configuration.getfloat(section=section, option="timeout", fallback=cls.DEFAULT_TIMEOUT),
+            cpu_time=configuration.getint(section=section, option="cpu_time", fallback=0),
+            max_captured_output=configuration.getint(
+                section=section, option="max_captured_output", fallback=cls.DEFAULT_MAX_CAPTURED_OUTPUT
+            ),
+            tail_size=configuration.getint(section=section, option="tail_size", fallback=cls.DEFAULT_TAIL_SIZE),
+            log_max_bytes=configuration.getint(
+                section=section, option="log_max_bytes", fallback=cls.DEFAULT_LOG_MAX_BYTES
+            ),
+            log_backup_count=configuration.getint(
+                section=section, option="log_backup_count", fallback=cls.DEFAULT_LOG_BACKUP_COUNT
+            ),
+            sandbox=Sandbox.from_config(logger=logger),
+            logger=logger
+        )
+
+    @property
+    def log_path(self) -> str:
+        """Return path to log file of current celery task (or of current process, outside of tasks)."""
+        task_id = current_task.request.id if current_task and current_task.request.id else None
+        name = task_id or "process-{pid}".format(pid=os.getpid())
+        return os.path.join(self.logs_path, "{name}.log".format(name=re.sub(r"[^\w.-]+", "-", name)))
+
+    def __call__(self, command: str, cwd: str = None, env: Dict[str, str] = None,
+                 timeout: float = None) -> bytes:
+        """Run given shell command and return its standard output (raise ExecutionError if it fails)."""
+        timeout = self.timeout if timeout is None else timeout
+        captured = bytearray()
+        tail = bytearray()
+        tail_lock = threading.Lock()
+
+        with OutputSpool(self.log_path, self.log_max_bytes, self.log_backup_count) as spool, \
+                self.sandbox.cgroup() as cgroup_path:
+            spool.write("$ {command}\n".format(command=command).encode("utf-8"))
+            started_at = time.time()
+            arguments = self._get_arguments(command=command, cgroup_path=cgroup_path)
+            process = subprocess.Popen(
+                args=arguments,
+                cwd=cwd,
+                env=env,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                shell=isinstance(arguments, str),
+                start_new_session=True
+            )
+
+            def pump(stream: BinaryIO, capture: bool) -> None:
+                """Move output of the stream to spool (and captured output, if requested)."""
+                for chunk in iter(lambda: stream.read1(self.CHUNK_SIZE), b""):  # type: ignore
+                    spool.write(chunk)
+                    with tail_lock:
+                        tail.extend(chunk)
+                        del tail[:-self.tail_size]
+
+                    if capture and len(captured) < self.max_captured_output:
+                        captured.extend(chunk[:self.max_captured_output - len(captured)])
+
+            readers = [
+                threading.Thread(target=pump, args=(process.stdout, True), daemon=True),
+                threading.Thread(target=pump, args=(process.stderr, False), daemon=True)
+            ]
+            for reader in readers:
+                reader.start()
+
+            timed_out = self._wait(process=process, command=command, timeout=timeout)
+            for reader in readers:
+                reader.join()
+
+            spool.write("# exit code {code} after {duration:.1f}s\n".format(
+                code=process.returncode,
+                duration=time.time() - started_at
+            ).encode("utf-8"))
+
+        if len(captured) >= self.max_captured_output:
+            self.log.warning("Output of command '{command}' was truncated to {size} bytes.".format(
+                command=command,
+                size=self.max_captured_output
+            ))
+
+        if timed_out:
+            raise ExecutionTimeout(cmd=command, timeout=timeout, output=bytes(captured), tail=bytes(tail))
+
+        if process.returncode != 0:
+            raise ExecutionError(returncode=process.returncode, cmd=command, output=bytes(captured), tail=bytes(tail))
+
+        return bytes(captured)
+
+    def get_limits(self) -> List[Tuple[str, int]]:
+        """Return resource limits (see limits module) each command should run with."""
+        return ([("cpu", self.cpu_time)] if self.cpu_time else []) + self.sandbox.get_limits()
+
+    def _get_arguments(self, command: str, cgroup_path: str = None) -> Union[str, List[str]]:
+        """Return arguments of process running given command - through limits launcher, if needed."""
+        limits = self.get_limits()
+        if os.name == "nt" or not (limits or cgroup_path):
+            return command
+
+        arguments = [sys.executable, "-I", limits_launcher.__file__]
+        arguments.extend("--limit={name}={amount}".format(name=name, amount=amount) for name, amount in limits)
+        if cgroup_path:
+            arguments.append("--cgroup={path}".format(path=cgroup_path))
+
+        return arguments + ["--", command]
+
+    def _wait(self, process: subprocess.Popen, command: str, timeout: float) -> bool:
+        """Wait for command to finish and kill its process group afterwards, return True if it timed out."""
+        try:
+            process.wait(timeout=timeout or None)
+            return False
+        except subprocess.TimeoutExpired:
+            self.log.warning("Command '{command}' exceeded {timeout}s, killing its process group.".format(
+                command=command,
+                timeout=timeout
+            ))
+            return True
+        finally:
+            self._kill_process_group(process=process)
+            process.wait()
+
+    @staticmethod
+    def _kill_process_group(process: subprocess.Popen) -> None:
+        """Kill all processes of the group command was started in."""
+        if os.name == "nt":
+            if process.poll() is None:
+                process.kill()
+            return
+
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
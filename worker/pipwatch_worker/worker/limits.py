@@ -0,0 +1,73 @@
+"""This module contains launcher applying resource limits (and cgroup) to shell command, before executing it.
+
+It is run as a standalone script (it depends on standard library only), so that limits are applied
+in a fresh process instead of forked copy of multi-threaded worker:
+
+    python limits.py --limit cpu=60 --limit open_files=1024 --cgroup /sys/fs/cgroup/... -- "command to run"
+"""
+import argparse
+import os
+import sys
+from typing import Dict, List, Tuple  # noqa: F401 Imported for type definition
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - resource is not available on Windows
+    resource = None  # type: ignore
+
+
+LIMITS: Dict[str, str] = {
+    "address_space": "RLIMIT_AS",
+    "cpu": "RLIMIT_CPU",
+    "open_files": "RLIMIT_NOFILE",
+    "processes": "RLIMIT_NPROC"
+}
+
+
+def parse_limit(value: str) -> Tuple[str, int]:
+    """Parse limit given as 'name=value'."""
+    name, _, amount = value.partition("=")
+    if name not in LIMITS:
+        raise argparse.ArgumentTypeError("Unknown limit '{name}'".format(name=name))
+
+    return name, int(amount)
+
+
+def apply_limits(limits: List[Tuple[str, int]]) -> None:
+    """Apply given resource limits to current process (and all processes it will start)."""
+    if resource is None:
+        return
+
+    for name, amount in limits:
+        limit = getattr(resource, LIMITS[name])
+        _, hard_limit = resource.getrlimit(limit)
+        # Unprivileged process cannot raise its hard limit
+        if hard_limit != resource.RLIM_INFINITY:
+            amount = min(amount, hard_limit)
+
+        resource.setrlimit(limit, (amount, amount))
+
+
+def join_cgroup(cgroup_path: str) -> None:
+    """Move current process (and all processes it will start) to given cgroup."""
+    with open(os.path.join(cgroup_path, "cgroup.procs"), "w", encoding="utf-8") as file:
+        file.write(str(os.getpid()))
+
+
+def main(arguments: List[str] = None) -> None:
+    """Apply requested limits and replace current process with shell running given command."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=parse_limit, action="append", default=[])
+    parser.add_argument("--cgroup", default=None)
+    parser.add_argument("command")
+    options = parser.parse_args(arguments)
+
+    if options.cgroup:
+        join_cgroup(cgroup_path=options.cgroup)
+
+    apply_limits(limits=options.limit)
+    os.execv("/bin/sh", ["/bin/sh", "-c", options.command])
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,64 +1,272 @@
 """This module contains operations related to updating requirements of project."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
 from logging import Logger
 import os
+import re
+import subprocess
+import time
+from typing import Collection, List  # noqa: F401 Imported for type definition
 
+from pipwatch_worker.core.configuration import load_config_file
 from pipwatch_worker.core.data_models import Project, RequirementsFile
-from pipwatch_worker.core.utils import get_pip_script_name
-from pipwatch_worker.worker.commands import Command, FromVirtualenv, Git
+from pipwatch_worker.core.utils import get_requirement_specifier, normalize_package_name, UpdateStatus
+from pipwatch_worker.worker.bisection import GroupTesting
+from pipwatch_worker.worker.check_results import CachedCheckFailure, CheckResult, CheckResultsCache
+from pipwatch_worker.worker.check_results import get_output_digest, get_packages_digest, is_check_failure
+from pipwatch_worker.worker.commands import FromVirtualenv, Git
+from pipwatch_worker.worker.operations.installation import record_installed_versions
 from pipwatch_worker.worker.operations.operation import Operation
+from pipwatch_worker.worker.speculation import CandidateSet, get_candidate_sets, SpeculativeAttempts
 
 
 class AttemptUpdate(Operation):  # pylint: disable=too-few-public-methods
-    """Encapsulates logic of attempt of updating requirements of given project."""
+    """Encapsulates logic of attempt of updating requirements of given project.
+
+    Several candidate update sets may be attempted concurrently first (see SpeculativeAttempts), each
+    in its own worktree and virtualenv. When updating all packages at once breaks the project, updates
+    are bisected (see GroupTesting) to find packages responsible - the rest of updates is kept.
+    Names of packages whose updates were kept end up in 'accepted_packages', the others in
+    'rejected_packages'.
+    """
 
     def __init__(self, logger: Logger, project_details: Project) -> None:
         """Create method instance."""
         super().__init__(logger=logger, project_details=project_details)
 
-        self.command = Command(project_id=self.project_details.id)
-        self.from_venv = FromVirtualenv(project_id=self.project_details.id)
+        self.from_venv = FromVirtualenv(
+            project_id=self.project_details.id,
+            requirements_files=[file.path for file in self.project_details.requirements_files]
+        )
         self.git = Git(
             project_id=self.project_details.id,
             project_url=self.project_details.git_repository.url
         )
 
+        configuration: ConfigParser = load_config_file()
+        self.bisect_updates = configuration.getboolean(
+            section="pipwatch-worker",
+            option="bisect_updates",
+            fallback=True
+        )
+        self.max_check_runs = configuration.getint(
+            section="pipwatch-worker",
+            option="max_check_runs",
+            fallback=0
+        )
+        self.speculative_attempts = configuration.getboolean(
+            section="pipwatch-worker",
+            option="speculative_attempts",
+            fallback=False
+        )
+        self.speculative_workers = configuration.getint(
+            section="pipwatch-worker",
+            option="speculative_workers",
+            fallback=0
+        )
+
+        self.check_results = CheckResultsCache.from_config(
+            cache_path=os.path.join(self.repositories_cache_path, self.repositories_cache_dir_name),
+            logger=self.log
+        )
+
+        self.accepted_packages: List[str] = []
+        self.rejected_packages: List[str] = []
+        self._base_venv_path = ""
+
     def __call__(self) -> None:
-        """Update requirements of given project."""
+        """Update requirements of given project.
+
+        Updated requirements are installed into a clone of virtualenv with current requirements, so
+        that failed attempt may be rolled back by simply removing the clone.
+        """
+        self.log.debug("Attempting to prepare virtualenv with current requirements.")
+        self._base_venv_path = self.from_venv.prepare()
+        record_installed_versions(
+            project_details=self.project_details,
+            installed_versions=self.from_venv.get_installed_versions()
+        )
+
+        candidates = self._get_update_candidates()
+        if not self.bisect_updates and not self.speculative_attempts:
+            self._attempt(packages=candidates, raise_on_failure=True)
+            self.accepted_packages = candidates
+            return
+
+        accepted: List[str] = []
+        if self.speculative_attempts:
+            accepted = self._attempt_speculatively()
+
+        remaining = [name for name in candidates if name not in accepted]
+        rejected: List[str] = []
+        untested: List[str] = remaining
+        if remaining and self.bisect_updates:
+            group_testing = GroupTesting(test=self._attempt, max_tests=self.max_check_runs, logger=self.log)
+            # Speculative attempts always include set of all updates - if anything remains, it has failed
+            group_testing(candidates=remaining, accepted=accepted, known_to_fail=self.speculative_attempts)
+            accepted, rejected, untested = group_testing.accepted, group_testing.rejected, group_testing.untested
+
+        self.accepted_packages = accepted
+        self.rejected_packages = rejected + untested
+
+        self.log.debug("Attempting to save requirements with accepted updates only.")
+        self._write_requirements_files(updated_packages=self.accepted_packages)
+        with self.from_venv.attempt(base_venv_path=self._base_venv_path):
+            record_installed_versions(
+                project_details=self.project_details,
+                installed_versions=self.from_venv.get_installed_versions()
+            )
+
+        self._record_rejections(rejected=rejected, untested=untested)
+
+    def _attempt_speculatively(self) -> List[str]:
+        """Attempt several candidate update sets concurrently, return packages of the largest one which passed."""
+        speculative_attempts = SpeculativeAttempts(
+            test=self._attempt_in_workspace,
+            max_workers=self.speculative_workers,
+            logger=self.log
+        )
+        winner = speculative_attempts(candidate_sets=get_candidate_sets(requirements=[
+            requirement
+            for requirements_file in self.project_details.requirements_files
+            for requirement in requirements_file.requirements
+        ]))
+        return list(winner.packages) if winner else []
+
+    def _attempt_in_workspace(self, candidate_set: CandidateSet) -> bool:
+        """Check if updating given set of packages does not break the project, using separate worktree."""
+        workspace_name = re.sub(r"[^\w.-]+", "-", candidate_set.label)
+        with self.git.workspace(name=workspace_name) as workspace_path:
+            self._write_requirements_files(updated_packages=candidate_set.packages, project_dir_path=workspace_path)
+            from_venv = FromVirtualenv(
+                project_id=self.project_details.id,
+                requirements_files=[file.path for file in self.project_details.requirements_files],
+                project_dir_path=workspace_path
+            )
+            try:
+                with from_venv.attempt(base_venv_path=self._base_venv_path):
+                    self._check(from_venv=from_venv, worktree_path=workspace_path)
+            except Exception:  # pylint: disable=broad-except
+                self.log.info("Updating packages of candidate set '{label}' breaks the project.".format(
+                    label=candidate_set.label
+                ))
+                return False
+
+        return True
+
+    def _get_update_candidates(self) -> List[str]:
+        """Return sorted names of packages which have new versions desired."""
+        return sorted({
+            normalize_package_name(requirement.name)
+            for requirements_file in self.project_details.requirements_files
+            for requirement in requirements_file.requirements
+            if requirement.desired_version
+        })
+
+    def _attempt(self, packages: Collection[str], raise_on_failure: bool = False) -> bool:
+        """Check if updating given packages (and only them) does not break the project."""
+        self._write_requirements_files(updated_packages=packages)
+
+        self.log.debug("Attempting to install updated requirements into clone of project virtualenv.")
+        try:
+            with self.from_venv.attempt(base_venv_path=self._base_venv_path):
+                record_installed_versions(
+                    project_details=self.project_details,
+                    installed_versions=self.from_venv.get_installed_versions()
+                )
+                self.log.debug("Validating if updated requirements did not break anything.")
+                self._check()
+        except Exception:  # pylint: disable=broad-except
+            if raise_on_failure:
+                raise
+
+            self.log.info("Updating packages {packages!r} breaks the project.".format(packages=sorted(packages)))
+            return False
+
+        return True
+
+    def _check(self, from_venv: FromVirtualenv = None, worktree_path: str = None) -> bool:
+        """Validate if new packages did not break the project (project worktree, unless other is given).
+
+        Check is not run again if its outcome for the same sources, installed packages and interpreter
+        is known (outcomes of checks which timed out or were killed are not remembered).
+        """
+        from_venv = from_venv or self.from_venv
+        check_command = self.project_details.check_command
+        tree_hash = self.git.get_tree_hash(worktree_path=worktree_path)
+        packages_digest = get_packages_digest(
+            installed_versions=from_venv.get_installed_versions(),
+            python_version=from_venv.python_version
+        )
+
+        cached_result = self.check_results.get(
+            tree_hash=tree_hash, packages_digest=packages_digest, check_command=check_command
+        )
+        if cached_result:
+            self.log.info("Using outcome of check run at {checked_at} (took {duration:.1f}s).".format(
+                checked_at=time.ctime(cached_result.checked_at),
+                duration=cached_result.duration
+            ))
+            if not cached_result.passed:
+                raise CachedCheckFailure("Check command is known to fail for tree {tree}.".format(tree=tree_hash))
+
+            return True
+
+        started_at = time.time()
+        try:
+            output = from_venv.run_activated(command=check_command)
+        except subprocess.CalledProcessError as error:
+            if not is_check_failure(error):
+                self.log.info("Check command did not finish (exit code {code}), its outcome is not cached.".format(
+                    code=error.returncode
+                ))
+                raise
+
+            result = CheckResult(False, time.time() - started_at, get_output_digest(error.stdout), started_at)
+            self.check_results.set(tree_hash, packages_digest, check_command, result)
+            raise
+
+        result = CheckResult(True, time.time() - started_at, get_output_digest(output), started_at)
+        self.check_results.set(tree_hash, packages_digest, check_command, result)
+        return True
+
+    def _record_rejections(self, rejected: Collection[str], untested: Collection[str]) -> None:
+        """Mark requirements whose updates were not kept in their statuses."""
+        for requirements_file in self.project_details.requirements_files:
+            for requirement in requirements_file.requirements:
+                name = normalize_package_name(requirement.name)
+                if name in rejected:
+                    requirement.status = UpdateStatus.REJECTED.value
+                elif name in untested:
+                    requirement.status = UpdateStatus.UNVERIFIED.value
+
+    def _write_requirements_files(self, updated_packages: Collection[str], project_dir_path: str = None) -> None:
+        """Save requirements files (of project dir, unless other is given), with new versions of given packages only."""
         for requirements_file in self.project_details.requirements_files:
             self.log.debug("Attempting to update '{file}' contents.".format(
                 file=requirements_file.path
             ))
-            self._update_requirement_file(requirements_file=requirements_file)
-            self.log.debug("Attempting to install requirements from '{file}'.".format(
-                file=requirements_file.path
-            ))
-            self.from_venv(
-                command="{pip} install -U -r {file}".format(
-                    pip=get_pip_script_name(),
-                    file=requirements_file.path
+            self._update_requirement_file(
+                requirements_file=requirements_file,
+                updated_packages=updated_packages,
+                project_dir_path=project_dir_path or os.path.join(
+                    self.repositories_cache_path, self.repositories_cache_dir_name, str(self.project_details.id)
                 )
             )
 
-        self.log.debug("Validating if updated requirements did not break anything.")
-        self._check()
-
-    def _check(self) -> bool:
-        """Validate if new packages did not break the project."""
-        self.command(command=self.project_details.check_command)
-        return True
-
-    def _update_requirement_file(self, requirements_file: RequirementsFile) -> None:
+    def _update_requirement_file(self, requirements_file: RequirementsFile, updated_packages: Collection[str],
+                                 project_dir_path: str) -> None:
         """Save new requirements."""
-        full_path = os.path.join(
-            self.repositories_cache_path, self.repositories_cache_dir_name,
-            str(self.project_details.id), requirements_file.path
-        )
+        full_path = os.path.join(project_dir_path, requirements_file.path)
 
         # Dirty trick, to not to worry about parsing previous version
         os.remove(full_path)
         with open(full_path, "w", encoding="utf-8") as file:
             for requirement in sorted(requirements_file.requirements, key=lambda x: x.name):
-                file.write("{name}{version}".format(
+                is_updated = normalize_package_name(requirement.name) in updated_packages
+                file.write("{name}{version}\n".format(
                     name=requirement.name,
-                    version=requirement.desired_version
+                    version=get_requirement_specifier(
+                        requirement.desired_version if is_updated and requirement.desired_version
+                        else requirement.current_version
+                    )
                 ))
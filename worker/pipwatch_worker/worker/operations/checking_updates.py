@@ -1,12 +1,22 @@
 """This module contains operations related to checking packages updates."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from itertools import chain
 from logging import Logger
 import os
-from typing import List, NamedTuple  # noqa: F401 Imported for type definition
+from typing import Dict, List, NamedTuple, Optional  # noqa: F401 Imported for type definition
 
-from pipwatch_worker.core.data_models import Project
-from pipwatch_worker.core.utils import get_pip_script_name
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.data_models import Project, Requirement  # noqa: F401 Imported for type definition
+from pipwatch_worker.core.utils import get_pip_script_name, get_requirement_specifier, normalize_package_name
+from pipwatch_worker.index.bulk import BulkPackageIndex
+from pipwatch_worker.index.metadata import PackageMetadata  # noqa: F401 Imported for type definition
 from pipwatch_worker.worker.commands import FromVirtualenv
+from pipwatch_worker.worker.operations.installation import record_installed_versions
 from pipwatch_worker.worker.operations.operation import Operation
+from pipwatch_worker.worker.requirements_index import RequirementsIndex
+from pipwatch_worker.worker.resolver import DependencyResolver, ResolutionImpossible, ResolutionTooComplex
 
 
 PackageUpdateSuggestion = NamedTuple("PackageUpdateSuggestion", [
@@ -16,36 +26,69 @@ PackageUpdateSuggestion = NamedTuple("PackageUpdateSuggestion", [
 
 
 class CheckUpdates(Operation):  # pylint: disable=too-few-public-methods
-    """Encapsulates logic of checking for packages updates."""
+    """Encapsulates logic of checking for packages updates.
+
+    Two modes are supported: 'index' (default) compares parsed requirements against latest versions
+    reported by package index, 'virtualenv' installs requirements and asks pip which are outdated.
+    Either way, suggested versions are then resolved together with the other requirements and their
+    dependencies (see DependencyResolver), so that updates which cannot be installed together are
+    limited to compatible versions (or dropped) before anything is installed.
+    """
+
+    MODE_INDEX = "index"
+    MODE_VIRTUALENV = "virtualenv"
 
-    def __init__(self, logger: Logger, project_details: Project) -> None:
-        """Create method instance."""
+    def __init__(self, logger: Logger, project_details: Project,
+                 packages_metadata: Dict[str, Optional[PackageMetadata]] = None,
+                 requirements_index: RequirementsIndex = None) -> None:
+        """Create method instance (metadata of packages resolved beforehand are not resolved again).
+
+        Requirements are matched using given index, shared with other operations.
+        """
         super().__init__(logger=logger, project_details=project_details)
+        self.requirements_index = requirements_index or RequirementsIndex(project_details=self.project_details)
 
         self.outdated_packages: List[PackageUpdateSuggestion] = []
-        self.from_venv = FromVirtualenv(project_id=self.project_details.id)
+        self.from_venv = FromVirtualenv(
+            project_id=self.project_details.id,
+            requirements_files=[file.path for file in self.project_details.requirements_files]
+        )
+        self.package_index = BulkPackageIndex.from_config(logger=self.log, resolved_metadata=packages_metadata)
+        self.resolver = DependencyResolver.from_config(package_index=self.package_index, logger=self.log)
+
+        configuration: ConfigParser = load_config_file()
+        self.mode = configuration.get(
+            section="pipwatch-worker",
+            option="check_updates_mode",
+            fallback=self.MODE_INDEX
+        ).casefold()
+
+    @property
+    def requires_full_checkout(self) -> bool:
+        """Indicate if checking requires whole project worktree (requirements may refer to other project files)."""
+        return self.mode == self.MODE_VIRTUALENV
 
     def __call__(self) -> None:
         """Check for packages updates."""
         try:
-            self._install_packages()
-            self._get_outdated_packages()
+            if self.mode == self.MODE_VIRTUALENV:
+                self._install_packages()
+                self._get_outdated_packages()
+            else:
+                self._get_outdated_packages_from_index()
+            self._resolve_outdated_packages()
             self._update_project_details()
         except Exception:  # pylint: disable=broad-except
             self.log.exception("Unable to check for outdated packages")
 
     def _install_packages(self) -> None:
-        """Install packages of given project to project virtualenv."""
-        for requirement_file in self.project_details.requirements_files:
-            self.log.debug("Attempting to install requirements from '{file}' to venv.".format(
-                file=requirement_file.path
-            ))
-            self.from_venv(
-                command="{pip} install -U -r {file}".format(
-                    pip=get_pip_script_name(),
-                    file=requirement_file.path
-                )
-            )
+        """Ensure project virtualenv with all project requirements installed exists."""
+        self.log.debug("Attempting to prepare virtualenv with project requirements.")
+        self.from_venv.prepare()
+        record_installed_versions(
+            project_details=self.project_details,
+            installed_versions=self.from_venv.get_installed_versions()
+        )
 
     def _get_outdated_packages(self) -> None:
         """Return list of packages which can be updated."""
@@ -66,17 +109,93 @@ class CheckUpdates(Operation):  # pylint: disable=too-few-public-methods
             for requirement in requirements_detailed
         ]
 
+    def _get_outdated_packages_from_index(self) -> None:
+        """Find requirements whose version constraints do not allow latest release from package index."""
+        self.log.debug("Attempting to list outdated packages using package index.")
+        requirements = chain.from_iterable(
+            requirements_file.requirements for requirements_file in self.project_details.requirements_files
+        )
+        constrained_requirements = [
+            (requirement, specifier) for requirement, specifier
+            in ((requirement, self._get_specifier(requirement=requirement)) for requirement in requirements)
+            # Unconstrained requirements are always installed in their latest version
+            if specifier is not None and str(specifier)
+        ]
+        packages_metadata = self.package_index.get_metadata(
+            package_names=[requirement.name for requirement, _ in constrained_requirements]
+        )
+
+        suggestions = {}
+        for requirement, specifier in constrained_requirements:
+            metadata = packages_metadata.get(normalize_package_name(requirement.name))
+            if requirement.name in suggestions or not metadata:
+                continue
+
+            if not specifier.contains(metadata.latest_version, prereleases=True):
+                suggestions[requirement.name] = PackageUpdateSuggestion(requirement.name, metadata.latest_version)
+
+        self.log.debug("{count} outdated packages found.".format(count=len(suggestions)))
+        self.outdated_packages = list(suggestions.values())
+
+    def _resolve_outdated_packages(self) -> None:
+        """Limit suggested updates to newest versions compatible with the other requirements and dependencies."""
+        if not self.resolver.enabled or not self.outdated_packages:
+            return
+
+        requirements: Dict[str, SpecifierSet] = {}
+        for requirement in chain.from_iterable(
+                requirements_file.requirements for requirements_file in self.project_details.requirements_files
+        ):
+            specifier = self._get_specifier(requirement=requirement)
+            if specifier is not None:
+                name = normalize_package_name(requirement.name)
+                requirements[name] = requirements.get(name, SpecifierSet()) & specifier
+
+        upgrades = [
+            package.name for package in self.outdated_packages if normalize_package_name(package.name) in requirements
+        ]
+        try:
+            resolution = self.resolver.resolve(requirements=requirements, upgrades=upgrades)
+        except (ResolutionImpossible, ResolutionTooComplex) as exception:
+            self.log.warning("{message} Suggested updates are not limited.".format(message=exception))
+            return
+
+        suggestions = []
+        for package in self.outdated_packages:
+            name = normalize_package_name(package.name)
+            version = resolution.get(name)
+            if name not in requirements or version is None or version == package.new_version:
+                suggestions.append(package)
+                continue
+
+            if requirements[name].contains(version, prereleases=True):
+                self.log.info("Update of {package} is held back by dependencies of other packages.".format(
+                    package=package.name
+                ))
+                continue
+
+            self.log.info("Update of {package} is limited to {version} by dependencies of other packages.".format(
+                package=package.name,
+                version=version
+            ))
+            suggestions.append(PackageUpdateSuggestion(package.name, version))
+
+        self.outdated_packages = suggestions
+
+    def _get_specifier(self, requirement: Requirement) -> Optional[SpecifierSet]:
+        """Return version constraints of given requirement (or None if they cannot be interpreted)."""
+        try:
+            return SpecifierSet(get_requirement_specifier(requirement.current_version))
+        except (InvalidSpecifier, SyntaxError, ValueError):
+            self.log.warning("Unable to interpret version '{version}' of {package}, skipping it.".format(
+                version=requirement.current_version,
+                package=requirement.name
+            ))
+            return None
+
     def _update_project_details(self) -> None:
         """Update desired version of requirement to latest."""
         for changed_package in self.outdated_packages:
-            for requirements_file in self.project_details.requirements_files:
-                matching_package = next((
-                    package for package in requirements_file.requirements
-                    if package.name == changed_package.name
-                ), None)
-
-                if not matching_package:
-                    continue
-
+            for matching_package in self.requirements_index.find(name=changed_package.name):
                 if not matching_package.desired_version:
                     matching_package.desired_version = changed_package.new_version
@@ -0,0 +1,115 @@
+"""This module contains operations related to checkpointing progress of processing project."""
+from logging import Logger
+import os
+import time
+from typing import Any, Dict, NamedTuple, Optional  # noqa: F401 Imported for type definition
+
+from pipwatch_worker.core.data_models import Project
+from pipwatch_worker.worker.checkpoints import Checkpoint, CheckpointStore
+from pipwatch_worker.worker.commands import FromVirtualenv, Git
+from pipwatch_worker.worker.operations.detecting_changes import get_request_digest
+from pipwatch_worker.worker.operations.operation import Operation
+
+
+WorkspaceFingerprint = NamedTuple("WorkspaceFingerprint", [
+    ("path", str),
+    ("commit", str),
+    ("tree", str),
+    ("environment", str)
+])
+
+
+class Checkpoints(Operation):
+    """Encapsulates logic of saving progress of processing project and of telling if it may be resumed.
+
+    Checkpoint is valid only for the same project request (digest of the request is taken before any
+    state modifies project details) and only when project worktree is at the same commit, with the
+    same uncommitted changes, and requires the same virtualenv as when checkpoint was saved.
+    """
+
+    def __init__(self, logger: Logger, project_details: Project) -> None:
+        """Create method instance."""
+        super().__init__(logger=logger, project_details=project_details)
+        self.git = Git(
+            project_id=self.project_details.id,
+            project_url=self.project_details.git_repository.url
+        )
+        self.from_venv = FromVirtualenv(
+            project_id=self.project_details.id,
+            requirements_files=[file.path for file in self.project_details.requirements_files]
+        )
+        self.store = CheckpointStore.from_config(
+            cache_path=os.path.join(self.repositories_cache_path, self.repositories_cache_dir_name),
+            logger=self.log
+        )
+        self.request_digest = get_request_digest(project_details=self.project_details)
+
+    @property
+    def workspace_path(self) -> str:
+        """Return path to project worktree."""
+        return os.path.join(
+            self.repositories_cache_path, self.repositories_cache_dir_name, str(self.project_details.id)
+        )
+
+    def save(self, steps_completed: int, state: str, project_details: Project, progress: Dict[str, Any]) -> None:
+        """Store progress made by given number of completed steps (last of which left worker in given state)."""
+        if not self.store.enabled:
+            return
+
+        workspace = self._get_workspace_fingerprint()
+        if not workspace:
+            self.log.debug("Project worktree does not exist, checkpoint is not saved.")
+            return
+
+        self.store.set(project_id=self.project_details.id, checkpoint=Checkpoint(
+            steps_completed=steps_completed,
+            state=state,
+            request_digest=self.request_digest,
+            project_details=project_details.to_dict(),
+            workspace_path=workspace.path,
+            workspace_commit=workspace.commit,
+            workspace_tree=workspace.tree,
+            environment_fingerprint=workspace.environment,
+            progress=progress,
+            recorded_at=time.time()
+        ))
+
+    def load(self) -> Optional[Checkpoint]:
+        """Return checkpoint processing of the project may be resumed from (or None if there is no valid one)."""
+        checkpoint = self.store.get(project_id=self.project_details.id)
+        if not checkpoint:
+            return None
+
+        if checkpoint.request_digest != self.request_digest:
+            self.log.debug("Project request has changed since checkpoint was saved.")
+            self.forget()
+            return None
+
+        workspace = self._get_workspace_fingerprint()
+        if workspace != (checkpoint.workspace_path, checkpoint.workspace_commit, checkpoint.workspace_tree,
+                         checkpoint.environment_fingerprint):
+            self.log.debug("Project worktree has changed since checkpoint was saved.")
+            self.forget()
+            return None
+
+        return checkpoint
+
+    def forget(self) -> None:
+        """Remove checkpoint of the project, so that it is processed from the beginning next time."""
+        self.store.forget(project_id=self.project_details.id)
+
+    def _get_workspace_fingerprint(self) -> Optional[WorkspaceFingerprint]:
+        """Return fingerprint of project worktree and of virtualenv it requires (None if it cannot be told)."""
+        if not os.path.isdir(self.workspace_path):
+            return None
+
+        try:
+            return WorkspaceFingerprint(
+                path=self.workspace_path,
+                commit=self.git(command="rev-parse HEAD").decode().strip(),
+                tree=self.git.get_tree_hash(),
+                environment=self.from_venv.fingerprint
+            )
+        except Exception:  # pylint: disable=broad-except
+            self.log.debug("Unable to fingerprint project worktree.", exc_info=True)
+            return None
@@ -1,13 +1,24 @@
 """This module contains operations related to cloning project."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from contextlib import contextmanager
 from logging import Logger
+import os
+from typing import Iterator  # noqa: F401 Imported for type definition
 
+from pipwatch_worker.core.configuration import load_config_file
 from pipwatch_worker.core.data_models import Project
+from pipwatch_worker.worker.cache_manager import CacheManager
 from pipwatch_worker.worker.commands import Git
 from pipwatch_worker.worker.operations.operation import Operation
 
 
 class Clone(Operation):  # pylint: disable=too-few-public-methods
-    """Encapsulates logic of cloning given project (and keeping it up to date)."""
+    """Encapsulates logic of cloning given project (and keeping it up to date).
+
+    Only requirements files of the project are checked out, unless 'sparse_checkout' is disabled -
+    that is enough to tell if any of them may be updated. Worktree has to be widened (see 'widen')
+    before anything else (e.g. project check command) is run in it.
+    """
 
     def __init__(self, logger: Logger, project_details: Project) -> None:
         """Create method instance."""
@@ -18,21 +29,55 @@ class Clone(Operation):  # pylint: disable=too-few-public-methods
             project_upstream=self.project_details.git_repository.upstream_url
         )
 
+        configuration: ConfigParser = load_config_file()
+        self.sparse_checkout = configuration.getboolean(
+            section="repos_cache",
+            option="sparse_checkout",
+            fallback=True
+        )
+        self.cache = CacheManager.from_config(
+            cache_path=os.path.join(self.repositories_cache_path, self.repositories_cache_dir_name),
+            logger=self.log
+        )
+
+    @property
+    def workspace_path(self) -> str:
+        """Return path to project worktree."""
+        return os.path.join(
+            self.repositories_cache_path, self.repositories_cache_dir_name, str(self.project_details.id)
+        )
+
     def __call__(self) -> None:
-        """Clone given repository (or - if it already exists - pull latest changes)."""
-        self.log.debug("Attempting to run 'git reset --hard'")
-        self.git(command="reset --hard HEAD~1")
-        self.log.debug("Attempting to run 'git clean -fd'")
-        self.git(command="clean -fd")
-        self.log.debug("Attempting to run 'git pull'")
-        self.git(command="pull")
+        """Fetch latest changes into repository mirror and check out fresh project worktree."""
+        self.log.debug("Attempting to fetch repository mirror and check out worktree")
+        self.cache.record_access(
+            path=self.workspace_path,
+            kind=CacheManager.KIND_PROJECT,
+            hit=os.path.isdir(self.workspace_path)
+        )
+        self.git.checkout_worktree(sparse_paths=[
+            requirements_file.path for requirements_file in self.project_details.requirements_files
+        ] if self.sparse_checkout else None)
 
         self._handle_upstream_sync()
 
+    @contextmanager
+    def pinned(self) -> Iterator[None]:
+        """Keep project worktree (and its virtualenv) from being evicted from the cache during the block."""
+        with self.cache.pinned(path=self.workspace_path, kind=CacheManager.KIND_PROJECT):
+            yield
+
+    def widen(self) -> None:
+        """Check out whole project worktree, if only part of it was checked out."""
+        self.log.debug("Attempting to widen project worktree to full checkout")
+        self.git.widen_worktree()
+
     def _handle_upstream_sync(self) -> None:
         """Synchronize fork with upstream repository."""
         if not self.project_details.git_repository.upstream_url:
             return
 
+        # Merging requires common history of both repositories
+        self.git.fetch_history()
         self.git(command="fetch upstream")
         self.git(command="merge upstream/master")
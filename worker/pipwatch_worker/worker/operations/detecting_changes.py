@@ -0,0 +1,198 @@
+"""This module contains operations related to detecting if anything has changed since project was last processed."""
+import hashlib
+from itertools import chain
+from logging import Logger
+import os
+import time
+from typing import Dict, Iterable, Optional, Set  # noqa: F401 Imported for type definition
+
+from pipwatch_worker.core.data_models import Project
+from pipwatch_worker.core.utils import normalize_package_name
+from pipwatch_worker.index.bulk import BulkPackageIndex
+from pipwatch_worker.index.metadata import PackageMetadata  # noqa: F401 Imported for type definition
+from pipwatch_worker.worker.commands import Git
+from pipwatch_worker.worker.operations.operation import Operation
+from pipwatch_worker.worker.project_state import ProjectState, ProjectStateStore
+
+
+def get_content_digest(content: Optional[bytes]) -> str:
+    """Return digest of requirements file content (empty string for missing files)."""
+    return hashlib.sha256(content).hexdigest() if content is not None else ""
+
+
+def get_request_digest(project_details: Project) -> str:
+    """Return digest of project request fields that influence outcome of processing it.
+
+    Current versions are left out on purpose - they are parsed from requirements files, whose
+    contents are compared separately.
+    """
+    repository = project_details.git_repository
+    lines = [
+        repository.url or "",
+        repository.upstream_url or "",
+        repository.flavour or "",
+        project_details.check_command or ""
+    ]
+    for requirements_file in sorted(project_details.requirements_files, key=lambda file: file.path):
+        lines.append(requirements_file.path)
+        lines.extend(sorted(
+            "{name}=={version}".format(name=normalize_package_name(requirement.name),
+                                       version=requirement.desired_version or "")
+            for requirement in requirements_file.requirements
+        ))
+
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+class DetectChanges(Operation):
+    """Encapsulates logic of telling if project is in the same state it was when last processed successfully.
+
+    Project is unchanged when remote repositories still point to the same commits (or, if only origin
+    moved, requirements files have the same contents), project request is the same and package index
+    reports the same latest versions of required packages. Only 'git ls-remote' and lookups of package
+    index metadata (served from its cache, while fresh) are needed to tell that.
+    """
+
+    def __init__(self, logger: Logger, project_details: Project,
+                 packages_metadata: Dict[str, Optional[PackageMetadata]] = None) -> None:
+        """Create method instance (metadata of packages resolved beforehand are not resolved again)."""
+        super().__init__(logger=logger, project_details=project_details)
+        self.git = Git(
+            project_id=self.project_details.id,
+            project_url=self.project_details.git_repository.url,
+            project_upstream=self.project_details.git_repository.upstream_url
+        )
+        self.package_index = BulkPackageIndex.from_config(logger=self.log, resolved_metadata=packages_metadata)
+        self.states = ProjectStateStore.from_config(
+            cache_path=os.path.join(self.repositories_cache_path, self.repositories_cache_dir_name),
+            logger=self.log
+        )
+
+        self.files_digests: Dict[str, str] = {}
+        self._upstream_commit = ""
+
+    def __call__(self) -> bool:
+        """Return True if project has not changed since it was last processed successfully."""
+        if not self.states.enabled:
+            return False
+
+        state = self.states.get(project_id=self.project_details.id)
+        if not state:
+            self.log.debug("Project was not processed successfully before.")
+            return False
+
+        if state.request_digest != get_request_digest(project_details=self.project_details):
+            self.log.debug("Project request has changed.")
+            return False
+
+        if self._upstream_url:
+            self._upstream_commit = self.git.get_remote_head(remote_url=self._upstream_url)
+            if self._upstream_commit != state.upstream_commit:
+                self.log.debug("Upstream repository has changed.")
+                return False
+
+        if not self._is_repository_unchanged(state=state):
+            return False
+
+        latest_versions = self._get_latest_versions(package_names=self._package_names)
+        if latest_versions.keys() != self._package_names:
+            self.log.debug("Latest versions of some required packages could not be retrieved.")
+            return False
+
+        if latest_versions != state.versions:
+            self.log.debug("Package index reports new versions of required packages.")
+            return False
+
+        return True
+
+    def snapshot_files(self) -> None:
+        """Remember contents of requirements files, as checked out in project worktree."""
+        self.files_digests = {}
+        for requirements_file in self.project_details.requirements_files:
+            path = os.path.join(
+                self.repositories_cache_path, self.repositories_cache_dir_name,
+                str(self.project_details.id), requirements_file.path
+            )
+            content = None
+            if os.path.isfile(path):
+                with open(path, "rb") as file:
+                    content = file.read()
+
+            self.files_digests[requirements_file.path] = get_content_digest(content=content)
+
+    def record(self) -> None:
+        """Store state project was successfully processed in.
+
+        State is not stored (and the previous one is forgotten) when latest versions of some required
+        packages could not be retrieved - they would never be checked again otherwise.
+        """
+        if not self.states.enabled:
+            return
+
+        latest_versions = self._get_latest_versions(package_names=self._package_names)
+        if latest_versions.keys() != self._package_names:
+            self.log.debug("Not recording project state, as latest versions of some packages are unknown.")
+            self.states.forget(project_id=self.project_details.id)
+            return
+
+        if self._upstream_url and not self._upstream_commit:
+            self._upstream_commit = self.git.get_remote_head(remote_url=self._upstream_url)
+
+        self.states.set(project_id=self.project_details.id, state=ProjectState(
+            commit=self.git.mirror_head,
+            upstream_commit=self._upstream_commit,
+            request_digest=get_request_digest(project_details=self.project_details),
+            files_digests=self.files_digests,
+            versions=latest_versions,
+            recorded_at=time.time()
+        ))
+
+    def forget(self) -> None:
+        """Remove stored state of the project, so that it is fully processed next time."""
+        if self.states.enabled:
+            self.states.forget(project_id=self.project_details.id)
+
+    def _is_repository_unchanged(self, state: ProjectState) -> bool:
+        """Check if origin still points to the same commit or at least requirements files did not change."""
+        commit = self.git.get_remote_head()
+        if commit == state.commit:
+            return True
+
+        if self._upstream_url:
+            self.log.debug("Repository has changed.")
+            return False
+
+        self.git.fetch_mirror()
+        for path, digest in state.files_digests.items():
+            if get_content_digest(content=self.git.read_file(commit=commit, path=path)) != digest:
+                self.log.debug("Requirements file '{path}' has changed.".format(path=path))
+                return False
+
+        # Requirements are the same, there is no need to look at files of this commit again
+        self.states.set(project_id=self.project_details.id, state=state._replace(commit=commit))
+        return True
+
+    @property
+    def _upstream_url(self) -> Optional[str]:
+        """Return url of upstream repository of the project (if there is one)."""
+        return self.project_details.git_repository.upstream_url
+
+    @property
+    def _package_names(self) -> Set[str]:
+        """Return normalized names of all packages required by the project."""
+        return {
+            normalize_package_name(requirement.name) for requirement in chain.from_iterable(
+                requirements_file.requirements for requirements_file in self.project_details.requirements_files
+            )
+        }
+
+    def _get_latest_versions(self, package_names: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Return latest versions of given packages, as reported by package index.
+
+        Packages whose metadata could not be retrieved are missing from results.
+        """
+        packages_metadata = self.package_index.get_metadata(package_names=package_names)
+        return {
+            name: metadata.latest_version if metadata else None
+            for name, metadata in packages_metadata.items()
+        }
@@ -12,7 +12,10 @@ class GitReview(Operation):  # pylint: disable=too-few-public-methods
     def __init__(self, logger: Logger, project_details: Project) -> None:
         """Create method instance."""
         super().__init__(logger=logger, project_details=project_details)
-        self.from_venv = FromVirtualenv(project_id=self.project_details.id)
+        self.from_venv = FromVirtualenv(
+            project_id=self.project_details.id,
+            requirements_files=[file.path for file in self.project_details.requirements_files]
+        )
 
     def __call__(self) -> None:
         """Create gerrit patchset and submit it."""
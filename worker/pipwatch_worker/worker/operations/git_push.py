@@ -17,4 +17,4 @@ class GitPush(Operation):  # pylint: disable=too-few-public-methods
     def __call__(self) -> None:
         """Push git changes."""
         self.log.debug("Attempting to run 'git push' command..")
-        self.git("push")
+        self.git("push origin HEAD:{branch}".format(branch=self.git.default_branch))
@@ -0,0 +1,46 @@
+"""This module contains logic of attributing outcome of requirements installation to project requirements files."""
+from typing import Dict
+
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+
+from pipwatch_worker.core.data_models import Project, Requirement
+from pipwatch_worker.core.utils import get_requirement_specifier, InstallationStatus, normalize_package_name
+
+
+def get_installation_status(requirement: Requirement) -> InstallationStatus:
+    """Return status of requirement based on its installed version."""
+    if not requirement.installed_version:
+        return InstallationStatus.MISSING
+
+    # Requirements file may contain either current or desired version of requirement
+    versions = [requirement.current_version] + ([requirement.desired_version] if requirement.desired_version else [])
+    for version in versions:
+        try:
+            specifier = SpecifierSet(get_requirement_specifier(version))
+        except (InvalidSpecifier, SyntaxError, ValueError):
+            return InstallationStatus.INSTALLED
+
+        if specifier.contains(requirement.installed_version, prereleases=True):
+            return InstallationStatus.INSTALLED
+
+    return InstallationStatus.CONFLICTING
+
+
+def record_installed_versions(project_details: Project, installed_versions: Dict[str, str]) -> None:
+    """Update requirements (and requirements files) of project with versions actually installed.
+
+    When all files are resolved together, single package may be constrained by many files - each
+    requirement is marked as conflicting if the version chosen does not satisfy its own constraints.
+    Requirements file gets the worst status of its requirements. Installation statuses are kept
+    apart from update statuses ('status' attributes), which are left intact.
+    """
+    statuses_order = [InstallationStatus.INSTALLED, InstallationStatus.CONFLICTING, InstallationStatus.MISSING]
+    for requirements_file in project_details.requirements_files:
+        file_status = InstallationStatus.INSTALLED
+        for requirement in requirements_file.requirements:
+            requirement.installed_version = installed_versions.get(normalize_package_name(requirement.name))
+            status = get_installation_status(requirement=requirement)
+            requirement.installation_status = status.value
+            file_status = max(file_status, status, key=statuses_order.index)
+
+        requirements_file.installation_status = file_status.value
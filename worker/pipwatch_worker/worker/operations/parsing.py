@@ -7,14 +7,16 @@ import requirements
 
 from pipwatch_worker.core.data_models import Project, RequirementsFile, Requirement
 from pipwatch_worker.worker.operations.operation import Operation
+from pipwatch_worker.worker.requirements_index import RequirementsIndex
 
 
 class Parse(Operation):  # pylint: disable=too-few-public-methods
     """Encapsulates logic of parsing requirements of given project (and keeping them up to date)."""
 
-    def __init__(self, logger: Logger, project_details: Project) -> None:
-        """Create method instance."""
+    def __init__(self, logger: Logger, project_details: Project, requirements_index: RequirementsIndex = None) -> None:
+        """Create method instance (requirements are matched using given index, shared with other operations)."""
         super().__init__(logger=logger, project_details=project_details)
+        self.requirements_index = requirements_index or RequirementsIndex(project_details=self.project_details)
 
     def __call__(self) -> None:
         """Parse requirements of given project."""
@@ -41,15 +43,17 @@ class Parse(Operation):  # pylint: disable=too-few-public-methods
 
     def _parse_requirement(self, file: RequirementsFile, requirement: Any) -> None:
         """Parse single requirement of given file."""
-        previous_entry = next((x for x in file.requirements if x.name == requirement.name), None)
+        previous_entry = self.requirements_index.get(requirements_file=file, name=requirement.name)
         package_version_from_project = str(requirement.specs) if requirement.specs else ""
 
         if not previous_entry:
             self.log.debug("Previous requirement entry not found. Adding it.")
-            file.requirements.append(Requirement(
+            new_entry = Requirement(
                 name=requirement.name,
                 current_version=package_version_from_project
-            ))
+            )
+            file.requirements.append(new_entry)
+            self.requirements_index.add(requirements_file=file, requirement=new_entry)
 
         if previous_entry and (previous_entry.current_version != package_version_from_project):
             self.log.debug("Overriding {package} version of {prev_version} with {version}".format(
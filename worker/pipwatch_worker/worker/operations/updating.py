@@ -1,16 +1,21 @@
 """This module contains operations related to updating requirements status of project in db."""
 from configparser import ConfigParser  # noqa: F401 Imported for type definition
 from logging import Logger
+from typing import Any, Dict, List  # noqa: F401 Imported for type definition
 
 import requests
 
 from pipwatch_worker.core.configuration import load_config_file
-from pipwatch_worker.core.data_models import Project, RequirementsFile
+from pipwatch_worker.core.data_models import Project
 from pipwatch_worker.worker.operations.operation import Operation
 
 
 class Update(Operation):  # pylint: disable=too-few-public-methods
-    """Encapsulates logic of sending update of project requirements."""
+    """Encapsulates logic of sending update of project requirements.
+
+    Payloads may be taken (see 'get_payloads') and sent later (see 'send'), e.g. from another thread,
+    while project details are being modified further.
+    """
 
     def __init__(self, logger: Logger, project_details: Project) -> None:
         """Create method instance."""
@@ -19,19 +24,26 @@ class Update(Operation):  # pylint: disable=too-few-public-methods
 
     def __call__(self) -> None:
         """Send updates for each requirement file."""
-        for requirements_file in self.project_details.requirements_files:
+        self.send(payloads=self.get_payloads())
+
+    def get_payloads(self) -> List[Dict[str, Any]]:
+        """Return current state of each requirements file, as it should be sent."""
+        return [requirements_file.to_dict() for requirements_file in self.project_details.requirements_files]
+
+    def send(self, payloads: List[Dict[str, Any]]) -> None:
+        """Send given states of requirements files."""
+        for payload in payloads:
             self.log.debug("Attempting to send updated state of requirements file '{file}'".format(
-                file=requirements_file.path
+                file=payload.get("path")
             ))
-            self._update_requirements_file(file=requirements_file)
+            self._update_requirements_file(payload=payload)
 
-    def _update_requirements_file(self, file: RequirementsFile) -> None:
-        """Send update of provided requirements file."""
+    def _update_requirements_file(self, payload: Dict[str, Any]) -> None:
+        """Send update of requirements file represented by given payload."""
         url = "{api_address}/api/v1/requirements-files/{file_id}".format(
             api_address=self.config.get(section="pipwatch-api", option="address", fallback="pipwatch_api:80880"),
-            file_id=str(file.id)
+            file_id=str(payload.get("id"))
         )
-        payload = file.to_dict()
         self.log.debug("About to perform PUT request to address '{url}' with payload {payload}".format(
             url=url,
             payload=payload
@@ -0,0 +1,170 @@
+"""This module contains pipeline overlapping network-bound stages of upcoming projects with the current one."""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor  # noqa: F401 Imported for type definition
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from functools import partial
+from logging import getLogger, Logger
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple  # noqa: F401
+
+from celery import states
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.data_models import Project
+from pipwatch_worker.core.utils import normalize_package_name
+from pipwatch_worker.index.bulk import BulkPackageIndex
+from pipwatch_worker.index.metadata import PackageMetadata  # noqa: F401 Imported for type definition
+from pipwatch_worker.worker.operations.cloning import Clone
+from pipwatch_worker.worker.project_lock import ProjectLock, ProjectLocked
+from pipwatch_worker.worker.worker import Worker
+
+
+PipelineItem = NamedTuple("PipelineItem", [("task_id", str), ("project", Project)])
+PrefetchedProject = NamedTuple("PrefetchedProject", [
+    ("lock", ProjectLock),
+    ("cloned", bool),
+    ("packages_metadata", Dict[str, Optional[PackageMetadata]])
+])
+
+
+class ProjectPipeline:
+    """Encompasses logic of processing many projects in a row, prefetching the upcoming ones.
+
+    While a project is processed (e.g. its check command runs), repositories of up to 'depth'
+    following projects are fetched and checked out, and metadata of their packages are resolved,
+    in background threads. Prefetching of the next project starts only once processing of one
+    finishes, so prefetched projects never pile up. Updates of projects metadata are sent to
+    the api in background as well (in order, for each project).
+
+    Each project keeps its own task id - its states (and summary, once processed) are reported
+    under that id, the same way they are by 'process_project' task. Projects being processed by
+    another worker are not processed, but returned as deferred.
+    """
+
+    DEFAULT_DEPTH = 2
+    DEFAULT_METADATA_UPDATE_THREADS = 4
+
+    def __init__(self, update_state: Callable[..., None],
+                 depth: int = None,
+                 metadata_update_threads: int = None,
+                 logger: Logger = None) -> None:
+        """Create class instance, reporting states of projects with given (celery task) method."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.update_state = update_state
+        self.depth = self.DEFAULT_DEPTH if depth is None else depth
+        self.metadata_update_threads = metadata_update_threads or self.DEFAULT_METADATA_UPDATE_THREADS
+
+        self.deferred: List[PipelineItem] = []
+
+    @classmethod
+    def from_config(cls, update_state: Callable[..., None], logger: Logger = None) -> "ProjectPipeline":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "pipeline"
+        return cls(
+            update_state=update_state,
+            depth=configuration.getint(section=section, option="depth", fallback=cls.DEFAULT_DEPTH),
+            metadata_update_threads=configuration.getint(
+                section=section, option="metadata_update_threads", fallback=cls.DEFAULT_METADATA_UPDATE_THREADS
+            ),
+            logger=logger
+        )
+
+    def __call__(self, items: List[PipelineItem],
+                 packages_metadata: Dict[str, Optional[PackageMetadata]] = None) -> List[Dict[str, Any]]:
+        """Process given projects in order, return summaries of processed ones."""
+        self.deferred = []
+        summaries: List[Dict[str, Any]] = []
+        with ThreadPoolExecutor(max_workers=max(self.depth, 1)) as prefetch_executor, \
+                ThreadPoolExecutor(max_workers=self.metadata_update_threads) as metadata_executor:
+            pending: Deque[Tuple[PipelineItem, Future]] = deque()
+            upcoming = iter(items)
+            for item in upcoming:
+                pending.append((item, prefetch_executor.submit(self._prefetch, item, packages_metadata)))
+                if len(pending) > self.depth:
+                    break
+
+            try:
+                while pending:
+                    item, prefetch = pending.popleft()
+                    prefetched = prefetch.result()
+                    next_item = next(upcoming, None)
+                    if next_item:
+                        pending.append(
+                            (next_item, prefetch_executor.submit(self._prefetch, next_item, packages_metadata))
+                        )
+
+                    if not prefetched:
+                        self.deferred.append(item)
+                        continue
+
+                    summaries.append(self._process(item=item, prefetched=prefetched, executor=metadata_executor))
+            finally:
+                self._release_pending(pending=pending)
+
+        return summaries
+
+    def _prefetch(self, item: PipelineItem,
+                  packages_metadata: Dict[str, Optional[PackageMetadata]] = None) -> Optional[PrefetchedProject]:
+        """Take lock of given project, check out its repository and resolve its packages (None if it is locked)."""
+        lock = ProjectLock.from_config(project_id=item.project.id, logger=self.log)
+        try:
+            lock.acquire()
+        except ProjectLocked:
+            self.log.info("Project {project_id} is being processed by another worker, deferring it.".format(
+                project_id=item.project.id
+            ))
+            return None
+
+        cloned = False
+        try:
+            Clone(logger=self.log, project_details=item.project)()
+            cloned = True
+        except Exception:  # pylint: disable=broad-except
+            self.log.warning("Unable to clone project {project_id} beforehand.".format(
+                project_id=item.project.id
+            ), exc_info=True)
+
+        package_names = {
+            normalize_package_name(requirement.name)
+            for requirements_file in item.project.requirements_files
+            for requirement in requirements_file.requirements
+        }
+        resolved_metadata = dict(packages_metadata or {})
+        try:
+            resolved_metadata.update(BulkPackageIndex.from_config(
+                logger=self.log, resolved_metadata=packages_metadata
+            ).get_metadata(package_names=package_names))
+        except Exception:  # pylint: disable=broad-except
+            self.log.warning("Unable to resolve packages of project {project_id} beforehand.".format(
+                project_id=item.project.id
+            ), exc_info=True)
+
+        return PrefetchedProject(lock=lock, cloned=cloned, packages_metadata=resolved_metadata)
+
+    def _process(self, item: PipelineItem, prefetched: PrefetchedProject,
+                 executor: ThreadPoolExecutor) -> Dict[str, Any]:
+        """Process given (prefetched) project and report its summary under its own task id."""
+        try:
+            worker = Worker(
+                update_celery_state_method=partial(self.update_state, task_id=item.task_id),
+                logger=self.log,
+                executor=executor
+            )
+            summary = worker.run(
+                project_to_process=item.project,
+                packages_metadata=prefetched.packages_metadata,
+                cloned=prefetched.cloned
+            )
+        finally:
+            prefetched.lock.release()
+
+        self.update_state(task_id=item.task_id, state=states.SUCCESS, meta=summary)
+        return summary
+
+    @staticmethod
+    def _release_pending(pending: Deque[Tuple[PipelineItem, Future]]) -> None:
+        """Release locks of projects which were prefetched, but will not be processed."""
+        for _, prefetch in pending:
+            prefetched = prefetch.result() if not prefetch.exception() else None
+            if prefetched:
+                prefetched.lock.release()
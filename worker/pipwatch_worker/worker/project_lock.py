@@ -0,0 +1,148 @@
+"""This module contains redis based lock, which guarantees project is processed by single worker at a time."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from logging import getLogger, Logger
+import threading
+import time
+import uuid
+
+import redis
+
+from pipwatch_worker.core.configuration import load_config_file
+
+
+class ProjectLocked(Exception):
+    """Raised when project is already being processed by another worker."""
+
+
+class ProjectLock:
+    """Encompasses logic of lease of a project, held in redis for as long as the project is processed.
+
+    Lease expires after 'ttl' seconds, unless it is renewed - background thread renews it every third
+    of that time, so lease of a worker which died is taken over quickly. Lease is renewed and released
+    only by its holder (identified by random token), which is checked atomically by lua scripts.
+    Tasks give up waiting for lease held by another worker after 'max_wait' seconds.
+    """
+
+    KEY_PREFIX = "pipwatch:project-lock:"
+    DEFAULT_TTL = 60
+    DEFAULT_WAIT_TIMEOUT = 0
+    DEFAULT_MAX_WAIT = 7200
+
+    RENEW_SCRIPT = """
+        if redis.call("GET", KEYS[1]) == ARGV[1] then
+            return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+        end
+        return 0
+    """
+    RELEASE_SCRIPT = """
+        if redis.call("GET", KEYS[1]) == ARGV[1] then
+            return redis.call("DEL", KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, project_id: int,  # pylint: disable=too-many-arguments
+                 redis_url: str = None,
+                 ttl: int = None,
+                 wait_timeout: float = None,
+                 max_wait: float = None,
+                 logger: Logger = None) -> None:
+        """Create class instance (lock without redis url is disabled - it is always acquired)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.project_id = project_id
+        self.redis = redis.StrictRedis.from_url(redis_url) if redis_url else None
+        self.ttl = ttl or self.DEFAULT_TTL
+        self.wait_timeout = self.DEFAULT_WAIT_TIMEOUT if wait_timeout is None else wait_timeout
+        self.max_wait = max_wait or self.DEFAULT_MAX_WAIT
+
+        self.lost = False
+        self._token = uuid.uuid4().hex
+        self._stop_renewal = threading.Event()
+        self._renewal_thread: threading.Thread = None
+
+    @classmethod
+    def from_config(cls, project_id: int, logger: Logger = None) -> "ProjectLock":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "project-lock"
+        if not configuration.getboolean(section=section, option="enabled", fallback=True):
+            return cls(project_id=project_id, logger=logger)
+
+        redis_url = configuration.get(section=section, option="redis_url", fallback="") or configuration.get(
+            section="celery", option="broker_url", fallback="redis://localhost:6379/0"
+        )
+        return cls(
+            project_id=project_id,
+            redis_url=redis_url,
+            ttl=configuration.getint(section=section, option="ttl", fallback=cls.DEFAULT_TTL),
+            wait_timeout=configuration.getfloat(
+                section=section, option="wait_timeout", fallback=cls.DEFAULT_WAIT_TIMEOUT
+            ),
+            max_wait=configuration.getfloat(section=section, option="max_wait", fallback=cls.DEFAULT_MAX_WAIT),
+            logger=logger
+        )
+
+    @property
+    def key(self) -> str:
+        """Return redis key of the lease."""
+        return "{prefix}{project_id}".format(prefix=self.KEY_PREFIX, project_id=self.project_id)
+
+    def __enter__(self) -> "ProjectLock":
+        """Acquire lease of the project (raise ProjectLocked if it is held by another worker)."""
+        self.acquire()
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Release lease of the project."""
+        self.release()
+
+    def acquire(self) -> None:
+        """Acquire lease of the project, waiting up to 'wait_timeout' seconds for other worker to release it."""
+        if not self.redis:
+            return
+
+        deadline = time.time() + self.wait_timeout
+        while not self.redis.set(self.key, self._token, nx=True, px=self.ttl * 1000):
+            if time.time() >= deadline:
+                raise ProjectLocked("Project {project_id} is already being processed.".format(
+                    project_id=self.project_id
+                ))
+            time.sleep(min(1.0, max(deadline - time.time(), 0.0)))
+
+        self.lost = False
+        self._stop_renewal.clear()
+        self._renewal_thread = threading.Thread(target=self._renew, daemon=True)
+        self._renewal_thread.start()
+
+    def release(self) -> None:
+        """Stop renewing the lease and release it (unless it was already taken over)."""
+        if not self.redis or not self._renewal_thread:
+            return
+
+        self._stop_renewal.set()
+        self._renewal_thread.join()
+        self._renewal_thread = None
+        try:
+            self.redis.eval(self.RELEASE_SCRIPT, 1, self.key, self._token)
+        except redis.RedisError:
+            self.log.warning("Unable to release lock of project {project_id}, it will expire.".format(
+                project_id=self.project_id
+            ), exc_info=True)
+
+    def _renew(self) -> None:
+        """Prolong the lease periodically, until asked to stop."""
+        while not self._stop_renewal.wait(timeout=self.ttl / 3):
+            try:
+                renewed = self.redis.eval(self.RENEW_SCRIPT, 1, self.key, self._token, self.ttl * 1000)
+            except redis.RedisError:
+                self.log.warning("Unable to renew lock of project {project_id}.".format(
+                    project_id=self.project_id
+                ), exc_info=True)
+                continue
+
+            if not renewed:
+                self.lost = True
+                self.log.error("Lock of project {project_id} has expired and may be held by another worker.".format(
+                    project_id=self.project_id
+                ))
+                return
@@ -0,0 +1,50 @@
+"""This module contains persistent store of what worker has seen while processing each project."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from logging import Logger
+import os
+from typing import Dict, NamedTuple, Optional  # noqa: F401 Imported for type definition
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.sqlite import ProjectRecordsStore
+
+
+ProjectState = NamedTuple("ProjectState", [
+    ("commit", str),
+    ("upstream_commit", str),
+    ("request_digest", str),
+    ("files_digests", Dict[str, str]),
+    ("versions", Dict[str, Optional[str]]),
+    ("recorded_at", float)
+])
+
+
+class ProjectStateStore(ProjectRecordsStore):
+    """Encompasses logic of storing state of each project as of its last successful processing.
+
+    State consists of commits repositories pointed to, digests of project request and of requirements
+    files contents, and latest versions of required packages reported by package index.
+    """
+
+    TABLE = "project_state"
+    RECORD_COLUMN = "state"
+
+    @classmethod
+    def from_config(cls, cache_path: str, logger: Logger = None) -> "ProjectStateStore":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "project-state"
+        if not configuration.getboolean(section=section, option="enabled", fallback=True):
+            return cls(logger=logger)
+
+        default_path = os.path.join(cache_path, ".project-state.sqlite")
+        database_path = os.path.expandvars(configuration.get(section=section, option="path", fallback=""))
+        return cls(database_path=database_path or default_path, logger=logger)
+
+    def get(self, project_id: int) -> Optional[ProjectState]:
+        """Return state of given project (or None if it is not known)."""
+        record = self._get_record(project_id=project_id)
+        return ProjectState(**record) if record else None
+
+    def set(self, project_id: int, state: ProjectState) -> None:
+        """Store state of given project."""
+        self._set_record(project_id=project_id, record=state._asdict())
@@ -0,0 +1,40 @@
+"""This module contains index of project requirements by their normalized names."""
+from typing import Dict, List, Optional, Tuple  # noqa: F401 Imported for type definition
+
+from pipwatch_worker.core.data_models import Project, Requirement, RequirementsFile
+from pipwatch_worker.core.utils import normalize_package_name
+
+
+class RequirementsIndex:
+    """Encompasses logic of finding requirements of given project by name of their package.
+
+    Names are PEP 503 normalized and stripped of extras, so that e.g. 'Django', 'django' and
+    'celery[redis]', 'Celery' match each other. Index is built once (for the project details as
+    they are) and has to be told about requirements added to the project afterwards (see 'add').
+    Within a file only the first requirement of each package is indexed.
+    """
+
+    def __init__(self, project_details: Project) -> None:
+        """Create class instance, indexing all requirements of given project."""
+        self._by_file: Dict[Tuple[str, str], Requirement] = {}
+        self._by_name: Dict[str, List[Requirement]] = {}
+        for requirements_file in project_details.requirements_files:
+            for requirement in requirements_file.requirements:
+                self.add(requirements_file=requirements_file, requirement=requirement)
+
+    def add(self, requirements_file: RequirementsFile, requirement: Requirement) -> None:
+        """Index given requirement of given file (unless file already has requirement of the same package)."""
+        name = normalize_package_name(requirement.name)
+        if (requirements_file.path, name) in self._by_file:
+            return
+
+        self._by_file[(requirements_file.path, name)] = requirement
+        self._by_name.setdefault(name, []).append(requirement)
+
+    def get(self, requirements_file: RequirementsFile, name: str) -> Optional[Requirement]:
+        """Return requirement of package with given name in given file (or None if there is no such requirement)."""
+        return self._by_file.get((requirements_file.path, normalize_package_name(name)))
+
+    def find(self, name: str) -> List[Requirement]:
+        """Return requirements of package with given name in all files of the project."""
+        return self._by_name.get(normalize_package_name(name), [])
@@ -0,0 +1,281 @@
+"""This module contains resolver of mutually compatible versions of project requirements."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from logging import getLogger, Logger
+from typing import (  # noqa: F401 Imported for type definition
+    Collection, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Set, Tuple
+)
+
+from packaging.markers import default_environment
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.specifiers import SpecifierSet
+from packaging.version import InvalidVersion, Version
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.utils import normalize_package_name
+from pipwatch_worker.index.bulk import BulkPackageIndex
+from pipwatch_worker.index.dependencies import DependenciesIndex
+
+# Constraints put on each package (version specifier and requested extras), along with name of package
+# which put them (None for the project itself)
+Constraint = Tuple[SpecifierSet, FrozenSet[str], Optional[str]]
+Constraints = Dict[str, List[Constraint]]
+# Chosen versions of packages (None stands for package unknown to the index)
+Resolution = Dict[str, Optional[Version]]
+# Package whose version is being chosen, along with state of resolution before the choice and candidate
+# versions which were not tried yet
+Choice = NamedTuple("Choice", [
+    ("name", str),
+    ("chosen", Resolution),
+    ("constraints", Constraints),
+    ("pending", List[str]),
+    ("candidates", Iterator[Optional[Version]])
+])
+
+
+class ResolutionImpossible(Exception):
+    """Raised when no combination of available versions satisfies constraints of all packages."""
+
+
+class ResolutionTooComplex(Exception):
+    """Raised when resolver tries more candidate versions than it is allowed to."""
+
+
+class DependencyResolver:
+    """Encompasses logic of choosing newest mutually compatible versions of project requirements.
+
+    Versions are chosen newest first, along with dependencies they declare (Requires-Dist, see
+    DependenciesIndex), transitively. When a version conflicts with constraints put by packages
+    chosen before, the next older one is tried and once there are none left, resolver backtracks
+    to the previously chosen package. Dependencies which cannot be told are assumed to be none and
+    packages unknown to the index satisfy any constraints. Extras requested from a package after
+    its version was chosen are not taken into account.
+
+    Resolution is given up after 'max_attempts' candidate versions, only 'max_candidates' newest
+    versions satisfying constraints of each package are considered.
+    """
+
+    DEFAULT_MAX_ATTEMPTS = 2000
+    DEFAULT_MAX_CANDIDATES = 30
+
+    def __init__(self, package_index: BulkPackageIndex,  # pylint: disable=too-many-arguments
+                 dependencies_index: DependenciesIndex = None,
+                 max_attempts: int = None,
+                 max_candidates: int = None,
+                 logger: Logger = None) -> None:
+        """Create class instance (resolver without dependencies index is disabled)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.package_index = package_index
+        self.dependencies_index = dependencies_index
+        self.max_attempts = max_attempts or self.DEFAULT_MAX_ATTEMPTS
+        self.max_candidates = max_candidates or self.DEFAULT_MAX_CANDIDATES
+        self.environment = default_environment()
+
+        self._releases: Dict[str, Optional[List[Version]]] = {}
+        self._dependencies: Dict[Tuple[str, Version, FrozenSet[str]], List[Requirement]] = {}
+        self._unresolved: Set[str] = set()
+        self._attempts = 0
+
+    @classmethod
+    def from_config(cls, package_index: BulkPackageIndex, logger: Logger = None) -> "DependencyResolver":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "resolver"
+        if not configuration.getboolean(section=section, option="enabled", fallback=True):
+            return cls(package_index=package_index, logger=logger)
+
+        return cls(
+            package_index=package_index,
+            dependencies_index=DependenciesIndex.from_config(logger=logger),
+            max_attempts=configuration.getint(
+                section=section, option="max_attempts", fallback=cls.DEFAULT_MAX_ATTEMPTS
+            ),
+            max_candidates=configuration.getint(
+                section=section, option="max_candidates", fallback=cls.DEFAULT_MAX_CANDIDATES
+            ),
+            logger=logger
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Indicate if requirements should be resolved."""
+        return self.dependencies_index is not None
+
+    def resolve(self, requirements: Dict[str, SpecifierSet],
+                upgrades: Collection[str] = ()) -> Dict[str, Optional[str]]:
+        """Return newest mutually compatible versions of given requirements (and of their dependencies).
+
+        Packages which are to be upgraded may be resolved to any version not older than the newest
+        one their constraints allow now. Raises ResolutionImpossible or ResolutionTooComplex.
+        """
+        requirements = {normalize_package_name(name): specifier for name, specifier in requirements.items()}
+        upgrades = {normalize_package_name(name) for name in upgrades}
+        self._attempts = 0
+        self._unresolved.update(requirements)
+
+        constraints: Constraints = {}
+        for name, specifier in requirements.items():
+            if name in upgrades:
+                specifier = self._get_upgrade_specifier(name=name, specifier=specifier)
+            constraints[name] = [(specifier, frozenset(), None)]
+
+        resolution = self._resolve(constraints=constraints, pending=sorted(
+            requirements, key=lambda package_name: (package_name not in upgrades, package_name)
+        ))
+        if resolution is None:
+            raise ResolutionImpossible("Requirements of the project cannot be satisfied together.")
+
+        self.log.debug("Requirements resolved after {attempts} attempts.".format(attempts=self._attempts))
+        return {name: str(version) if version else None for name, version in resolution.items()}
+
+    def _resolve(self, constraints: Constraints, pending: List[str]) -> Optional[Resolution]:
+        """Choose versions of all pending packages (None if they cannot be chosen).
+
+        Choices made so far are kept on explicit stack (rather than call stack), so that the number of
+        packages is not limited by recursion depth.
+        """
+        stack: List[Choice] = []
+        chosen: Resolution = {}
+        while True:
+            pending = [name for name in pending if name not in chosen]
+            if not pending:
+                return chosen
+
+            name = pending[0]
+            stack.append(Choice(
+                name=name,
+                chosen=chosen,
+                constraints=constraints,
+                pending=pending[1:],
+                candidates=iter(self._get_candidates(name=name, constraints=constraints[name]))
+            ))
+            next_step = self._choose_next(stack=stack)
+            if next_step is None:
+                return None
+
+            chosen, constraints, pending = next_step
+
+    def _choose_next(self, stack: List[Choice]) -> Optional[Tuple[Resolution, Constraints, List[str]]]:
+        """Choose next candidate version of the last package on stack, backtracking when there are none left.
+
+        Return state of resolution after the choice (None once there is nothing left to backtrack to).
+        """
+        while stack:
+            choice = stack[-1]
+            extras = frozenset(
+                extra for _, requested_extras, _ in choice.constraints[choice.name] for extra in requested_extras
+            )
+            for version in choice.candidates:
+                self._attempts += 1
+                if self._attempts > self.max_attempts:
+                    raise ResolutionTooComplex("Requirements were not resolved within {attempts} attempts.".format(
+                        attempts=self.max_attempts
+                    ))
+
+                dependencies = self._get_dependencies(name=choice.name, version=version, extras=extras) \
+                    if version else []
+                if any(self._conflicts(requirement=dependency, chosen=choice.chosen) for dependency in dependencies):
+                    continue
+
+                constraints = dict(choice.constraints)
+                pending = list(choice.pending)
+                for dependency in dependencies:
+                    dependency_name = normalize_package_name(dependency.name)
+                    constraints[dependency_name] = constraints.get(dependency_name, []) + [
+                        (dependency.specifier, frozenset(dependency.extras), choice.name)
+                    ]
+                    if dependency_name not in choice.chosen and dependency_name not in pending:
+                        pending.append(dependency_name)
+                        self._unresolved.add(dependency_name)
+
+                return {**choice.chosen, choice.name: version}, constraints, pending
+
+            stack.pop()
+            self.log.debug("No version of {name} satisfies constraints put by {parents}.".format(
+                name=choice.name,
+                parents=", ".join(sorted({parent or "the project" for _, _, parent in choice.constraints[choice.name]}))
+            ))
+
+        return None
+
+    def _get_candidates(self, name: str, constraints: List[Constraint]) -> List[Optional[Version]]:
+        """Return versions of package which satisfy all given constraints, newest first."""
+        releases = self._get_releases(name=name)
+        if releases is None:
+            return [None]
+
+        candidates = [version for version in releases if all(
+            specifier.contains(version, prereleases=True) for specifier, _, _ in constraints
+        )]
+        final_candidates = [version for version in candidates if not version.is_prerelease]
+        return (final_candidates or candidates)[:self.max_candidates]
+
+    def _get_releases(self, name: str) -> Optional[List[Version]]:
+        """Return versions of package available in the index, newest first (None if package is unknown)."""
+        if name not in self._releases:
+            # Packages discovered so far are resolved in bulk, so that the index is not queried one by one
+            names = self._unresolved | {name}
+            self._unresolved = set()
+            for package_name, metadata in self.package_index.get_metadata(package_names=names).items():
+                self._releases[package_name] = sorted(
+                    self._parse_versions(metadata.releases), reverse=True
+                ) if metadata else None
+            self._releases.setdefault(name, None)
+
+        return self._releases[name]
+
+    def _get_upgrade_specifier(self, name: str, specifier: SpecifierSet) -> SpecifierSet:
+        """Return constraints allowing versions not older than the newest one given constraints allow."""
+        releases = self._get_releases(name=name) or []
+        allowed = [version for version in releases if specifier.contains(version, prereleases=True)]
+        if not allowed:
+            return SpecifierSet()
+
+        return SpecifierSet(">={version}".format(version=max(allowed)))
+
+    def _get_dependencies(self, name: str, version: Version, extras: FrozenSet[str]) -> List[Requirement]:
+        """Return requirements declared by given release of package, which apply to the environment."""
+        key = (name, version, extras)
+        if key not in self._dependencies:
+            requirements = []
+            for requires_dist in self.dependencies_index.get_requires_dist(  # type: ignore
+                    package_name=name, version=str(version)
+            ) or []:
+                try:
+                    requirement = Requirement(requires_dist)
+                except InvalidRequirement:
+                    self.log.debug("Ignoring invalid requirement '{requirement}' of {name} {version}.".format(
+                        requirement=requires_dist,
+                        name=name,
+                        version=version
+                    ))
+                    continue
+
+                if not requirement.marker or any(
+                        requirement.marker.evaluate(dict(self.environment, extra=extra)) for extra in extras | {""}
+                ):
+                    requirements.append(requirement)
+
+            self._dependencies[key] = requirements
+
+        return self._dependencies[key]
+
+    @staticmethod
+    def _conflicts(requirement: Requirement, chosen: Resolution) -> bool:
+        """Indicate if version of required package chosen before does not satisfy given requirement."""
+        name = normalize_package_name(requirement.name)
+        if name not in chosen or chosen[name] is None:
+            return False
+
+        return not requirement.specifier.contains(chosen[name], prereleases=True)
+
+    @staticmethod
+    def _parse_versions(versions: Collection[str]) -> List[Version]:
+        """Return given versions which comply with PEP 440."""
+        parsed_versions = []
+        for version in versions:
+            try:
+                parsed_versions.append(Version(version))
+            except InvalidVersion:
+                continue
+
+        return parsed_versions
@@ -0,0 +1,123 @@
+"""This module contains logic of confining commands run by the worker to limited share of host resources."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from contextlib import contextmanager
+from logging import getLogger, Logger
+import os
+import signal
+import time
+from typing import Dict, Iterator, List, Optional, Tuple  # noqa: F401 Imported for type definition
+import uuid
+
+from pipwatch_worker.core.configuration import load_config_file
+
+
+class Sandbox:
+    """Encompasses logic of resource limits applied to each command run by the worker.
+
+    Every process started by a command gets limited address space, number of processes (note that
+    Linux counts those per user) and open files. Additionally, when parent cgroup (v2) delegated to
+    the worker is configured, each command is placed in its own child cgroup, with limits of memory,
+    number of processes and share of CPU - this way commands running at once cannot starve each other.
+    """
+
+    CGROUP_PREFIX = "pipwatch-"
+    CGROUP_CONTROLLERS = ("cpu", "memory", "pids")
+
+    def __init__(self, limits: Dict[str, int] = None, cgroup_parent: str = None,
+                 cgroup_settings: Dict[str, str] = None, logger: Logger = None) -> None:
+        """Create class instance (limits of 0 mean no limit, sandbox without cgroup parent uses no cgroups)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.limits = {name: amount for name, amount in (limits or {}).items() if amount}
+        self.cgroup_parent = cgroup_parent
+        self.cgroup_settings = {name: value for name, value in (cgroup_settings or {}).items() if value}
+
+    @classmethod
+    def from_config(cls, logger: Logger = None) -> "Sandbox":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "sandbox"
+        if not configuration.getboolean(section=section, option="enabled", fallback=True):
+            return cls(logger=logger)
+
+        return cls(
+            limits={
+                "address_space": configuration.getint(section=section, option="address_space", fallback=0),
+                "processes": configuration.getint(section=section, option="processes", fallback=0),
+                "open_files": configuration.getint(section=section, option="open_files", fallback=0)
+            },
+            cgroup_parent=configuration.get(section=section, option="cgroup_parent", fallback=""),
+            cgroup_settings={
+                "memory.max": configuration.get(section=section, option="cgroup_memory_max", fallback=""),
+                "pids.max": configuration.get(section=section, option="cgroup_pids_max", fallback=""),
+                "cpu.max": configuration.get(section=section, option="cgroup_cpu_max", fallback="")
+            },
+            logger=logger
+        )
+
+    def get_limits(self) -> List[Tuple[str, int]]:
+        """Return resource limits (see limits module) each command should run with."""
+        return sorted(self.limits.items())
+
+    @contextmanager
+    def cgroup(self) -> Iterator[Optional[str]]:
+        """Provide dedicated cgroup for single command (or None if cgroups are not available).
+
+        All processes left in cgroup are killed once the block ends.
+        """
+        path = self._create_cgroup()
+        try:
+            yield path
+        finally:
+            if path:
+                self._remove_cgroup(path=path)
+
+    def _create_cgroup(self) -> Optional[str]:
+        """Create child cgroup of configured parent with configured limits."""
+        if not self.cgroup_parent or not os.path.isdir(self.cgroup_parent):
+            return None
+
+        self._enable_controllers()
+        path = os.path.join(self.cgroup_parent, self.CGROUP_PREFIX + uuid.uuid4().hex)
+        try:
+            os.mkdir(path)
+            for name, value in self.cgroup_settings.items():
+                with open(os.path.join(path, name), "w", encoding="utf-8") as file:
+                    file.write(value)
+        except OSError:
+            self.log.warning("Unable to set up cgroup '{path}', running command without it.".format(path=path),
+                             exc_info=True)
+            self._remove_cgroup(path=path)
+            return None
+
+        return path
+
+    def _enable_controllers(self) -> None:
+        """Make sure controllers used by the sandbox are available in child cgroups of the parent."""
+        try:
+            with open(os.path.join(self.cgroup_parent, "cgroup.subtree_control"), "w", encoding="utf-8") as file:
+                file.write(" ".join("+" + controller for controller in self.CGROUP_CONTROLLERS))
+        except OSError:
+            self.log.debug("Unable to enable cgroup controllers in '{path}'.".format(path=self.cgroup_parent))
+
+    def _remove_cgroup(self, path: str) -> None:
+        """Kill all processes of given cgroup and remove it."""
+        if not os.path.isdir(path):
+            return
+
+        kill_file = os.path.join(path, "cgroup.kill")
+        for _ in range(50):
+            try:
+                if os.path.exists(kill_file):
+                    with open(kill_file, "w", encoding="utf-8") as file:
+                        file.write("1")
+                else:
+                    with open(os.path.join(path, "cgroup.procs"), "r", encoding="utf-8") as file:
+                        for pid in file.read().split():
+                            os.kill(int(pid), signal.SIGKILL)
+
+                os.rmdir(path)
+                return
+            except OSError:
+                time.sleep(0.1)
+
+        self.log.warning("Unable to remove cgroup '{path}'.".format(path=path))
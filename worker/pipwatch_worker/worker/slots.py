@@ -0,0 +1,162 @@
+"""This module contains redis based semaphore, reserving part of worker concurrency for more important tasks."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from contextlib import contextmanager
+from logging import getLogger, Logger
+import os
+import socket
+import threading
+import time
+from typing import Dict, Iterator, Optional  # noqa: F401 Imported for type definition
+
+import redis
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.utils import get_priority_rank, PriorityClass
+
+
+class NoSlotAvailable(Exception):
+    """Raised when all slots task of given priority class may use are taken."""
+
+
+class ConcurrencySlots:
+    """Encompasses logic of limiting number of tasks of each priority class running on a host at once.
+
+    Each class may reserve a number of slots, which tasks of less important classes cannot take -
+    e.g. with concurrency of 8 and 2 slots reserved by interactive class, scheduled and backfill
+    tasks never take more than 6 slots, so that interactive request does not wait behind them.
+    Slots are leases in redis sorted set (scored by expiry), renewed while task runs, so slots of
+    tasks that died are freed once their lease expires. Durations of finished tasks are recorded
+    as well, so that the api can estimate when queued tasks start. Tasks give up waiting for a slot
+    after 'max_wait' seconds.
+    """
+
+    KEY_PREFIX = "pipwatch:slots:"
+    DURATIONS_KEY_PREFIX = "pipwatch:task-durations:"
+    DURATIONS_KEPT = 100
+    DEFAULT_TTL = 300
+    DEFAULT_MAX_WAIT = 3600
+
+    ACQUIRE_SCRIPT = """
+        local now, rank, limit = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+        redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now)
+        local taken = 0
+        for _, member in ipairs(redis.call("ZRANGE", KEYS[1], 0, -1)) do
+            if tonumber(string.match(member, "^(%d+):")) >= rank then
+                taken = taken + 1
+            end
+        end
+        if taken >= limit then
+            return 0
+        end
+        redis.call("ZADD", KEYS[1], now + tonumber(ARGV[5]), ARGV[4])
+        redis.call("EXPIRE", KEYS[1], tonumber(ARGV[5]))
+        return 1
+    """
+
+    def __init__(self, concurrency: int,  # pylint: disable=too-many-arguments
+                 reservations: Dict[str, int] = None,
+                 redis_url: str = None,
+                 node: str = None,
+                 ttl: int = None,
+                 max_wait: float = None,
+                 logger: Logger = None) -> None:
+        """Create class instance (slots without redis url are disabled - there is always one available)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.concurrency = concurrency
+        self.reservations = reservations or {}
+        self.redis = redis.StrictRedis.from_url(redis_url) if redis_url else None
+        self.node = node or socket.gethostname()
+        self.ttl = ttl or self.DEFAULT_TTL
+        self.max_wait = max_wait or self.DEFAULT_MAX_WAIT
+
+    @classmethod
+    def from_config(cls, logger: Logger = None) -> "ConcurrencySlots":
+        """Create class instance based on settings from configuration file."""
+        configuration: ConfigParser = load_config_file()
+        section = "priorities"
+        concurrency = configuration.getint(section=section, option="concurrency", fallback=0) or os.cpu_count() or 1
+        if not configuration.getboolean(section=section, option="enabled", fallback=True):
+            return cls(concurrency=concurrency, logger=logger)
+
+        redis_url = configuration.get(section=section, option="redis_url", fallback="") or configuration.get(
+            section="celery", option="broker_url", fallback="redis://localhost:6379/0"
+        )
+        return cls(
+            concurrency=concurrency,
+            reservations={
+                priority_class.value: configuration.getint(
+                    section=section, option="{name}_reserved".format(name=priority_class.value), fallback=0
+                ) for priority_class in PriorityClass
+            },
+            redis_url=redis_url,
+            node=configuration.get(section=section, option="node", fallback="") or None,
+            ttl=configuration.getint(section=section, option="ttl", fallback=cls.DEFAULT_TTL),
+            max_wait=configuration.getfloat(section=section, option="max_wait", fallback=cls.DEFAULT_MAX_WAIT),
+            logger=logger
+        )
+
+    @property
+    def key(self) -> str:
+        """Return redis key of slots of this host."""
+        return self.KEY_PREFIX + self.node
+
+    def get_limit(self, priority_class: str) -> int:
+        """Return number of slots tasks of given class (and less important ones) may take at once."""
+        rank = get_priority_rank(priority_class)
+        reserved = sum(
+            self.reservations.get(other_class.value, 0) for other_class in PriorityClass
+            if get_priority_rank(other_class.value) < rank
+        )
+        return max(self.concurrency - reserved, 1)
+
+    @contextmanager
+    def acquire(self, priority_class: str, task_id: str) -> Iterator[None]:
+        """Take slot for given task for the duration of the block (raise NoSlotAvailable if there is none)."""
+        if not self.redis:
+            yield
+            return
+
+        member = "{rank}:{task_id}".format(rank=get_priority_rank(priority_class), task_id=task_id)
+        limit = self.get_limit(priority_class=priority_class)
+        if not self.redis.eval(self.ACQUIRE_SCRIPT, 1, self.key, time.time(), get_priority_rank(priority_class),
+                               limit, member, self.ttl):
+            raise NoSlotAvailable("All {limit} slots available for {priority_class} tasks are taken.".format(
+                limit=limit,
+                priority_class=priority_class
+            ))
+
+        stop_renewal = threading.Event()
+        renewal_thread = threading.Thread(target=self._renew, args=(member, stop_renewal), daemon=True)
+        renewal_thread.start()
+        try:
+            yield
+        finally:
+            stop_renewal.set()
+            renewal_thread.join()
+            try:
+                self.redis.zrem(self.key, member)
+            except redis.RedisError:
+                self.log.warning("Unable to free slot of '{member}', it will expire.".format(member=member),
+                                 exc_info=True)
+
+    def record_duration(self, priority_class: str, duration: float) -> None:
+        """Remember how long task of given class took (only the most recent durations are kept)."""
+        if not self.redis:
+            return
+
+        key = self.DURATIONS_KEY_PREFIX + priority_class
+        try:
+            self.redis.pipeline().lpush(key, duration).ltrim(key, 0, self.DURATIONS_KEPT - 1).execute()
+        except redis.RedisError:
+            self.log.warning("Unable to record duration of {priority_class} task.".format(
+                priority_class=priority_class
+            ), exc_info=True)
+
+    def _renew(self, member: str, stop_renewal: threading.Event) -> None:
+        """Prolong lease of the slot periodically, until asked to stop."""
+        while not stop_renewal.wait(timeout=self.ttl / 3):
+            try:
+                self.redis.zadd(self.key, {member: time.time() + self.ttl}, xx=True)
+                self.redis.expire(self.key, self.ttl)
+            except redis.RedisError:
+                self.log.warning("Unable to renew slot of '{member}'.".format(member=member), exc_info=True)
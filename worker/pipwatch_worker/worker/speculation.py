@@ -0,0 +1,111 @@
+"""This module contains logic of running several candidate update sets at once."""
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger, Logger
+import os
+from typing import Callable, Dict, List, NamedTuple, Optional  # noqa: F401 Imported for type definition
+
+from packaging.version import InvalidVersion, Version
+
+from pipwatch_worker.core.data_models import Requirement  # noqa: F401 Imported for type definition
+from pipwatch_worker.core.utils import normalize_package_name
+
+
+CandidateSet = NamedTuple("CandidateSet", [
+    ("label", str),
+    ("packages", List[str])
+])
+
+
+def get_update_level(installed_version: Optional[str], desired_version: Optional[str]) -> str:
+    """Return which part of version ('major', 'minor' or 'patch') changes, when updating between given versions."""
+    try:
+        old, new = Version(installed_version or ""), Version(desired_version or "")
+    except InvalidVersion:
+        return "major"
+
+    old_release, new_release = old.release + (0, 0), new.release + (0, 0)
+    if old_release[0] != new_release[0]:
+        return "major"
+
+    if old_release[1] != new_release[1]:
+        return "minor"
+
+    return "patch"
+
+
+def get_candidate_sets(requirements: List[Requirement]) -> List[CandidateSet]:
+    """Return distinct, non-empty sets of packages worth attempting to update together (largest first).
+
+    Sets are: all updates, updates without major bumps, patch-level updates only and each major bump alone.
+    """
+    levels: Dict[str, str] = {}
+    for requirement in requirements:
+        if not requirement.desired_version:
+            continue
+
+        name = normalize_package_name(requirement.name)
+        level = get_update_level(requirement.installed_version, requirement.desired_version)
+        # Package present in many files is classified by its most significant change
+        levels[name] = min(levels.get(name, level), level, key=["major", "minor", "patch"].index)
+
+    all_packages = sorted(levels)
+    candidate_sets = [
+        CandidateSet("all", all_packages),
+        CandidateSet("non-major", [name for name in all_packages if levels[name] != "major"]),
+        CandidateSet("patch", [name for name in all_packages if levels[name] == "patch"])
+    ] + [
+        CandidateSet("major:{name}".format(name=name), [name])
+        for name in all_packages if levels[name] == "major"
+    ]
+
+    distinct_sets: List[CandidateSet] = []
+    for candidate_set in candidate_sets:
+        if candidate_set.packages and all(candidate_set.packages != known.packages for known in distinct_sets):
+            distinct_sets.append(candidate_set)
+
+    return distinct_sets
+
+
+class SpeculativeAttempts:
+    """Encompasses logic of testing several candidate update sets concurrently.
+
+    Each candidate set is tested by given callable, which is expected to run it in isolated workspace.
+    Tests mostly wait for subprocesses (installs, check command), so they are driven by a pool of
+    threads - one per core by default.
+    """
+
+    def __init__(self, test: Callable[[CandidateSet], bool], max_workers: int = 0, logger: Logger = None) -> None:
+        """Create class instance (max_workers of 0 means number of cores)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.test = test
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+        self.results: Dict[str, bool] = {}
+
+    def __call__(self, candidate_sets: List[CandidateSet]) -> Optional[CandidateSet]:
+        """Test given candidate sets, return the largest one which passed (or None if all failed)."""
+        self.results = {}
+        if not candidate_sets:
+            return None
+
+        self.log.info("Attempting {count} candidate update sets with up to {workers} at once.".format(
+            count=len(candidate_sets),
+            workers=self.max_workers
+        ))
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(candidate_sets))) as executor:
+            outcomes = list(executor.map(self._run_test, candidate_sets))
+
+        self.results = {candidate_set.label: passed for candidate_set, passed in zip(candidate_sets, outcomes)}
+        passing_sets = [candidate_set for candidate_set, passed in zip(candidate_sets, outcomes) if passed]
+        self.log.info("Candidate update sets results: {results!r}".format(results=self.results))
+        return max(passing_sets, key=lambda candidate_set: len(candidate_set.packages), default=None)
+
+    def _run_test(self, candidate_set: CandidateSet) -> bool:
+        """Test single candidate set, treating unexpected errors as failure."""
+        try:
+            return self.test(candidate_set)
+        except Exception:  # pylint: disable=broad-except
+            self.log.exception("Attempt of candidate update set '{label}' has failed.".format(
+                label=candidate_set.label
+            ))
+            return False
@@ -39,6 +39,11 @@ WORKER_STATE_TRANSITIONS = [
         "dest": States.CLONING_REPOSITORY.value,
         "trigger": Triggers.TO_CLONE.value
     },
+    {
+        "source": States.INITIALIZING.value,
+        "dest": States.SUCCESS.value,
+        "trigger": Triggers.TO_SUCCESS.value
+    },
     {
         "source": States.CLONING_REPOSITORY.value,
         "dest": States.PARSING_REQUIREMENTS.value,
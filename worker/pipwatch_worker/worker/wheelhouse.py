@@ -0,0 +1,176 @@
+"""This module contains logic of wheelhouse - directory of built wheels shared by all projects."""
+from configparser import ConfigParser  # noqa: F401 Imported for type definition
+from contextlib import contextmanager
+import hashlib
+from logging import getLogger, Logger
+import os
+import shutil
+import tempfile
+import time
+from typing import Iterator, List  # noqa: F401 Imported for type definition
+import zipfile
+
+from pipwatch_worker.core.configuration import load_config_file
+from pipwatch_worker.core.utils import file_lock
+
+
+def get_file_digest(path: str) -> str:
+    """Return sha256 digest of given file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def is_valid_wheel(path: str) -> bool:
+    """Indicate if given file is a readable wheel archive."""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            return archive.testzip() is None
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+
+class Wheelhouse:
+    """Encompasses logic of storing, verifying and evicting wheels shared between installs.
+
+    Every wheel is stored along with its sha256 digest, which is verified each time the wheel
+    is used. Modification time of digest file records last use - least recently used wheels
+    are removed once wheelhouse grows above configured size.
+    """
+
+    DIGEST_EXTENSION = ".sha256"
+    LOCK_FILE = ".lock"
+
+    DEFAULT_DIRECTORY_NAME = ".wheelhouse"
+
+    def __init__(self, directory_path: str = None, max_size: int = 0, logger: Logger = None) -> None:
+        """Create class instance (wheelhouse without directory path is disabled)."""
+        self.log: Logger = logger or getLogger(__name__)
+        self.directory_path = directory_path
+        self.max_size = max_size
+
+    @classmethod
+    def from_config(cls, cache_path: str, logger: Logger = None) -> "Wheelhouse":
+        """Create class instance based on settings from configuration file.
+
+        Wheelhouse is placed within given cache directory, unless configuration points elsewhere
+        (e.g. to storage shared by many workers).
+        """
+        configuration: ConfigParser = load_config_file()
+        if not configuration.getboolean(section="wheelhouse", option="enabled", fallback=True):
+            return cls(logger=logger)
+
+        default_path = os.path.join(cache_path, cls.DEFAULT_DIRECTORY_NAME)
+        directory_path = os.path.expandvars(
+            configuration.get(section="wheelhouse", option="directory_path", fallback="")
+        )
+        return cls(
+            directory_path=directory_path or default_path,
+            max_size=configuration.getint(section="wheelhouse", option="max_size_bytes", fallback=0),
+            logger=logger
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Indicate if wheelhouse should be used."""
+        return bool(self.directory_path)
+
+    @property
+    def _lock_path(self) -> str:
+        """Return path to file guarding modifications of the wheelhouse."""
+        return os.path.join(self.directory_path, self.LOCK_FILE)
+
+    @contextmanager
+    def staging(self) -> Iterator[str]:
+        """Provide temporary directory for wheels needed by single install."""
+        os.makedirs(self.directory_path, exist_ok=True)
+        staging_path = tempfile.mkdtemp(prefix=".staging-", dir=self.directory_path)
+        try:
+            yield staging_path
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+    def store(self, staging_path: str) -> List[str]:
+        """Verify wheels gathered in staging directory and add new ones to the wheelhouse.
+
+        Returns names of wheels whose wheelhouse copy turned out to be corrupted - those are removed
+        from wheelhouse and staging directory, and have to be retrieved again.
+        """
+        corrupted = []
+        with file_lock(self._lock_path):
+            for wheel_name in sorted(os.listdir(staging_path)):
+                if not wheel_name.endswith(".whl"):
+                    continue
+
+                if not self._store_wheel(staging_path=staging_path, wheel_name=wheel_name):
+                    corrupted.append(wheel_name)
+
+        return corrupted
+
+    def collect_garbage(self) -> None:
+        """Remove least recently used wheels until wheelhouse fits within its maximum size."""
+        if not self.enabled or self.max_size <= 0 or not os.path.isdir(self.directory_path):
+            return
+
+        with file_lock(self._lock_path):
+            entries = []
+            for wheel_name in os.listdir(self.directory_path):
+                wheel_path = os.path.join(self.directory_path, wheel_name)
+                if not wheel_name.endswith(".whl") or not os.path.isfile(wheel_path):
+                    continue
+
+                digest_path = wheel_path + self.DIGEST_EXTENSION
+                last_used = os.path.getmtime(digest_path if os.path.exists(digest_path) else wheel_path)
+                entries.append((last_used, os.path.getsize(wheel_path), wheel_path))
+
+            total_size = sum(size for _, size, _ in entries)
+            for _, size, wheel_path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+
+                self.log.debug("Evicting wheel '{path}' from wheelhouse.".format(path=wheel_path))
+                self._remove(wheel_path)
+                total_size -= size
+
+    def _store_wheel(self, staging_path: str, wheel_name: str) -> bool:
+        """Add single wheel to wheelhouse (or verify the copy already stored there), return False if corrupted."""
+        staged_path = os.path.join(staging_path, wheel_name)
+        wheel_path = os.path.join(self.directory_path, wheel_name)
+        digest_path = wheel_path + self.DIGEST_EXTENSION
+        staged_digest = get_file_digest(staged_path)
+
+        if os.path.exists(wheel_path) and os.path.exists(digest_path):
+            with open(digest_path, "r", encoding="utf-8") as file:
+                expected_digest = file.read().strip()
+
+            if expected_digest == staged_digest and expected_digest == get_file_digest(wheel_path):
+                os.utime(digest_path)
+                return True
+
+            self.log.warning("Wheel '{name}' in wheelhouse is corrupted, removing it.".format(name=wheel_name))
+            self._remove(wheel_path)
+            os.remove(staged_path)
+            return False
+
+        if not is_valid_wheel(staged_path):
+            self.log.warning("Wheel '{name}' is not a valid archive, not storing it.".format(name=wheel_name))
+            os.remove(staged_path)
+            return False
+
+        temporary_path = wheel_path + ".{pid}.tmp".format(pid=os.getpid())
+        shutil.copy2(staged_path, temporary_path)
+        os.replace(temporary_path, wheel_path)
+        with open(digest_path, "w", encoding="utf-8") as file:
+            file.write(staged_digest)
+
+        os.utime(digest_path, (time.time(), time.time()))
+        return True
+
+    def _remove(self, wheel_path: str) -> None:
+        """Remove wheel along with its digest."""
+        for path in (wheel_path, wheel_path + self.DIGEST_EXTENSION):
+            if os.path.exists(path):
+                os.remove(path)
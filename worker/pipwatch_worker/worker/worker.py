@@ -1,19 +1,23 @@
 """This module contains pipwatch worker definition."""
 
+from concurrent.futures import Executor, Future  # noqa: F401 Imported for type definition
 from configparser import ConfigParser
 from itertools import chain
 from logging import getLogger, Logger  # noqa: F401 Imported for type definition
-from typing import Callable, FrozenSet  # noqa: F401 Imported for type definition
+from typing import Any, Callable, Collection, Dict, FrozenSet, List, Optional  # noqa: F401 Imported for type definition
 
 from transitions import Machine
 
 from pipwatch_worker.core.configuration import load_config_file
 from pipwatch_worker.core.data_models import Project
-from pipwatch_worker.core.utils import ProjectFlavour
-from pipwatch_worker.worker.operations.checking_updates import CheckUpdates
+from pipwatch_worker.core.utils import normalize_package_name, ProjectFlavour
+from pipwatch_worker.index.metadata import PackageMetadata  # noqa: F401 Imported for type definition
+from pipwatch_worker.worker.operations.checking_updates import CheckUpdates, PackageUpdateSuggestion
+from pipwatch_worker.worker.operations.checkpointing import Checkpoints
 from pipwatch_worker.worker.operations.attempting_updates import AttemptUpdate
 from pipwatch_worker.worker.operations.cloning import Clone
 from pipwatch_worker.worker.operations.commiting_changes import CommitChanges
+from pipwatch_worker.worker.operations.detecting_changes import DetectChanges
 from pipwatch_worker.worker.operations.gerrit import GitReview
 from pipwatch_worker.worker.operations.github import PullRequest
 from pipwatch_worker.worker.operations.git_push import GitPush
@@ -21,14 +25,16 @@ from pipwatch_worker.worker.operations.operation import Operation
 from pipwatch_worker.worker.operations.parsing import Parse
 from pipwatch_worker.worker.states import States, WORKER_STATE_TRANSITIONS, Triggers
 from pipwatch_worker.worker.operations.updating import Update
+from pipwatch_worker.worker.requirements_index import RequirementsIndex
 
 
 class Worker:
     """Responsible for checking and updating python packages in given project."""
 
-    def __init__(self, update_celery_state_method: Callable[[str], None],
-                 logger: Logger = None) -> None:
-        """Initialize worker instance."""
+    def __init__(self, update_celery_state_method: Callable[..., None],
+                 logger: Logger = None,
+                 executor: Executor = None) -> None:
+        """Initialize worker instance (metadata updates are sent from given executor, if there is one)."""
         self.log: Logger = logger or getLogger(__name__)
         self.state_machine = Machine(
             model=self,
@@ -42,57 +48,156 @@ class Worker:
 
         self.should_attempt_update = False
         self.update_successful = False
+        self.no_op = False
+        self.reported_state = States.INITIALIZING.value
 
         self._locked_packages_ids: FrozenSet[int] = frozenset()
 
-        self._attempt_update: Operation
+        self._packages_metadata: Dict[str, Optional[PackageMetadata]] = None
+        self._cloned = False
+        self._executor = executor
+        self._metadata_updates: List[Future] = []
+
+        self._attempt_update: AttemptUpdate
+        self._checkpoints: Checkpoints
         self._commit_changes: Operation
-        self._clone: Operation
+        self._clone: Clone
+        self._detect_changes: DetectChanges
         self._git_review: Operation
         self._git_push: Operation
         self._parse: Operation
         self._pull_request: Operation
         self._update: Operation
 
-    def run(self, project_to_process: Project) -> None:
-        """Start worker processing of project requirements update request."""
+    def run(self, project_to_process: Project,
+            packages_metadata: Dict[str, Optional[PackageMetadata]] = None,
+            cloned: bool = False) -> Dict[str, Any]:
+        """Start worker processing of project requirements update request, return summary of its outcome.
+
+        Metadata of packages may be resolved beforehand (e.g. once for whole namespace), so that they
+        are not resolved again by each project, and repository may be cloned beforehand (see
+        ProjectPipeline). Checkpoint is saved after each completed step, so that processing
+        interrupted (e.g. by death of the worker) is resumed from the last completed one - steps
+        completed while metadata updates are still being sent are not saved, so that updates which
+        were not sent are sent again. Project worktree is not evicted from repositories cache while
+        it is processed.
+        """
         try:
-            self.initialize(project_to_process=project_to_process)
-            self.clone()
-            self.parse_requirements()
-            self.check_updates()
-            self.update_metadata()
-
-            if self.should_attempt_update:
-                self.attempt_update()
-                self.commit_changes()
-                self.push_changes()
-                self.update_metadata()
-
+            self._cloned = cloned
+            self.initialize(project_to_process=project_to_process, packages_metadata=packages_metadata)
+            with self._clone.pinned():
+                steps_completed = self.resume()
+                if not steps_completed and self.is_unchanged():
+                    self.success()
+                    return self.summary
+
+                while steps_completed < len(self.steps):
+                    self.steps[steps_completed]()
+                    steps_completed += 1
+                    if self._metadata_updates_sent():
+                        self._save_checkpoint(steps_completed=steps_completed)
+
+                self._wait_for_metadata_updates()
             self.success()
         except Exception:
             self.log.exception("Was unable to process update request for project.")
             self.fail()
 
+        return self.summary
+
+    @property
+    def steps(self) -> List[Callable[[], None]]:
+        """Return steps of processing the project, in order (updates are attempted only if there are any)."""
+        steps = [self.clone, self.parse_requirements, self.check_updates, self.update_metadata]
+        if self.should_attempt_update:
+            steps.extend([self.attempt_update, self.commit_changes, self.push_changes, self.update_metadata])
+
+        return steps
+
+    @property
+    def summary(self) -> Dict[str, Any]:
+        """Return summary of request processing (reported along with each state change)."""
+        attempt_update = getattr(self, "_attempt_update", None)
+        return {
+            "project_id": self.project_details.id if self.project_details else None,
+            "state": self.reported_state,
+            "no_op": self.no_op,
+            "accepted_packages": sorted(getattr(attempt_update, "accepted_packages", None) or []),
+            "rejected_packages": sorted(getattr(attempt_update, "rejected_packages", None) or [])
+        }
+
     def fail(self) -> None:
         """Signify that processing of given request has failed."""
         self.log.info("Changing state to {state}.".format(state=States.FAILURE.value))
         self.trigger(Triggers.TO_FAIL.value)
-        self.update_celery_state(States.FAILURE.value)
-
-    def initialize(self, project_to_process: Project) -> None:
+        if getattr(self, "_detect_changes", None):
+            self._detect_changes.forget()
+        if getattr(self, "_checkpoints", None):
+            self._checkpoints.forget()
+        self._report_state(state=States.FAILURE.value)
+
+    def initialize(self, project_to_process: Project,
+                   packages_metadata: Dict[str, Optional[PackageMetadata]] = None) -> None:
         """Initialize variables needed for further request processing."""
         self.log.info("Changing state to {state}.".format(state=States.INITIALIZING.value))
-        self.update_celery_state(States.INITIALIZING.value)
+        self._report_state(state=States.INITIALIZING.value)
         self.project_details = project_to_process
+        self._packages_metadata = packages_metadata
 
         self._save_packages_with_locked_versions()
 
+        self._checkpoints = Checkpoints(
+            logger=self.log, project_details=self.project_details
+        )
+        self._create_operations()
+
+    def resume(self) -> int:
+        """Restore progress of processing the project from its checkpoint, return number of completed steps.
+
+        Nothing is restored (and zero is returned) when there is no valid checkpoint.
+        """
+        requested_project = self.project_details
+        try:
+            checkpoint = self._checkpoints.load()
+            if not checkpoint:
+                return 0
+
+            self.log.info("Resuming processing of the project after {state} state.".format(state=checkpoint.state))
+            self.project_details = Project.from_dict(dictionary=checkpoint.project_details)
+            self._create_operations()
+
+            progress = checkpoint.progress
+            self._detect_changes.files_digests = progress["files_digests"]
+            self._check_update.outdated_packages = [
+                PackageUpdateSuggestion(name=name, new_version=new_version)
+                for name, new_version in progress["outdated_packages"].items()
+            ]
+            self.should_attempt_update = progress["should_attempt_update"]
+            self.update_successful = progress["update_successful"]
+            self._attempt_update.accepted_packages = progress["accepted_packages"]
+            self._attempt_update.rejected_packages = progress["rejected_packages"]
+        except Exception:  # pylint: disable=broad-except
+            self.log.exception("Unable to resume from checkpoint, processing project from the beginning.")
+            self._checkpoints.forget()
+            self.project_details = requested_project
+            self._create_operations()
+            self.should_attempt_update = self.update_successful = False
+            return 0
+
+        self.state_machine.set_state(checkpoint.state)
+        self._report_state(state=checkpoint.state)
+        return checkpoint.steps_completed
+
+    def _create_operations(self) -> None:
+        """Create operations worker performs on current project details (with requirements indexed once)."""
+        packages_metadata = self._packages_metadata
+        requirements_index = RequirementsIndex(project_details=self.project_details)
         self._attempt_update = AttemptUpdate(
             logger=self.log, project_details=self.project_details
         )
         self._check_update = CheckUpdates(
-            logger=self.log, project_details=self.project_details
+            logger=self.log, project_details=self.project_details, packages_metadata=packages_metadata,
+            requirements_index=requirements_index
         )
         self._clone = Clone(
             logger=self.log, project_details=self.project_details
@@ -100,6 +205,9 @@ class Worker:
         self._commit_changes = CommitChanges(
             logger=self.log, project_details=self.project_details
         )
+        self._detect_changes = DetectChanges(
+            logger=self.log, project_details=self.project_details, packages_metadata=packages_metadata
+        )
         self._git_push = GitPush(
             logger=self.log, project_details=self.project_details
         )
@@ -107,7 +215,7 @@ class Worker:
             logger=self.log, project_details=self.project_details
         )
         self._parse = Parse(
-            logger=self.log, project_details=self.project_details
+            logger=self.log, project_details=self.project_details, requirements_index=requirements_index
         )
         self._pull_request = PullRequest(
             logger=self.log, project_details=self.project_details
@@ -116,25 +224,45 @@ class Worker:
             logger=self.log, project_details=self.project_details
         )
 
+    def is_unchanged(self) -> bool:
+        """Check if project has not changed since it was last processed (so that it may be skipped)."""
+        try:
+            self.no_op = self._detect_changes()
+        except Exception:  # pylint: disable=broad-except
+            self.log.exception("Unable to tell if project has changed, processing it as usual.")
+            self.no_op = False
+        self.reported_state = States.INITIALIZING.value
+
+        if self.no_op:
+            self.log.info("Project has not changed since it was last processed, skipping it.")
+
+        return self.no_op
+
     def clone(self) -> None:
         """Clone repository containing given project."""
         self.log.info("Changing state to {state}.".format(state=States.CLONING_REPOSITORY.value))
         self.trigger(Triggers.TO_CLONE.value)
-        self.update_celery_state(States.CLONING_REPOSITORY.value)
-        self._clone()
+        self._report_state(state=States.CLONING_REPOSITORY.value)
+        if self._cloned:
+            self.log.debug("Repository was cloned beforehand.")
+        else:
+            self._clone()
+        self._detect_changes.snapshot_files()
 
     def parse_requirements(self) -> None:
         """Parse and load requirements that are needed by given project."""
         self.log.info("Changing state to {state}.".format(state=States.PARSING_REQUIREMENTS.value))
         self.trigger(Triggers.TO_PARSE_REQ.value)
-        self.update_celery_state(States.PARSING_REQUIREMENTS.value)
+        self._report_state(state=States.PARSING_REQUIREMENTS.value)
         self._parse()
 
     def check_updates(self) -> None:
         """Check if any of given required packages may be updated."""
         self.log.info("Changing state to {state}.".format(state=States.CHECKING_FOR_UPDATES.value))
         self.trigger(Triggers.TO_CHECK_UPDATES.value)
-        self.update_celery_state(States.CHECKING_FOR_UPDATES.value)
+        self._report_state(state=States.CHECKING_FOR_UPDATES.value)
+        if self._check_update.requires_full_checkout:
+            self._clone.widen()
         self._check_update()
         self.should_attempt_update = bool(self._check_update.outdated_packages)
 
@@ -142,34 +270,48 @@ class Worker:
         """Send update of given project information (with possible new requirements versions)."""
         self.log.info("Changing state to {state}.".format(state=States.UPDATING_METADATA.value))
         self.trigger(Triggers.TO_UPDATE_META.value)
-        self.update_celery_state(States.UPDATING_METADATA.value)
+        self._report_state(state=States.UPDATING_METADATA.value)
 
         if not self._dry_runs_only:
             self.log.warning("Worker running in dry-runs only mode. Skipping updating metadata.")
             return
 
-        self._update()
+        if not self._executor:
+            self._update()
+            return
+
+        # Payloads are taken now, update is sent once the previous one of the project was
+        previous_update = self._metadata_updates[-1] if self._metadata_updates else None
+        self._metadata_updates.append(self._executor.submit(
+            self._send_metadata_update, previous_update, self._update.get_payloads()
+        ))
 
     def attempt_update(self) -> None:
         """Check if update of given packages will break project."""
         self.log.info("Changing state to {state}.".format(state=States.ATTEMPTING_UPDATE.value))
         self.trigger(Triggers.TO_UPDATE_PGS.value)
-        self.update_celery_state(States.ATTEMPTING_UPDATE.value)
+        self._report_state(state=States.ATTEMPTING_UPDATE.value)
 
         try:
+            self._clone.widen()
             self._attempt_update()
         except Exception:
             self.update_successful = False
             self.log.exception("Attempt to update requirements has failed.")
             self._rollback_requirements_desired_versions()
         else:
-            self.update_successful = True
+            self.update_successful = bool(self._attempt_update.accepted_packages)
+            if self._attempt_update.rejected_packages:
+                self.log.info("Updates of {packages!r} were rejected.".format(
+                    packages=self._attempt_update.rejected_packages
+                ))
+                self._rollback_requirements_desired_versions(packages=self._attempt_update.rejected_packages)
 
     def commit_changes(self) -> None:
         """Commit changes to given project."""
         self.log.info("Changing state to {state}.".format(state=States.COMMITTING_CHANGES.value))
         self.trigger(Triggers.TO_COMMIT.value)
-        self.update_celery_state(States.COMMITTING_CHANGES.value)
+        self._report_state(state=States.COMMITTING_CHANGES.value)
         if not self.update_successful:
             self.log.info("Requirements update was not successful, will not commit changes.")
             return
@@ -184,7 +326,7 @@ class Worker:
         """Send changes to original repository as push / gerrit patch / github pull request."""
         self.log.info("Changing state to {state}.".format(state=States.PUSHING_CHANGES.value))
         self.trigger(Triggers.TO_PUSH_CHANGES.value)
-        self.update_celery_state(States.PUSHING_CHANGES.value)
+        self._report_state(state=States.PUSHING_CHANGES.value)
 
         if not self._dry_runs_only:
             self.log.warning("Worker running in dry-runs only mode. Skipping pushing changes.")
@@ -213,11 +355,67 @@ class Worker:
         """Signify that processing of given request has succeeded."""
         self.log.info("Changing state to {state}.".format(state=States.SUCCESS.value))
         self.trigger(Triggers.TO_SUCCESS.value)
-        self.update_celery_state(States.SUCCESS.value)
+        if not self.no_op:
+            self._record_project_state()
+        self._checkpoints.forget()
+        self._report_state(state=States.SUCCESS.value)
 
     def trigger(self, transition_trigger: str) -> None:
         """This will be overridden by transitions.Machine"""
 
+    def _record_project_state(self) -> None:
+        """Remember state of successfully processed project, so that it is skipped until anything changes."""
+        try:
+            self._detect_changes.record()
+        except Exception:  # pylint: disable=broad-except
+            self.log.exception("Unable to record state of the project.")
+
+    def _send_metadata_update(self, previous_update: Optional[Future], payloads: List[Dict[str, Any]]) -> None:
+        """Send given update of project information, after previous one was sent (so that they are not reordered)."""
+        if previous_update:
+            previous_update.result()
+        self._update.send(payloads=payloads)
+
+    def _metadata_updates_sent(self) -> bool:
+        """Indicate if all updates of project information were already sent (raise if any of them failed)."""
+        for metadata_update in self._metadata_updates:
+            if not metadata_update.done():
+                return False
+            metadata_update.result()
+
+        return True
+
+    def _wait_for_metadata_updates(self) -> None:
+        """Wait until all updates of project information are sent (raise if any of them failed)."""
+        for metadata_update in self._metadata_updates:
+            metadata_update.result()
+
+    def _save_checkpoint(self, steps_completed: int) -> None:
+        """Save progress made by given number of completed steps (failure to do so only prevents resuming)."""
+        try:
+            self._checkpoints.save(
+                steps_completed=steps_completed,
+                state=self.reported_state,
+                project_details=self.project_details,
+                progress={
+                    "files_digests": self._detect_changes.files_digests,
+                    "outdated_packages": {
+                        package.name: package.new_version for package in self._check_update.outdated_packages
+                    },
+                    "should_attempt_update": self.should_attempt_update,
+                    "update_successful": self.update_successful,
+                    "accepted_packages": self._attempt_update.accepted_packages,
+                    "rejected_packages": self._attempt_update.rejected_packages
+                }
+            )
+        except Exception:  # pylint: disable=broad-except
+            self.log.exception("Unable to save checkpoint.")
+
+    def _report_state(self, state: str) -> None:
+        """Let celery know about current state of request processing."""
+        self.reported_state = state
+        self.update_celery_state(state=state, meta=self.summary)
+
     def _save_packages_with_locked_versions(self) -> None:
         """Save ids of requirements which had pinned versions before processing.
 
@@ -232,8 +430,11 @@ class Worker:
             if requirement.desired_version  # type: ignore
         )
 
-    def _rollback_requirements_desired_versions(self):
-        """Reset requirements 'desired_versions' if they were not set before this update run."""
+    def _rollback_requirements_desired_versions(self, packages: Collection[str] = None):
+        """Reset requirements 'desired_versions' if they were not set before this update run.
+
+        Only requirements of given packages are reset, if their (normalized) names are provided.
+        """
         for requirements_file in self.project_details.requirements_files:
             self.log.info("Rolling back requirements of '{file}'".format(
                 file=requirements_file.path
@@ -242,6 +443,9 @@ class Worker:
                 if requirement.id in self._locked_packages_ids:
                     continue
 
+                if packages is not None and normalize_package_name(requirement.name) not in packages:
+                    continue
+
                 requirement.desired_version = ""
 
     @property
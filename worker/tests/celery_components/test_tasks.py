@@ -0,0 +1,111 @@
+"""This module contains unit tests for celery tasks of the worker."""
+from pipwatch_worker.celery_components import tasks
+from pipwatch_worker.index.metadata import PackageMetadata
+
+from tests.utils import get_processing_request
+
+
+def test_failed_lookups_are_not_sent_as_unknown_packages(mocker) -> None:
+    """Packages whose lookup failed up front should be left for project tasks to resolve again."""
+    bulk_index = mocker.patch.object(tasks.BulkPackageIndex, "from_config").return_value
+    bulk_index.get_metadata.return_value = {
+        "django": PackageMetadata(name="django", latest_version="2.0", releases=["1.11", "2.0"]),
+        "unknown-package": None
+    }
+    chord_mock = mocker.patch.object(tasks, "chord")
+
+    tasks.process_namespace(namespace_id=1, processing_requests=[
+        get_processing_request(1, "Django", "unknown_package", "requests")
+    ])
+
+    (signature,), _ = chord_mock.call_args
+    packages_metadata = signature[0].kwargs["packages_metadata"]
+    assert packages_metadata == {
+        "django": {"name": "django", "latest_version": "2.0", "releases": ["1.11", "2.0"]},
+        "unknown-package": None
+    }
+    assert tasks.deserialize_packages_metadata(packages_metadata=packages_metadata)["unknown-package"] is None
+
+
+def test_projects_in_the_same_queue_are_batched() -> None:
+    """Projects sent to the same queue should be processed by batch tasks of given size."""
+    signatures = tasks.get_projects_tasks(
+        processing_requests=[get_processing_request(project_id, "django") for project_id in range(3)],
+        tasks_ids=["task-{}".format(project_id) for project_id in range(3)],
+        queues=["shard-1", "shard-2", "shard-1"],
+        packages_metadata={},
+        priority_class="scheduled",
+        batch_size=2
+    )
+
+    assert sorted(signature.kwargs["tasks_ids"] for signature in signatures) == [["task-0", "task-2"], ["task-1"]]
+    assert all(signature.kwargs["packages_metadata"] == {} for signature in signatures)
+
+
+def test_deferred_projects_are_reported_in_batch_summary(mocker) -> None:
+    """Projects handed over to separate tasks should be accounted for in namespace summary."""
+    mocker.patch.object(tasks.ConcurrencySlots, "from_config")
+    pipeline = mocker.patch.object(tasks.ProjectPipeline, "from_config").return_value
+    pipeline.return_value = [{"project_id": 1, "state": tasks.States.SUCCESS.value, "no_op": True}]
+    pipeline.deferred = [tasks.PipelineItem(task_id="task-2", project=mocker.Mock(id=2))]
+    apply_async = mocker.patch.object(tasks.process_project, "apply_async")
+
+    summaries = tasks.process_projects(
+        processing_requests=[get_processing_request(1, "django"), get_processing_request(2, "django")],
+        tasks_ids=["task-1", "task-2"]
+    )
+    summary = tasks.summarize_namespace(projects_summaries=[summaries], namespace_id=1)
+
+    assert apply_async.call_args[1]["task_id"] == "task-2"
+    assert [project["state"] for project in summary["projects"]] == [tasks.States.SUCCESS.value, tasks.DEFERRED_STATE]
+    assert summary["deferred_count"] == 1
+    assert summary["no_op_count"] == 1
+
+
+def test_task_waiting_for_slot_gives_up_after_max_wait(mocker) -> None:
+    """Task should not be retried forever when there is never a slot available for it."""
+    slots = mocker.patch.object(tasks.ConcurrencySlots, "from_config").return_value
+    slots.acquire.side_effect = tasks.NoSlotAvailable("No slot available.")
+    slots.max_wait = 3 * tasks.NO_SLOT_RETRY_COUNTDOWN
+    mocker.patch.object(tasks.ProjectLock, "from_config")
+
+    result = tasks.process_project.apply(kwargs={"processing_request": get_processing_request(1, "django")})
+
+    assert result.successful()
+    assert result.result["state"] == tasks.States.FAILURE.value
+    assert slots.acquire.call_count == 4
+
+
+def test_task_waiting_for_project_lock_gives_up_after_max_wait(mocker) -> None:
+    """Task should not be retried forever when its project stays locked by another worker."""
+    mocker.patch.object(tasks.ConcurrencySlots, "from_config")
+    lock = mocker.patch.object(tasks.ProjectLock, "from_config").return_value
+    lock.__enter__ = mocker.Mock(side_effect=tasks.ProjectLocked("Project is locked."))
+    lock.ttl = 60
+    lock.max_wait = 90
+
+    result = tasks.process_project.apply(kwargs={"processing_request": get_processing_request(1, "django")})
+
+    assert result.successful()
+    assert result.result == tasks.get_gave_up_summary(project_id=1, exception=tasks.ProjectLocked("Project is locked."))
+    assert lock.__enter__.call_count == 3
+
+
+def test_projects_of_batch_task_which_gave_up_are_reported_as_failed(mocker) -> None:
+    """Batch task which gave up waiting for slot should not prevent namespace summary from being gathered."""
+    slots = mocker.patch.object(tasks.ConcurrencySlots, "from_config").return_value
+    slots.acquire.side_effect = tasks.NoSlotAvailable("No slot available.")
+    slots.max_wait = tasks.NO_SLOT_RETRY_COUNTDOWN
+    mocker.patch.object(tasks.ProjectPipeline, "from_config")
+    update_state = mocker.patch.object(tasks.process_projects, "update_state")
+
+    result = tasks.process_projects.apply(kwargs={
+        "processing_requests": [get_processing_request(1, "django"), get_processing_request(2, "django")],
+        "tasks_ids": ["task-1", "task-2"]
+    })
+    summary = tasks.summarize_namespace(projects_summaries=[result.result], namespace_id=1)
+
+    assert result.successful()
+    assert [project["task_id"] for project in summary["projects"]] == ["task-1", "task-2"]
+    assert [call[1]["task_id"] for call in update_state.call_args_list] == ["task-1", "task-2"]
+    assert summary["failed_count"] == 2
@@ -0,0 +1,22 @@
+"""This module contains various helpers used in testing."""
+from typing import Any, Dict
+
+
+def get_processing_request(project_id: int, *requirements: str, path: str = "requirements.txt") -> Dict[str, Any]:
+    """Return processing request of project with single requirements file, requiring given packages."""
+    return {
+        "id": project_id,
+        "namespace_id": 1,
+        "name": "project-{}".format(project_id),
+        "git_repository": {"id": project_id, "flavour": "github", "url": "https://example.com/project.git"},
+        "check_command": "tox",
+        "requirements_files": [{
+            "id": project_id,
+            "path": path,
+            "status": "",
+            "requirements": [
+                {"id": index, "name": name, "current_version": None, "desired_version": None}
+                for index, name in enumerate(requirements)
+            ]
+        }]
+    }
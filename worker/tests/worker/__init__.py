@@ -0,0 +1 @@
+"""This package contains tests for pipwatch_worker.worker."""
@@ -0,0 +1,126 @@
+"""This module contains unit tests for saving progress of processing project and resuming from it."""
+import pytest
+
+from pipwatch_worker.core.data_models import Project
+from pipwatch_worker.worker.checkpoints import CheckpointStore
+from pipwatch_worker.worker.operations.checkpointing import Checkpoints
+from pipwatch_worker.worker.states import States
+from pipwatch_worker.worker.worker import Worker
+
+from tests.utils import get_processing_request
+
+
+PROGRESS = {
+    "files_digests": {"requirements.txt": "digest"},
+    "outdated_packages": {"django": "2.0"},
+    "should_attempt_update": True,
+    "update_successful": False,
+    "accepted_packages": [],
+    "rejected_packages": []
+}
+
+
+def get_checkpoints(mocker, tmpdir, project: Project) -> Checkpoints:
+    """Return operation instance for given project, with stubbed worktree and virtualenv."""
+    operation = Checkpoints(logger=mocker.Mock(), project_details=project)
+    operation.repositories_cache_path = str(tmpdir)
+    tmpdir.join(operation.repositories_cache_dir_name, str(project.id)).ensure(dir=True)
+    operation.git = mocker.Mock()
+    operation.git.return_value = b"commit-1\n"
+    operation.git.get_tree_hash.return_value = "tree-1"
+    operation.from_venv = mocker.Mock()
+    operation.from_venv.fingerprint = "venv-1"
+    operation.store = CheckpointStore(database_path=str(tmpdir.join("checkpoints.sqlite")))
+    return operation
+
+
+def save(checkpoints: Checkpoints, project: Project) -> None:
+    """Save checkpoint after checking updates of given project."""
+    checkpoints.save(steps_completed=3, state=States.CHECKING_FOR_UPDATES.value, project_details=project,
+                     progress=PROGRESS)
+
+
+@pytest.fixture()
+def project() -> Project:
+    """Test project requiring django."""
+    return Project.from_dict(get_processing_request(1, "Django"))
+
+
+def test_checkpoint_is_loaded_for_unchanged_request_and_worktree(mocker, tmpdir, project) -> None:
+    """Checkpoint should be used as long as neither request nor worktree changed."""
+    save(get_checkpoints(mocker, tmpdir, project), project)
+
+    checkpoint = get_checkpoints(mocker, tmpdir, project).load()
+
+    assert checkpoint.steps_completed == 3
+    assert checkpoint.progress == PROGRESS
+    assert Project.from_dict(checkpoint.project_details).to_dict() == project.to_dict()
+
+
+def test_checkpoint_is_forgotten_when_request_changes(mocker, tmpdir, project) -> None:
+    """Checkpoint saved for different request should neither be used nor kept."""
+    save(get_checkpoints(mocker, tmpdir, project), project)
+    changed_request = get_processing_request(1, "Django")
+    changed_request["check_command"] = "pytest"
+
+    checkpoints = get_checkpoints(mocker, tmpdir, Project.from_dict(changed_request))
+
+    assert checkpoints.load() is None
+    assert checkpoints.store.get(project_id=project.id) is None
+
+
+@pytest.mark.parametrize("attribute, value", [
+    ("commit", b"commit-2\n"),
+    ("tree", "tree-2"),
+    ("environment", "venv-2")
+])
+def test_checkpoint_is_forgotten_when_worktree_changes(mocker, tmpdir, project, attribute, value) -> None:
+    """Checkpoint saved for different commit, uncommitted changes or virtualenv should neither be used nor kept."""
+    save(get_checkpoints(mocker, tmpdir, project), project)
+    checkpoints = get_checkpoints(mocker, tmpdir, project)
+    if attribute == "commit":
+        checkpoints.git.return_value = value
+    elif attribute == "tree":
+        checkpoints.git.get_tree_hash.return_value = value
+    else:
+        checkpoints.from_venv.fingerprint = value
+
+    assert checkpoints.load() is None
+    assert checkpoints.store.get(project_id=project.id) is None
+
+
+def test_checkpoint_is_not_saved_without_worktree(mocker, tmpdir, project) -> None:
+    """Progress made before project was cloned cannot be resumed from."""
+    checkpoints = get_checkpoints(mocker, tmpdir, project)
+    checkpoints.repositories_cache_path = str(tmpdir.join("missing"))
+
+    save(checkpoints, project)
+
+    assert checkpoints.store.get(project_id=project.id) is None
+
+
+def test_worker_resumes_from_checkpoint(mocker, tmpdir, project) -> None:
+    """Worker should restore progress and state of the checkpoint, and start from the step following it."""
+    save(get_checkpoints(mocker, tmpdir, project), project)
+    worker = Worker(update_celery_state_method=mocker.Mock())
+    worker.project_details = project
+    worker._checkpoints = get_checkpoints(mocker, tmpdir, project)  # pylint: disable=protected-access
+
+    assert worker.resume() == 3
+    assert worker.state == States.CHECKING_FOR_UPDATES.value
+    assert worker.should_attempt_update
+    outdated_packages = worker._check_update.outdated_packages  # pylint: disable=protected-access
+    assert [(package.name, package.new_version) for package in outdated_packages] == [("django", "2.0")]
+
+
+def test_worker_starts_from_the_beginning_without_valid_checkpoint(mocker, tmpdir, project) -> None:
+    """Worker should not restore anything from checkpoint which became invalid."""
+    save(get_checkpoints(mocker, tmpdir, project), project)
+    worker = Worker(update_celery_state_method=mocker.Mock())
+    worker.project_details = project
+    worker._checkpoints = get_checkpoints(mocker, tmpdir, project)  # pylint: disable=protected-access
+    worker._checkpoints.git.get_tree_hash.return_value = "tree-2"  # pylint: disable=protected-access
+
+    assert worker.resume() == 0
+    assert worker.state == States.INITIALIZING.value
+    assert not worker.should_attempt_update
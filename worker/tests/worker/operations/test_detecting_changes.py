@@ -0,0 +1,143 @@
+"""This module contains unit tests for detecting if project changed since it was last processed."""
+from typing import Dict, Iterable, Optional
+
+import pytest
+
+from pipwatch_worker.core.data_models import Project
+from pipwatch_worker.core.utils import normalize_package_name
+from pipwatch_worker.index.metadata import PackageMetadata
+from pipwatch_worker.worker.operations.detecting_changes import DetectChanges, get_content_digest, get_request_digest
+from pipwatch_worker.worker.project_state import ProjectStateStore
+
+from tests.utils import get_processing_request
+
+
+class StubPackageIndex:
+    """Package index reporting latest versions of packages from a dictionary (keyed by normalized names)."""
+
+    def __init__(self, latest_versions: Dict[str, str]) -> None:
+        """Create index instance."""
+        self.latest_versions = latest_versions
+
+    def get_metadata(self, package_names: Iterable[str]) -> Dict[str, Optional[PackageMetadata]]:
+        """Return metadata of given packages (None for packages index does not know)."""
+        names = {normalize_package_name(name) for name in package_names}
+        return {
+            name: PackageMetadata(name=name, latest_version=self.latest_versions[name], releases=[])
+            if name in self.latest_versions else None for name in names
+        }
+
+
+def get_project(*requirements: str, check_command: str = "tox") -> Project:
+    """Return project with single requirements file, requiring given packages."""
+    processing_request = get_processing_request(1, *requirements)
+    processing_request["check_command"] = check_command
+    return Project.from_dict(dictionary=processing_request)
+
+
+@pytest.fixture()
+def detect_changes(mocker, tmpdir) -> DetectChanges:
+    """Return operation instance for project requiring django, with stubbed repository and package index."""
+    operation = DetectChanges(logger=mocker.Mock(), project_details=get_project("Django"))
+    operation.git = mocker.Mock()
+    operation.git.mirror_head = "commit-1"
+    operation.git.get_remote_head.return_value = "commit-1"
+    operation.package_index = StubPackageIndex(latest_versions={"django": "2.0"})  # type: ignore
+    operation.states = ProjectStateStore(database_path=str(tmpdir.join("project-state.sqlite")))
+    operation.files_digests = {"requirements.txt": get_content_digest(content=b"django==1.11")}
+    return operation
+
+
+def test_request_digest_ignores_order_and_spelling_of_requirements() -> None:
+    """Requests which differ only in order and spelling of package names should have the same digest."""
+    assert get_request_digest(get_project("Foo_Bar", "django")) == get_request_digest(get_project("Django", "foo-bar"))
+
+
+def test_request_digest_depends_on_check_command_and_desired_versions() -> None:
+    """Changes of request influencing outcome of processing should change its digest."""
+    project = get_project("django")
+    digest = get_request_digest(project_details=project)
+
+    assert get_request_digest(get_project("django", check_command="pytest")) != digest
+    assert get_request_digest(get_project("django", "requests")) != digest
+
+    project.requirements_files[0].requirements[0].current_version = "1.11"
+    assert get_request_digest(project_details=project) == digest
+
+    project.requirements_files[0].requirements[0].desired_version = "2.0"
+    assert get_request_digest(project_details=project) != digest
+
+
+def test_project_without_recorded_state_has_changed(detect_changes) -> None:
+    """Project which was never processed successfully should be processed."""
+    assert not detect_changes()
+
+
+def test_project_is_unchanged_after_it_was_recorded(detect_changes) -> None:
+    """Project whose repository, request and packages are the same should be skipped."""
+    detect_changes.record()
+
+    assert detect_changes()
+    detect_changes.git.fetch_mirror.assert_not_called()
+
+
+def test_project_with_new_release_of_required_package_has_changed(detect_changes) -> None:
+    """New release of required package should cause project to be processed."""
+    detect_changes.record()
+    detect_changes.package_index.latest_versions["django"] = "2.1"
+
+    assert not detect_changes()
+
+
+def test_project_with_changed_request_has_changed(detect_changes) -> None:
+    """Changed check command should cause project to be processed."""
+    detect_changes.record()
+    detect_changes.project_details.check_command = "pytest"
+
+    assert not detect_changes()
+
+
+def test_project_with_unchanged_requirements_files_is_unchanged(detect_changes) -> None:
+    """New commit which does not touch requirements files should not cause project to be processed."""
+    detect_changes.record()
+    detect_changes.git.get_remote_head.return_value = "commit-2"
+    detect_changes.git.read_file.return_value = b"django==1.11"
+
+    assert detect_changes()
+    assert detect_changes.states.get(project_id=1).commit == "commit-2"
+
+
+def test_project_with_changed_requirements_files_has_changed(detect_changes) -> None:
+    """New commit which changes requirements files should cause project to be processed."""
+    detect_changes.record()
+    detect_changes.git.get_remote_head.return_value = "commit-2"
+    detect_changes.git.read_file.return_value = b"django==2.0"
+
+    assert not detect_changes()
+
+
+def test_forgotten_project_has_changed(detect_changes) -> None:
+    """Project whose state was forgotten (e.g. after failure) should be processed again."""
+    detect_changes.record()
+    detect_changes.forget()
+
+    assert not detect_changes()
+
+
+def test_project_with_failed_package_lookup_has_changed(detect_changes) -> None:
+    """Package whose latest version could not be retrieved should not be taken for unchanged."""
+    detect_changes.record()
+    detect_changes.package_index.get_metadata = lambda package_names: {}
+
+    assert not detect_changes()
+
+
+def test_state_is_not_recorded_when_package_lookups_are_incomplete(detect_changes) -> None:
+    """Project whose packages were not all looked up should be fully processed next time."""
+    detect_changes.record()
+    detect_changes.project_details = get_project("Django", "requests")
+    detect_changes.package_index.get_metadata = lambda package_names: {"django": None}
+
+    detect_changes.record()
+
+    assert detect_changes.states.get(project_id=1) is None
@@ -0,0 +1,22 @@
+"""This module contains unit tests for attributing outcome of requirements installation to requirements files."""
+from pipwatch_worker.core.data_models import Project
+from pipwatch_worker.core.utils import InstallationStatus, UpdateStatus
+from pipwatch_worker.worker.operations.installation import record_installed_versions
+
+from tests.utils import get_processing_request
+
+
+def test_installation_statuses_are_kept_apart_from_update_statuses() -> None:
+    """Recording installed versions should not overwrite update statuses of requirements and files."""
+    project = Project.from_dict(get_processing_request(1, "Django", "requests"))
+    django, requests = project.requirements_files[0].requirements
+    django.current_version, django.status = "==1.11", UpdateStatus.REJECTED.value
+    requests.current_version = "<2.18"
+
+    record_installed_versions(project_details=project, installed_versions={"django": "1.11", "requests": "2.18"})
+
+    assert (django.installed_version, django.installation_status) == ("1.11", InstallationStatus.INSTALLED.value)
+    assert requests.installation_status == InstallationStatus.CONFLICTING.value
+    assert django.status == UpdateStatus.REJECTED.value
+    assert project.requirements_files[0].installation_status == InstallationStatus.CONFLICTING.value
+    assert project.requirements_files[0].status == ""
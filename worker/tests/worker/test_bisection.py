@@ -0,0 +1,109 @@
+"""This module contains unit tests for group testing of updates."""
+from typing import Collection, List
+
+from pipwatch_worker.worker.bisection import GroupTesting
+
+
+class BrokenBy:
+    """Test failing whenever any of given culprits is among tested candidates, recording each tested set."""
+
+    def __init__(self, culprits: Collection[str]) -> None:
+        """Create test instance."""
+        self.culprits = set(culprits)
+        self.tested: List[List[str]] = []
+
+    def __call__(self, candidates: List[str]) -> bool:
+        """Return True if candidates do not include any of the culprits."""
+        self.tested.append(list(candidates))
+        return not self.culprits.intersection(candidates)
+
+
+CANDIDATES = ["package-{}".format(number) for number in range(8)]
+
+
+def test_all_candidates_are_accepted_with_single_test() -> None:
+    """Candidates which pass the test together should be accepted at once."""
+    test = BrokenBy(culprits=[])
+    group_testing = GroupTesting(test=test)
+
+    group_testing(candidates=CANDIDATES)
+
+    assert group_testing.accepted == CANDIDATES
+    assert group_testing.rejected == []
+    assert group_testing.untested == []
+    assert test.tested == [CANDIDATES]
+
+
+def test_culprits_are_isolated_and_the_rest_is_accepted() -> None:
+    """Only candidates breaking the test should be rejected."""
+    test = BrokenBy(culprits=["package-2", "package-5"])
+    group_testing = GroupTesting(test=test)
+
+    group_testing(candidates=CANDIDATES)
+
+    assert group_testing.rejected == ["package-2", "package-5"]
+    assert sorted(group_testing.accepted) == sorted(set(CANDIDATES) - {"package-2", "package-5"})
+    assert group_testing.untested == []
+    assert group_testing.tests_count == len(test.tested)
+    assert not test.culprits.intersection(group_testing.accepted)
+
+
+def test_single_culprit_is_found_in_logarithmic_number_of_tests() -> None:
+    """Second half of failing group should not be tested when first half passes."""
+    test = BrokenBy(culprits=["package-7"])
+    group_testing = GroupTesting(test=test)
+
+    group_testing(candidates=CANDIDATES)
+
+    assert group_testing.rejected == ["package-7"]
+    # Whole set, then first halves of 8, 4 and 2 candidates - the last one is known to fail
+    assert group_testing.tests_count == 4
+
+
+def test_known_failure_is_not_tested_again() -> None:
+    """Candidates known to fail together should be split right away."""
+    test = BrokenBy(culprits=["package-0"])
+    group_testing = GroupTesting(test=test)
+
+    group_testing(candidates=CANDIDATES, known_to_fail=True)
+
+    assert CANDIDATES not in test.tested
+    assert group_testing.rejected == ["package-0"]
+
+
+def test_already_accepted_candidates_are_tested_along_with_each_group() -> None:
+    """Candidates accepted beforehand should be kept and included in every test."""
+    test = BrokenBy(culprits=["package-3"])
+    group_testing = GroupTesting(test=test)
+
+    group_testing(candidates=CANDIDATES[1:], accepted=CANDIDATES[:1])
+
+    assert group_testing.accepted[0] == "package-0"
+    assert all(candidates[0] == "package-0" for candidates in test.tested)
+    assert group_testing.rejected == ["package-3"]
+
+
+def test_groups_left_after_reaching_tests_limit_are_untested() -> None:
+    """Candidates which were not tested within the limit should be neither accepted nor rejected."""
+    test = BrokenBy(culprits=["package-1", "package-6"])
+    group_testing = GroupTesting(test=test, max_tests=3)
+
+    group_testing(candidates=CANDIDATES)
+
+    assert group_testing.tests_count == 3
+    assert len(test.tested) == 3
+    assert not set(group_testing.accepted) & set(group_testing.untested)
+    assert sorted(group_testing.accepted + group_testing.rejected + group_testing.untested) == sorted(CANDIDATES)
+    assert "package-6" in group_testing.untested
+
+
+def test_instance_is_reset_between_runs() -> None:
+    """Outcome of previous run should not leak into the next one."""
+    group_testing = GroupTesting(test=BrokenBy(culprits=["package-0"]))
+    group_testing(candidates=CANDIDATES)
+
+    group_testing(candidates=[])
+
+    assert group_testing.accepted == []
+    assert group_testing.rejected == []
+    assert group_testing.tests_count == 0
@@ -0,0 +1,73 @@
+"""This module contains unit tests for eviction of entries from repositories cache."""
+import os
+
+import pytest
+
+from pipwatch_worker.worker.cache_manager import CacheManager
+
+
+def add_virtualenv(cache_manager: CacheManager, name: str, size: int) -> str:
+    """Add complete virtualenv of given size (as measured when it was built) to the cache."""
+    path = cache_manager.virtualenvs.get_path(name)
+    os.makedirs(path)
+    with open(os.path.join(path, cache_manager.virtualenvs.SIZE_MARKER), "w", encoding="utf-8") as file:
+        file.write(str(size))
+    with open(os.path.join(path, cache_manager.virtualenvs.COMPLETE_MARKER), "w", encoding="utf-8") as file:
+        file.write("")
+
+    return path
+
+
+def add_project(cache_manager: CacheManager, project_id: int, virtualenv_path: str) -> str:
+    """Add worktree of given project, with given virtualenv linked into it, to the cache."""
+    path = os.path.join(cache_manager.cache_path, str(project_id))
+    os.makedirs(path)
+    os.symlink(virtualenv_path, os.path.join(path, "venv"))
+    return path
+
+
+@pytest.fixture()
+def cache_manager(tmpdir) -> CacheManager:
+    """Return manager of empty cache, whose virtualenvs may take 1000 bytes."""
+    cache_path = str(tmpdir.join("cache"))
+    manager = CacheManager(cache_path=cache_path, database_path=os.path.join(cache_path, ".cache.sqlite"), min_idle=0)
+    manager.virtualenvs.disk_budget = 1000
+    return manager
+
+
+def test_virtualenvs_are_evicted_least_recently_used_first(cache_manager) -> None:
+    """Virtualenvs exceeding their budget should be evicted, starting from the one unused the longest."""
+    old_path = add_virtualenv(cache_manager, name="old", size=600)
+    new_path = add_virtualenv(cache_manager, name="new", size=600)
+    cache_manager.record_access(path=old_path, kind=CacheManager.KIND_VIRTUALENV, hit=True)
+    cache_manager.record_access(path=new_path, kind=CacheManager.KIND_VIRTUALENV, hit=True)
+
+    usage = cache_manager.evict()
+
+    assert not os.path.exists(old_path)
+    assert os.path.exists(new_path)
+    assert usage.evictions == 1
+    assert usage.evicted_bytes == 600
+
+
+def test_virtualenv_of_pinned_project_is_not_evicted(cache_manager) -> None:
+    """Virtualenv linked into worktree of project being processed should be kept, even if it is unused the longest."""
+    used_path = add_virtualenv(cache_manager, name="used", size=600)
+    other_path = add_virtualenv(cache_manager, name="other", size=600)
+    cache_manager.record_access(path=used_path, kind=CacheManager.KIND_VIRTUALENV, hit=True)
+    cache_manager.record_access(path=other_path, kind=CacheManager.KIND_VIRTUALENV, hit=True)
+    project_path = add_project(cache_manager, project_id=1, virtualenv_path=used_path)
+
+    with cache_manager.pinned(path=project_path):
+        cache_manager.evict()
+
+    assert os.path.exists(used_path)
+    assert not os.path.exists(other_path)
+
+
+def test_virtualenvs_within_budget_are_kept(cache_manager) -> None:
+    """Virtualenvs should not be evicted while they fit within their budget."""
+    path = add_virtualenv(cache_manager, name="venv", size=500)
+
+    assert cache_manager.evict().evictions == 0
+    assert os.path.exists(path)
@@ -0,0 +1,36 @@
+"""This module contains unit tests for cache of check command outcomes."""
+import signal
+import subprocess
+
+import pytest
+
+from pipwatch_worker.worker.check_results import get_packages_digest, is_check_failure
+from pipwatch_worker.worker.execution import ExecutionError, ExecutionTimeout
+
+
+@pytest.mark.parametrize("returncode", [1, 2, 127])
+def test_non_zero_exit_is_check_failure(returncode: int) -> None:
+    """Check command which exited on its own should be remembered as failing."""
+    assert is_check_failure(ExecutionError(returncode=returncode, cmd="tox"))
+    assert is_check_failure(subprocess.CalledProcessError(returncode=returncode, cmd="tox"))
+
+
+def test_timeout_is_not_check_failure() -> None:
+    """Check command killed after exceeding its time limit may pass next time."""
+    assert not is_check_failure(ExecutionTimeout(cmd="tox", timeout=60))
+
+
+@pytest.mark.parametrize("returncode", [-signal.SIGKILL, -signal.SIGSEGV, 128 + signal.SIGKILL])
+def test_death_by_signal_is_not_check_failure(returncode: int) -> None:
+    """Check command killed by a signal (e.g. by OOM killer or resource limits) may pass next time."""
+    assert not is_check_failure(ExecutionError(returncode=returncode, cmd="tox"))
+
+
+def test_packages_digest_depends_on_interpreter_version() -> None:
+    """The same packages installed for different interpreter may behave differently."""
+    installed_versions = {"django": "2.0", "requests": "2.18.4"}
+
+    assert get_packages_digest(installed_versions, python_version="3.6.4") == \
+        get_packages_digest(dict(reversed(list(installed_versions.items()))), python_version="3.6.4")
+    assert get_packages_digest(installed_versions, python_version="3.6.4") != \
+        get_packages_digest(installed_versions, python_version="3.7.0")
@@ -0,0 +1,64 @@
+"""This module contains unit tests for store of virtualenvs addressed by requirements they were built from."""
+import os
+import sys
+
+import pytest
+
+from pipwatch_worker.worker.environments import VirtualenvStore
+
+
+def add_project(tmpdir, name: str, **files: str) -> str:
+    """Create project directory with given requirements files and return its path."""
+    project_dir = tmpdir.mkdir(name)
+    for file_name, content in files.items():
+        project_dir.join(file_name.replace("_", "-") + ".txt").write(content)
+
+    return str(project_dir)
+
+
+def get_fingerprint(store: VirtualenvStore, project_dir_path: str, *requirements_files: str) -> str:
+    """Return fingerprint of virtualenv for given requirements files of project."""
+    return store.get_fingerprint(
+        python_command=sys.executable,
+        project_dir_path=project_dir_path,
+        requirements_files=requirements_files
+    )
+
+
+@pytest.fixture()
+def store(tmpdir) -> VirtualenvStore:
+    """Test instance of virtualenvs store."""
+    return VirtualenvStore(cache_path=str(tmpdir.mkdir("cache")))
+
+
+def test_projects_with_identical_requirements_share_virtualenv(store, tmpdir) -> None:
+    """Fingerprint should not depend on order of requirements, comments nor project location."""
+    first = add_project(tmpdir, "first", requirements="django==2.0\nrequests  # http\n")
+    second = add_project(tmpdir, "second", requirements="requests\n\ndjango==2.0\n")
+
+    assert get_fingerprint(store, first, "requirements.txt") == get_fingerprint(store, second, "requirements.txt")
+
+
+def test_local_requirements_are_bound_to_project(store, tmpdir) -> None:
+    """Projects installing their own (possibly editable) packages should not share virtualenv."""
+    content = "-e .\n./libs/foo[extra]\nfile:./libs/bar#egg=bar\n"
+    first = add_project(tmpdir, "first", requirements=content)
+    second = add_project(tmpdir, "second", requirements=content)
+
+    assert get_fingerprint(store, first, "requirements.txt") != get_fingerprint(store, second, "requirements.txt")
+    lines = store._get_normalized_lines(  # pylint: disable=protected-access
+        file_path=os.path.join(first, "requirements.txt"), project_dir_path=first
+    )
+    assert "local:{path}:-e .".format(path=os.path.realpath(first)) in lines
+
+
+def test_missing_included_files_change_fingerprint(store, tmpdir) -> None:
+    """Requirements file including missing file should not be taken for one including empty file."""
+    project_dir_path = add_project(tmpdir, "project", requirements="-r base.txt\n", base="")
+    with_base = get_fingerprint(store, project_dir_path, "requirements.txt")
+    os.remove(os.path.join(project_dir_path, "base.txt"))
+
+    assert get_fingerprint(store, project_dir_path, "requirements.txt") != with_base
+    assert store._get_normalized_lines(  # pylint: disable=protected-access
+        file_path=os.path.join(project_dir_path, "requirements.txt"), project_dir_path=project_dir_path
+    ) == ["missing:base.txt"]
@@ -0,0 +1,86 @@
+"""This module contains unit tests for running shell commands with their output streamed to disk."""
+import os
+import time
+
+import pytest
+
+from pipwatch_worker.worker.execution import ExecutionError, ExecutionTimeout, Executor, OutputSpool
+from pipwatch_worker.worker.sandbox import Sandbox
+
+
+def get_executor(tmpdir, **kwargs) -> Executor:
+    """Return executor writing logs into temporary directory, without any limits unless given."""
+    kwargs.setdefault("sandbox", Sandbox())
+    return Executor(logs_path=str(tmpdir.join("logs")), **kwargs)
+
+
+def is_running(pid: int) -> bool:
+    """Indicate if process with given id is running (zombies waiting to be reaped are not)."""
+    try:
+        with open("/proc/{pid}/stat".format(pid=pid), "r", encoding="utf-8") as file:
+            return file.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Process groups are not available on Windows")
+def test_command_exceeding_timeout_is_killed_with_its_process_group(tmpdir) -> None:
+    """Command (and processes it started in background) should not outlive its time limit."""
+    executor = get_executor(tmpdir, timeout=0.5)
+    started_at = time.time()
+
+    with pytest.raises(ExecutionTimeout) as error:
+        executor(command="sleep 30 & echo $!; sleep 30")
+
+    background_pid = int(error.value.output.decode().strip())
+    assert time.time() - started_at < 10
+    assert error.value.returncode < 0
+    for _ in range(50):
+        if not is_running(background_pid):
+            break
+        time.sleep(0.1)
+    assert not is_running(background_pid)
+
+
+def test_captured_output_is_truncated(tmpdir) -> None:
+    """Only configured amount of standard output should be kept in memory."""
+    executor = get_executor(tmpdir, max_captured_output=10)
+
+    assert executor(command="printf 0123456789abcdef") == b"0123456789"
+    with open(executor.log_path, "rb") as file:
+        assert b"0123456789abcdef" in file.read()
+
+
+def test_failure_carries_bounded_tail_of_output(tmpdir) -> None:
+    """Failed command should be reported with the last bytes of its output only."""
+    executor = get_executor(tmpdir, tail_size=4)
+
+    with pytest.raises(ExecutionError) as error:
+        executor(command="printf abcdefgh >&2; exit 3")
+
+    assert error.value.returncode == 3
+    assert error.value.tail == b"efgh"
+    assert error.value.output == b""
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Resource limits are not available on Windows")
+def test_limits_are_applied_by_launcher(tmpdir) -> None:
+    """Commands should run with CPU time limit and limits of the sandbox."""
+    executor = get_executor(tmpdir, cpu_time=7, sandbox=Sandbox(limits={"open_files": 64}))
+
+    assert executor(command="ulimit -t; ulimit -n").split() == [b"7", b"64"]
+
+
+def test_spools_of_the_same_log_keep_writing_into_it_after_rotation(tmpdir) -> None:
+    """Log rotated by one spool should not be written into by another one."""
+    path = str(tmpdir.join("logs", "task.log"))
+    with OutputSpool(path, max_bytes=10, backup_count=2) as first, \
+            OutputSpool(path, max_bytes=10, backup_count=2) as second:
+        second.write(b"second ")
+        first.write(b"first\n")
+        second.write(b"rotated\n")
+
+    with open(path, "rb") as file:
+        assert file.read() == b"rotated\n"
+    with open(path + ".1", "rb") as file:
+        assert file.read() == b"second first\n"
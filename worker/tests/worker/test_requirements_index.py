@@ -0,0 +1,66 @@
+"""This module contains unit tests for index of project requirements."""
+from pipwatch_worker.core.data_models import Project, Requirement
+from pipwatch_worker.worker.requirements_index import RequirementsIndex
+
+from tests.utils import get_processing_request
+
+
+def get_project(*requirements: str) -> Project:
+    """Return project with single requirements file, requiring given packages."""
+    return Project.from_dict(dictionary=get_processing_request(1, *requirements))
+
+
+def test_requirements_are_found_by_normalized_name() -> None:
+    """Different spellings of package name should find the same requirement."""
+    project = get_project("Foo_Bar", "Django", "zope.interface")
+    requirements_file = project.requirements_files[0]
+    index = RequirementsIndex(project_details=project)
+
+    for name in ["foo-bar", "FOO.bar", "foo__bar"]:
+        assert index.get(requirements_file=requirements_file, name=name).name == "Foo_Bar"
+    assert index.get(requirements_file=requirements_file, name="django").name == "Django"
+    assert index.get(requirements_file=requirements_file, name="Zope-Interface").name == "zope.interface"
+    assert index.get(requirements_file=requirements_file, name="flask") is None
+
+
+def test_extras_are_ignored() -> None:
+    """Requirement with extras should be found by name of its package."""
+    project = get_project("celery[redis]")
+    index = RequirementsIndex(project_details=project)
+
+    assert [requirement.name for requirement in index.find(name="Celery")] == ["celery[redis]"]
+
+
+def test_requirements_are_found_in_all_files() -> None:
+    """Requirements of the same package in many files should all be found, each in its own file."""
+    project = get_project("Django")
+    other_file = Project.from_dict(dictionary=get_processing_request(
+        1, "django", path="requirements-development.txt"
+    )).requirements_files[0]
+    project.requirements_files.append(other_file)
+    index = RequirementsIndex(project_details=project)
+
+    assert [requirement.name for requirement in index.find(name="DJANGO")] == ["Django", "django"]
+    assert index.get(requirements_file=other_file, name="Django").name == "django"
+
+
+def test_only_first_requirement_of_package_in_file_is_indexed() -> None:
+    """Repeated requirement of the same package within a file should not shadow the first one."""
+    project = get_project("requests", "Requests")
+    index = RequirementsIndex(project_details=project)
+
+    assert index.get(requirements_file=project.requirements_files[0], name="requests").name == "requests"
+    assert len(index.find(name="requests")) == 1
+
+
+def test_added_requirements_are_indexed() -> None:
+    """Requirements added to the project after index was built should be found once index is told about them."""
+    project = get_project()
+    requirements_file = project.requirements_files[0]
+    index = RequirementsIndex(project_details=project)
+    requirement = Requirement(name="Foo_Bar")
+
+    index.add(requirements_file=requirements_file, requirement=requirement)
+
+    assert index.get(requirements_file=requirements_file, name="foo-bar") is requirement
+    assert index.find(name="foo.bar") == [requirement]
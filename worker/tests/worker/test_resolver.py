@@ -0,0 +1,212 @@
+"""This module contains unit tests for resolver of mutually compatible requirements versions."""
+from typing import Dict, Iterable, List, Optional
+
+import pytest
+from packaging.specifiers import SpecifierSet
+
+from pipwatch_worker.index.metadata import PackageMetadata
+from pipwatch_worker.worker.resolver import DependencyResolver, ResolutionImpossible, ResolutionTooComplex
+
+
+class StubPackageIndex:
+    """Package index serving releases of packages from a dictionary, recording names it was asked about."""
+
+    def __init__(self, releases: Dict[str, List[str]]) -> None:
+        """Create index instance."""
+        self.releases = releases
+        self.requested: List[List[str]] = []
+
+    def get_metadata(self, package_names: Iterable[str]) -> Dict[str, Optional[PackageMetadata]]:
+        """Return metadata of given packages (None for packages index does not know)."""
+        names = sorted(package_names)
+        self.requested.append(names)
+        return {
+            name: PackageMetadata(name=name, latest_version=self.releases[name][-1], releases=self.releases[name])
+            if name in self.releases else None for name in names
+        }
+
+
+class StubDependenciesIndex:
+    """Dependencies index serving Requires-Dist of releases from a dictionary."""
+
+    def __init__(self, dependencies: Dict[str, List[str]]) -> None:
+        """Create index instance."""
+        self.dependencies = dependencies
+
+    def get_requires_dist(self, package_name: str, version: str) -> Optional[List[str]]:
+        """Return requirements declared by given release ('name==version' key), None if they are unknown."""
+        return self.dependencies.get("{name}=={version}".format(name=package_name, version=version))
+
+
+def get_resolver(releases: Dict[str, List[str]], dependencies: Dict[str, List[str]] = None,
+                 **kwargs) -> DependencyResolver:
+    """Return resolver using stub indexes."""
+    return DependencyResolver(
+        package_index=StubPackageIndex(releases=releases),  # type: ignore
+        dependencies_index=StubDependenciesIndex(dependencies=dependencies or {}),  # type: ignore
+        **kwargs
+    )
+
+
+def test_resolver_without_dependencies_index_is_disabled() -> None:
+    """Resolver should not be used when dependencies cannot be told."""
+    resolver = DependencyResolver(package_index=StubPackageIndex(releases={}))  # type: ignore
+
+    assert not resolver.enabled
+
+
+def test_newest_versions_are_chosen() -> None:
+    """Newest versions satisfying constraints (final releases over pre-releases) should be chosen."""
+    resolver = get_resolver(releases={"django": ["1.11", "2.0", "2.1b1"], "requests": ["2.17", "2.18"]})
+
+    resolution = resolver.resolve(requirements={"Django": SpecifierSet(""), "requests": SpecifierSet("<2.18")})
+
+    assert resolution == {"django": "2.0", "requests": "2.17"}
+
+
+def test_packages_unknown_to_index_satisfy_any_constraints() -> None:
+    """Packages which index does not know should not prevent resolution."""
+    resolver = get_resolver(releases={})
+
+    assert resolver.resolve(requirements={"private-package": SpecifierSet("==1.0")}) == {"private-package": None}
+
+
+def test_upgrade_is_held_back_by_dependency_of_other_requirement() -> None:
+    """Upgraded package should get the newest version compatible with dependencies of other requirements."""
+    resolver = get_resolver(
+        releases={"celery": ["4.1.0"], "kombu": ["4.0.0", "4.1.0", "5.0.0"]},
+        dependencies={"celery==4.1.0": ["kombu<5,>=4.0.2"]}
+    )
+
+    resolution = resolver.resolve(
+        requirements={"celery": SpecifierSet("==4.1.0"), "kombu": SpecifierSet("==4.0.0")},
+        upgrades=["kombu"]
+    )
+
+    assert resolution == {"celery": "4.1.0", "kombu": "4.1.0"}
+
+
+def test_resolver_backtracks_to_older_version_of_dependant() -> None:
+    """When no version of a dependency fits, older version of package requiring it should be tried."""
+    resolver = get_resolver(
+        releases={"a": ["1.0", "2.0"], "b": ["1.0", "2.0"], "c": ["1.0"]},
+        dependencies={"a==2.0": ["c>=2"], "a==1.0": ["c"], "b==2.0": ["a>=1"]}
+    )
+
+    resolution = resolver.resolve(requirements={"a": SpecifierSet(), "b": SpecifierSet()})
+
+    assert resolution == {"a": "1.0", "b": "2.0", "c": "1.0"}
+
+
+def test_conflicting_requirements_cannot_be_resolved() -> None:
+    """Requirements which cannot be satisfied together should be reported as such."""
+    resolver = get_resolver(
+        releases={"a": ["1.0"], "b": ["1.0"]},
+        dependencies={"a==1.0": ["b>=2"]}
+    )
+
+    with pytest.raises(ResolutionImpossible):
+        resolver.resolve(requirements={"a": SpecifierSet(), "b": SpecifierSet("==1.0")})
+
+
+def test_upgrade_specifier_allows_only_versions_not_older_than_current_newest() -> None:
+    """Upgraded package should not be resolved to version older than its constraints already allow."""
+    resolver = get_resolver(releases={"django": ["1.10", "1.11", "2.0"]})
+
+    assert resolver._get_upgrade_specifier(  # pylint: disable=protected-access
+        name="django", specifier=SpecifierSet("<2")
+    ) == SpecifierSet(">=1.11")
+    assert resolver._get_upgrade_specifier(  # pylint: disable=protected-access
+        name="unknown", specifier=SpecifierSet("<2")
+    ) == SpecifierSet()
+
+
+def test_upgrade_is_not_downgraded_by_dependencies() -> None:
+    """Upgrade which would require going back below currently allowed version should be impossible."""
+    resolver = get_resolver(
+        releases={"a": ["1.0"], "b": ["1.0", "2.0", "3.0"]},
+        dependencies={"a==1.0": ["b<2"]}
+    )
+
+    with pytest.raises(ResolutionImpossible):
+        resolver.resolve(requirements={"a": SpecifierSet(), "b": SpecifierSet("<3")}, upgrades=["b"])
+
+
+def test_dependencies_of_requested_extras_are_included() -> None:
+    """Dependencies required by extras should apply only when the extra is requested."""
+    dependencies = {
+        "celery==4.1.0": ['redis<2.11; extra == "redis"'],
+        "project-tool==1.0": ["celery[redis]"]
+    }
+    releases = {"celery": ["4.1.0"], "redis": ["2.10", "2.11"], "project-tool": ["1.0"]}
+
+    without_extra = get_resolver(releases=releases, dependencies=dependencies).resolve(
+        requirements={"celery": SpecifierSet(), "redis": SpecifierSet()}
+    )
+    with_extra = get_resolver(releases=releases, dependencies=dependencies).resolve(
+        requirements={"project-tool": SpecifierSet(), "redis": SpecifierSet()}
+    )
+
+    assert without_extra["redis"] == "2.11"
+    assert with_extra["redis"] == "2.10"
+
+
+def test_dependencies_not_applying_to_environment_are_ignored() -> None:
+    """Dependencies whose markers do not match current environment should not constrain resolution."""
+    resolver = get_resolver(
+        releases={"a": ["1.0"], "b": ["1.0", "2.0"]},
+        dependencies={"a==1.0": ['b<2; python_version < "3"', "invalid requirement !!"]}
+    )
+
+    assert resolver.resolve(requirements={"a": SpecifierSet(), "b": SpecifierSet()}) == {"a": "1.0", "b": "2.0"}
+
+
+def test_dependencies_are_looked_up_in_bulk() -> None:
+    """Packages discovered as dependencies should be resolved together, not one by one."""
+    resolver = get_resolver(
+        releases={"a": ["1.0"], "b": ["1.0"], "c": ["1.0"]},
+        dependencies={"a==1.0": ["b", "c"]}
+    )
+
+    resolver.resolve(requirements={"a": SpecifierSet()})
+
+    assert resolver.package_index.requested == [["a"], ["b", "c"]]  # type: ignore
+
+
+def test_resolution_is_given_up_after_max_attempts() -> None:
+    """Resolver should not try more candidate versions than it is allowed to."""
+    resolver = get_resolver(
+        releases={"a": [str(version) for version in range(1, 20)], "b": ["1.0"]},
+        dependencies={"a=={}".format(version): ["b>=2"] for version in range(1, 20)},
+        max_attempts=5
+    )
+
+    with pytest.raises(ResolutionTooComplex):
+        resolver.resolve(requirements={"a": SpecifierSet(), "b": SpecifierSet()})
+
+
+def test_only_max_candidates_newest_versions_are_considered() -> None:
+    """Resolver should give up on package once its newest 'max_candidates' versions do not fit."""
+    resolver = get_resolver(
+        releases={"a": ["1", "2", "3"], "b": ["1.0"]},
+        dependencies={"a==3": ["b>=2"], "a==2": ["b>=2"]},
+        max_candidates=2
+    )
+
+    with pytest.raises(ResolutionImpossible):
+        resolver.resolve(requirements={"a": SpecifierSet(), "b": SpecifierSet()})
+
+
+def test_number_of_requirements_is_not_limited_by_recursion_depth() -> None:
+    """Resolver should cope with projects having more requirements than python allows nested calls."""
+    names = ["package-{:04}".format(number) for number in range(1200)]
+    resolver = get_resolver(
+        releases={name: ["1.0", "2.0"] for name in names},
+        dependencies={"{}==2.0".format(name): ["{}<2".format(dependency)] for name, dependency in zip(names, names[1:])}
+    )
+
+    resolution = resolver.resolve(requirements={name: SpecifierSet() for name in names}, upgrades=names[-1:])
+
+    assert resolution[names[0]] == "2.0"
+    assert resolution[names[-1]] == "2.0"
+    assert len(resolution) == len(names)